@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# 规范化时去掉的首尾标点
+_EDGE_PUNCTUATION = " \t\r\n.,!?;:。，！？；：、…~"
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    规范化用户消息：全半角统一、小写、合并空白、去掉首尾标点
+
+    Args:
+        text: 用户消息
+
+    Returns:
+        规范化后的消息
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _WHITESPACE_PATTERN.sub(" ", text).strip(_EDGE_PUNCTUATION)
+
+
+def model_id(agent) -> str:
+    """
+    获取agent使用的模型标识
+
+    Args:
+        agent: pydantic-ai Agent
+
+    Returns:
+        模型标识
+    """
+    model = agent.model
+    if isinstance(model, str):
+        return model
+    return f"{getattr(model, 'system', '')}:{getattr(model, 'model_name', type(model).__name__)}"
+
+
+def cache_key(model: str, message: str, context: Any = None) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model: 模型标识
+        message: 用户消息（会被规范化）
+        context: 影响结果的上下文（会话历史、父节点描述等），需可JSON序列化
+
+    Returns:
+        缓存键（十六进制摘要）
+    """
+    payload = json.dumps([model, normalize_prompt(message), context], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCacheBackend:
+    """
+    缓存的磁盘后端：每个条目一个JSON文件，进程重启后仍可命中
+    """
+
+    def __init__(self, directory: str):
+        """
+        初始化磁盘后端
+
+        Args:
+            directory: 缓存目录
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        读取条目
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            (过期时间, 值)，不存在时返回None
+        """
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry["expires_at"], entry["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, expires_at: float, value: str) -> None:
+        """
+        写入条目（先写临时文件再替换，避免读到写了一半的文件）
+
+        Args:
+            key: 缓存键
+            expires_at: 过期时间
+            value: 值
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def delete(self, key: str) -> None:
+        """
+        删除条目
+
+        Args:
+            key: 缓存键
+        """
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class ResponseCache:
+    """
+    agent结果缓存
+    内存中按TTL和LRU淘汰，可选挂接磁盘后端作为第二级缓存
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, backend: Optional[DiskCacheBackend] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 内存中最多保留的条目数
+            ttl: 条目有效期（秒）
+            backend: 可选的磁盘后端
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存值
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中或已过期时返回None
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        if self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._store(key, entry)
+                    self.hits += 1
+                    return entry[1]
+                self.backend.delete(key)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        """
+        写入缓存值
+
+        Args:
+            key: 缓存键
+            value: 值
+        """
+        entry = (time.time() + self.ttl, value)
+        self._store(key, entry)
+        if self.backend is not None:
+            try:
+                self.backend.put(key, *entry)
+            except OSError as e:
+                print(f"写入缓存失败: {e}")
+
+    def _store(self, key: str, entry: Tuple[float, str]) -> None:
+        """
+        放入内存并按LRU淘汰
+
+        Args:
+            key: 缓存键
+            entry: (过期时间, 值)
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_model(self, key: str, model_cls: Type[ModelT]) -> Optional[ModelT]:
+        """
+        读取缓存的pydantic模型
+
+        Args:
+            key: 缓存键
+            model_cls: 模型类
+
+        Returns:
+            模型对象，未命中或数据无法解析时返回None
+        """
+        value = self.get(key)
+        if value is None:
+            return None
+        try:
+            return model_cls.model_validate_json(value)
+        except ValueError:
+            return None
+
+    def put_model(self, key: str, model: BaseModel) -> None:
+        """
+        缓存pydantic模型
+
+        Args:
+            key: 缓存键
+            model: 模型对象
+        """
+        # 不写出None字段：读取时使用字段默认值，避免 Field(None) 这类非Optional字段校验失败
+        self.put(key, model.model_dump_json(exclude_none=True))
+
+    def clear(self) -> None:
+        """
+        清空内存中的条目（磁盘后端的条目到期后失效）
+        """
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# agent共享的结果缓存，设置 AGENT_CACHE_DIR 时启用磁盘后端
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("AGENT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AGENT_CACHE_TTL", "3600")),
+    backend=DiskCacheBackend(os.environ["AGENT_CACHE_DIR"]) if os.getenv("AGENT_CACHE_DIR") else None
+)
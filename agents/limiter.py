@@ -0,0 +1,77 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+import asyncio
+import os
+import time
+
+
+class AgentLimiter:
+    """
+    agent调用并发限制器
+    在事件循环上以信号量限制同时进行的模型调用数，并统计排队深度和等待时间，
+    并发上限应按模型服务商的速率限制配置，而不是受线程池大小限制
+    """
+
+    def __init__(self, max_concurrency: int = 16):
+        """
+        初始化并发限制器
+
+        Args:
+            max_concurrency: 最大并发调用数
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # 统计信息
+        self.waiting = 0  # 正在排队的调用数（队列深度）
+        self.running = 0  # 正在进行的调用数
+        self.max_waiting = 0
+        self.started = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        占用一个调用名额，名额已满时排队等待
+
+        用法:
+            async with agent_limiter.slot():
+                result = await agent.run(...)
+        """
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        start = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.total_wait_seconds += time.monotonic() - start
+        self.started += 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取并发统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_wait_seconds": self.total_wait_seconds / self.started if self.started else 0.0
+        }
+
+
+# 所有agent共享的并发限制器
+agent_limiter = AgentLimiter(int(os.getenv("AGENT_MAX_CONCURRENCY", "16")))
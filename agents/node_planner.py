@@ -1,6 +1,12 @@
 from dataclasses import dataclass
+from typing import Dict, List, Optional
 from pydantic_ai import Agent, RunContext
 from pydantic import BaseModel, Field
+from nodes import MindMapNode, MindMapManager
+import asyncio
+import json
+from agents.limiter import agent_limiter
+from agents.cache import cache_key, model_id, response_cache
 
 
 @dataclass
@@ -24,6 +30,193 @@ agent = Agent(
     system_prompt=f"You are Eure, a helpful assistant inspire and help the user to build a mindmap about the idea.",
 )
 
+
+async def run_node_planner(user_message: str, parent_description: str):
+    """在事件循环上运行节点规划agent并返回结果（受并发限制，结果会被缓存）"""
+    key = _planner_cache_key(user_message, parent_description)
+    cached = response_cache.get_model(key, SupportOutput)
+    if cached is not None:
+        return cached
+    try:
+        async with agent_limiter.slot():
+            results = await agent.run(user_message, deps=ParentNodeInfo(description=parent_description))
+        response_cache.put_model(key, results.output)
+        return results.output
+    except Exception as e:
+        print(f"Node planner error: {e}")
+        return None
+
+# 一次批量请求最多包含的父节点数
+BATCH_SIZE = 20
+# 批量请求失败时逐个扩展的最大并发数
+FALLBACK_CONCURRENCY = 4
+# 未指定用户消息时使用的扩展指令
+DEFAULT_EXPAND_MESSAGE = "Split this mindmap node into a few more specific sub-ideas."
+
+
+class NodeExpansion(BaseModel):
+    parent_id: str = Field(description='The id of the parent node being expanded, copied from the request.')
+    buid_new_nodes: bool = Field(description='Does this mindmap node need to be split into new nodes?')
+    new_node_list: list[NodeInfo] = Field(description='List the new nodes under this parent node.')
+
+
+class BatchSupportOutput(BaseModel):
+    expansions: list[NodeExpansion] = Field(description='One expansion for each parent node in the request.')
+
+batch_agent = Agent(
+    model="deepseek:deepseek-chat",
+    output_type=BatchSupportOutput,
+    system_prompt=(
+        "You are Eure, a helpful assistant inspire and help the user to build a mindmap about the idea. "
+        "The user gives an instruction and a list of mindmap nodes, each with an id and a description. "
+        "Apply the instruction to every node independently and return one expansion per node id."
+    ),
+)
+
+
+def _planner_cache_key(user_message: str, parent_description: str) -> str:
+    """单个父节点的缓存键，批量请求与 run_node_planner 共用"""
+    return cache_key(model_id(agent), user_message, {"parent": parent_description})
+
+
+async def _run_batch(user_message: str, parents: Dict[str, str]) -> Dict[str, SupportOutput]:
+    """
+    一次结构化请求扩展多个父节点
+
+    Args:
+        user_message: 扩展指令
+        parents: 父节点ID -> 父节点描述
+
+    Returns:
+        父节点ID -> 扩展结果（请求失败或模型遗漏的父节点不在结果中）
+    """
+    listing = "\n".join(json.dumps({"id": parent_id, "description": description}, ensure_ascii=False)
+                         for parent_id, description in parents.items())
+    try:
+        async with agent_limiter.slot():
+            results = await batch_agent.run(f"{user_message}\n\nNodes:\n{listing}")
+    except Exception as e:
+        print(f"Batch node planner error: {e}")
+        return {}
+
+    outputs = {}
+    for expansion in results.output.expansions:
+        if expansion.parent_id in parents and expansion.parent_id not in outputs:
+            output = SupportOutput(buid_new_nodes=expansion.buid_new_nodes, new_node_list=expansion.new_node_list)
+            response_cache.put_model(_planner_cache_key(user_message, parents[expansion.parent_id]), output)
+            outputs[expansion.parent_id] = output
+    return outputs
+
+
+async def run_node_planner_batch(
+    user_message: str,
+    parents: Dict[str, str],
+    batch_size: int = BATCH_SIZE,
+    fallback_concurrency: int = FALLBACK_CONCURRENCY
+) -> Dict[str, SupportOutput]:
+    """
+    批量扩展多个父节点
+
+    未命中缓存的父节点按 batch_size 分组，每组一次结构化请求，各组并发发出（受全局并发限制）；
+    批量请求失败或遗漏的父节点退回 run_node_planner 逐个扩展，最多 fallback_concurrency 个同时进行
+
+    Args:
+        user_message: 扩展指令（对每个父节点相同）
+        parents: 父节点ID -> 父节点描述
+        batch_size: 一次请求最多包含的父节点数
+        fallback_concurrency: 逐个扩展时的最大并发数
+
+    Returns:
+        父节点ID -> 扩展结果，最终仍失败的父节点不在结果中
+    """
+    outputs: Dict[str, SupportOutput] = {}
+    pending: Dict[str, str] = {}
+    for parent_id, description in parents.items():
+        cached = response_cache.get_model(_planner_cache_key(user_message, description), SupportOutput)
+        if cached is not None:
+            outputs[parent_id] = cached
+        else:
+            pending[parent_id] = description
+
+    items = list(pending.items())
+    batches = [dict(items[i:i + batch_size]) for i in range(0, len(items), batch_size)]
+    for batch_outputs in await asyncio.gather(*(_run_batch(user_message, batch) for batch in batches)):
+        outputs.update(batch_outputs)
+
+    missing = [parent_id for parent_id in pending if parent_id not in outputs]
+    if missing:
+        semaphore = asyncio.Semaphore(fallback_concurrency)
+
+        async def plan_one(parent_id: str) -> Optional[SupportOutput]:
+            async with semaphore:
+                return await run_node_planner(user_message, pending[parent_id])
+
+        for parent_id, output in zip(missing, await asyncio.gather(*(plan_one(parent_id) for parent_id in missing))):
+            if output is not None:
+                outputs[parent_id] = output
+    return outputs
+
+
+def describe_node(node: MindMapNode) -> str:
+    """
+    生成节点的描述（标题和内容）
+
+    Args:
+        node: 思维导图节点
+
+    Returns:
+        节点描述
+    """
+    return f"{node.title}: {node.content}" if node.content else node.title
+
+
+async def expand_mindmap(
+    manager: MindMapManager,
+    node_ids: List[str],
+    levels: int = 1,
+    user_message: str = DEFAULT_EXPAND_MESSAGE,
+    max_nodes: int = 500
+) -> List[str]:
+    """
+    自动逐层扩展思维导图：每层的所有父节点批量规划，结果一次批量插入管理器
+
+    Args:
+        manager: 思维导图管理器
+        node_ids: 第一层要扩展的节点ID
+        levels: 扩展层数
+        user_message: 扩展指令
+        max_nodes: 最多新增的节点数
+
+    Returns:
+        新增的节点ID列表
+    """
+    added: List[str] = []
+    frontier = list(node_ids)
+    for _ in range(levels):
+        parents = {node_id: describe_node(manager.nodes[node_id]) for node_id in frontier if node_id in manager.nodes}
+        if not parents or len(added) >= max_nodes:
+            break
+        outputs = await run_node_planner_batch(user_message, parents)
+
+        new_nodes = []
+        for parent_id, output in outputs.items():
+            # 规划期间父节点可能已被删除
+            if not output.buid_new_nodes or parent_id not in manager.nodes:
+                continue
+            for node_info in output.new_node_list:
+                if len(added) + len(new_nodes) >= max_nodes:
+                    break
+                new_nodes.append(MindMapNode(
+                    title=node_info.name,
+                    content=node_info.description or "",
+                    node_type="subtask",
+                    parent_id=parent_id
+                ))
+        frontier = manager.add_nodes(new_nodes)
+        added.extend(frontier)
+    return added
+
+
 if __name__ == "__main__":
     deps = ParentNodeInfo(description="Exploring movie options and preferences.")
     results = agent.run_sync("I want to watch a moview", deps=deps)
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import asyncio
+import os
+from agents.limiter import agent_limiter
+from agents.node_planner import DEFAULT_EXPAND_MESSAGE, SupportOutput, run_node_planner
+
+
+class _Prefetch:
+    """
+    一个会话的预取：建议讨论的节点及其扩展任务
+    """
+
+    def __init__(self, title: str, description: str, task: asyncio.Task):
+        self.title = title
+        self.description = description
+        self.task = task
+
+
+class ExpansionPrefetcher:
+    """
+    建议节点扩展的推测性预取
+    starter agent 回复完成后，在后台用节点规划agent扩展其建议讨论的下一个节点（dicuss_next），
+    结果按会话保存；用户聚焦该节点（标题和描述都相同）时直接返回，聚焦其他节点时取消预取。
+    预取是低优先级的：agent调用有排队或预取数达到上限时跳过
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_sessions: int = 1000):
+        """
+        初始化预取器
+
+        Args:
+            max_in_flight: 同时进行的预取数上限（预算）
+            max_sessions: 最多保留预取结果的会话数，超出时丢弃最早的
+        """
+        self.max_in_flight = max_in_flight
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Prefetch]" = OrderedDict()
+        self._running = 0
+
+        # 统计信息
+        self.scheduled = 0
+        self.skipped = 0  # 超出预算或agent繁忙而未预取
+        self.cancelled = 0
+        self.hits = 0  # 聚焦的节点已预取
+        self.misses = 0  # 聚焦的节点未预取，需要现场规划
+
+    def schedule(self, session_id: str, title: str, description: str) -> bool:
+        """
+        为会话预取节点扩展，替换（并取消）会话之前的预取
+
+        Args:
+            session_id: 会话ID
+            title: 建议讨论的节点标题
+            description: 节点描述
+
+        Returns:
+            是否开始预取
+        """
+        self.discard(session_id)
+        busy = agent_limiter.waiting > 0 or agent_limiter.running >= agent_limiter.max_concurrency
+        if busy or self._running >= self.max_in_flight:
+            self.skipped += 1
+            return False
+
+        self._running += 1
+        task = asyncio.ensure_future(run_node_planner(DEFAULT_EXPAND_MESSAGE, description))
+        task.add_done_callback(self._on_done)
+        self._sessions[session_id] = _Prefetch(title, description, task)
+        while len(self._sessions) > self.max_sessions:
+            self.discard(next(iter(self._sessions)))
+        self.scheduled += 1
+        return True
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._running -= 1
+
+    def discard(self, session_id: str) -> None:
+        """
+        丢弃会话的预取，未完成的预取会被取消
+
+        Args:
+            session_id: 会话ID
+        """
+        prefetch = self._sessions.pop(session_id, None)
+        if prefetch is not None and not prefetch.task.done():
+            prefetch.task.cancel()
+            self.cancelled += 1
+
+    async def focus(self, session_id: str, title: str, description: str) -> Optional[SupportOutput]:
+        """
+        用户聚焦节点时获取扩展建议：命中预取时直接使用（未完成则等待），否则取消预取并现场规划；
+        标题和描述都与预取时相同才算命中，同名但内容不同的节点不会拿到为另一个节点规划的扩展
+
+        Args:
+            session_id: 会话ID
+            title: 聚焦的节点标题
+            description: 节点描述
+
+        Returns:
+            扩展建议，失败时返回None
+        """
+        prefetch = self._sessions.get(session_id)
+        if prefetch is not None and prefetch.title == title and prefetch.description == description:
+            self.hits += 1
+            del self._sessions[session_id]
+            try:
+                # 请求被取消时不取消预取任务，结果仍会进入响应缓存
+                result = await asyncio.shield(prefetch.task)
+            except asyncio.CancelledError:
+                if not prefetch.task.cancelled():
+                    raise
+                result = None
+            if result is not None:
+                return result
+        else:
+            self.misses += 1
+            self.discard(session_id)
+        return await run_node_planner(DEFAULT_EXPAND_MESSAGE, description)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取预取统计信息
+
+        Returns:
+            统计信息字典
+        """
+        focuses = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "in_flight": self._running,
+            "max_in_flight": self.max_in_flight,
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "cancelled": self.cancelled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / focuses if focuses else 0.0
+        }
+
+
+# /chat 使用的预取器
+expansion_prefetcher = ExpansionPrefetcher(int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "4")))
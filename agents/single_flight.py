@@ -0,0 +1,141 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+
+
+class _Flight:
+    """
+    一次进行中的调用：记录已产生的事件，供所有订阅者按顺序读取
+    """
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Future] = None
+
+
+class SingleFlight:
+    """
+    相同请求合并（single-flight）
+    键相同的并发请求共享同一次进行中的调用，调用产生的流式事件分发给所有订阅者；
+    后加入的订阅者会先收到已产生的全部事件，再继续接收后续事件
+    """
+
+    def __init__(self):
+        """
+        初始化请求合并器
+        """
+        self._flights: Dict[str, _Flight] = {}
+
+        # 统计信息
+        self.leaders = 0  # 实际发起的调用数
+        self.followers = 0  # 被合并到进行中调用的请求数
+
+    def in_flight(self, key: str) -> bool:
+        """
+        判断键是否有进行中的调用
+
+        Args:
+            key: 请求键
+
+        Returns:
+            是否有进行中的调用
+        """
+        return key in self._flights
+
+    def subscribe(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> Tuple[AsyncIterator[Any], bool]:
+        """
+        订阅键对应的调用，没有进行中的调用时用 factory 发起一次
+
+        调用在独立的任务中运行，发起请求的客户端断开不会影响其他订阅者
+
+        Args:
+            key: 请求键
+            factory: 创建事件异步迭代器的函数（只有发起调用时才会被调用）
+
+        Returns:
+            (事件异步迭代器, 是否为发起者)
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._run(key, flight, factory))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return self._replay(flight), leader
+
+    async def _run(self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        """
+        运行调用并记录事件
+
+        Args:
+            key: 请求键
+            flight: 调用记录
+            factory: 创建事件异步迭代器的函数
+        """
+        try:
+            async for item in factory():
+                flight.items.append(item)
+                flight.changed.set()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.changed.set()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def _replay(self, flight: _Flight) -> AsyncIterator[Any]:
+        """
+        按顺序读取调用的事件，调用失败时抛出同样的异常
+
+        Args:
+            flight: 调用记录
+        """
+        index = 0
+        while True:
+            while index < len(flight.items):
+                yield flight.items[index]
+                index += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            flight.changed.clear()
+            await flight.changed.wait()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取请求合并统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
+
+
+def flight_key(session_id: str, message: str) -> str:
+    """
+    计算请求键：会话ID + 消息摘要
+
+    Args:
+        session_id: 会话ID
+        message: 用户消息
+
+    Returns:
+        请求键
+    """
+    return f"{session_id}:{hashlib.sha256(message.encode('utf-8')).hexdigest()}"
+
+
+# /chat 使用的starter agent请求合并器
+starter_flights = SingleFlight()
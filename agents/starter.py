@@ -1,5 +1,12 @@
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import (
+    ModelMessage, ModelRequest, ModelResponse, SystemPromptPart, TextPart, ToolCallPart, UserPromptPart
+)
 from pydantic import BaseModel, Field
+from pydantic_core import from_json
+from agents.limiter import agent_limiter
+from agents.cache import cache_key, model_id, response_cache
 
 
 class NodeInfo(BaseModel):
@@ -14,24 +21,145 @@ class SupportOutput(BaseModel):
     new_node_list: list[NodeInfo] = Field(description='List the new nodes of the mindmap if a new idea is started.')
     dicuss_next: str = Field(description='Based on the new node list, suggest the user what to discuss next, return the node name.')
 
+STARTER_SYSTEM_PROMPT = "You are Eure, a helpful assistant inspire and help the user to build a mindmap about the idea."
+
 starter_agent = Agent(
     model="deepseek:deepseek-chat",
     output_type=SupportOutput,
-    system_prompt="You are Eure, a helpful assistant inspire and help the user to build a mindmap about the idea.",
+    system_prompt=STARTER_SYSTEM_PROMPT,
 )
 
 
+def build_message_history(history: Sequence, summary: str = "") -> List[ModelMessage]:
+    """
+    将会话历史（ChatMessage）和早期对话摘要转换为 pydantic-ai 的消息历史
+
+    传入消息历史时 pydantic-ai 不再自动添加系统提示，因此在第一条请求中带上系统提示和摘要
+
+    Args:
+        history: 按时间顺序的 ChatMessage 列表（不含本轮用户消息）
+        summary: 早期对话的摘要
+
+    Returns:
+        消息历史，没有历史时为空列表
+    """
+    if not history and not summary:
+        return []
+    messages: List[ModelMessage] = []
+    request_parts = [SystemPromptPart(STARTER_SYSTEM_PROMPT)]
+    if summary:
+        request_parts.append(SystemPromptPart(f"Summary of the earlier conversation:\n{summary}"))
+    for message in history:
+        if message.role == "user":
+            request_parts.append(UserPromptPart(message.content))
+        else:
+            if request_parts:
+                messages.append(ModelRequest(parts=request_parts))
+                request_parts = []
+            messages.append(ModelResponse(parts=[TextPart(message.content)]))
+    if request_parts:
+        messages.append(ModelRequest(parts=request_parts))
+    return messages
+
+
+def starter_cache_key(user_message: str, history: Sequence = (), summary: str = "") -> str:
+    """starter agent结果的缓存键：规范化的消息 + 会话上下文 + 模型标识"""
+    context = {"history": [[message.role, message.content] for message in history], "summary": summary}
+    return cache_key(model_id(starter_agent), user_message, context)
+
+
 def run_starter_agent(user_message: str):
     """运行starter agent并返回结果"""
+    key = starter_cache_key(user_message)
+    cached = response_cache.get_model(key, SupportOutput)
+    if cached is not None:
+        return cached
     try:
         results = starter_agent.run_sync(user_message)
         print(results.output)
+        response_cache.put_model(key, results.output)
+        return results.output
+    except Exception as e:
+        print(f"Starter agent error: {e}")
+        return None
+
+
+async def run_starter_agent_async(user_message: str, history: Sequence = (), summary: str = ""):
+    """在事件循环上运行starter agent并返回结果（受并发限制，结果会被缓存）"""
+    key = starter_cache_key(user_message, history, summary)
+    cached = response_cache.get_model(key, SupportOutput)
+    if cached is not None:
+        return cached
+    try:
+        async with agent_limiter.slot():
+            results = await starter_agent.run(
+                user_message, message_history=build_message_history(history, summary)
+            )
+        response_cache.put_model(key, results.output)
         return results.output
     except Exception as e:
         print(f"Starter agent error: {e}")
         return None
 
 
+def _partial_reply(message: ModelResponse) -> Optional[str]:
+    """从流式输出中尚未完整的结构化结果里取出已生成的 reply 文本"""
+    for part in message.parts:
+        if not isinstance(part, ToolCallPart):
+            continue
+        args = part.args
+        if isinstance(args, str):
+            try:
+                args = from_json(args, allow_partial="trailing-strings")
+            except ValueError:
+                # 转义序列等被截断时暂时无法解析，等待后续token
+                return None
+        if isinstance(args, dict) and isinstance(args.get("reply"), str):
+            return args["reply"]
+    return None
+
+
+async def stream_starter_agent(
+    user_message: str, history: Sequence = (), summary: str = ""
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    流式运行starter agent
+
+    reply 字段的文本在模型生成时即逐段返回，其余结构化字段在完整解析后随最终结果返回；
+    调用期间占用 agent_limiter 的一个名额。命中缓存时不调用模型，按相同的顺序返回缓存的结果
+
+    Args:
+        user_message: 本轮用户消息
+        history: 之前的 ChatMessage 列表
+        summary: 早期对话的摘要
+
+    Yields:
+        ("reply", 新增的回复文本) 或最后一次的 ("output", SupportOutput)
+    """
+    key = starter_cache_key(user_message, history, summary)
+    cached = response_cache.get_model(key, SupportOutput)
+    if cached is not None:
+        yield "reply", cached.reply
+        yield "output", cached
+        return
+
+    message_history = build_message_history(history, summary)
+    async with agent_limiter.slot(), starter_agent.run_stream(user_message, message_history=message_history) as result:
+        emitted = 0
+        async for message, is_last in result.stream_structured(debounce_by=None):
+            if is_last:
+                output = await result.validate_structured_output(message)
+                response_cache.put_model(key, output)
+                if len(output.reply) > emitted:
+                    yield "reply", output.reply[emitted:]
+                yield "output", output
+                return
+            reply = _partial_reply(message)
+            if reply is not None and len(reply) > emitted:
+                yield "reply", reply[emitted:]
+                emitted = len(reply)
+
+
 if __name__ == "__main__":
     results = run_starter_agent("I want to build a rocket")
     print(results.new_node_list)
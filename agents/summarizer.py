@@ -0,0 +1,40 @@
+from typing import List, Optional
+from pydantic_ai import Agent
+from agents.limiter import agent_limiter
+
+
+# 摘要的最大长度（字符）
+SUMMARY_MAX_CHARS = 600
+
+summarizer_agent = Agent(
+    model="deepseek:deepseek-chat",
+    output_type=str,
+    system_prompt=(
+        "You maintain a running summary of a conversation between a user and Eure, an assistant that helps the user "
+        "build a mindmap. Merge the previous summary and the new messages into one updated summary. Keep the user's "
+        "ideas, decisions, preferences and the mindmap nodes discussed so far. Write in the language of the "
+        f"conversation and keep it under {SUMMARY_MAX_CHARS} characters."
+    ),
+)
+
+
+async def summarize_conversation(previous_summary: str, messages: List) -> Optional[str]:
+    """
+    将新移出上下文窗口的消息增量并入摘要（受并发限制）
+
+    Args:
+        previous_summary: 之前的摘要
+        messages: 新的 ChatMessage 列表
+
+    Returns:
+        新的摘要，失败时返回None
+    """
+    transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+    prompt = f"Previous summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+    try:
+        async with agent_limiter.slot():
+            results = await summarizer_agent.run(prompt)
+        return results.output[:SUMMARY_MAX_CHARS * 2]
+    except Exception as e:
+        print(f"Summarizer agent error: {e}")
+        return None
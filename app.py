@@ -1,18 +1,32 @@
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
+import io
 import os
-import json
 import uuid
-import asyncio
-from typing import AsyncGenerator
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
 from dotenv import load_dotenv
 from message_manager import MessageManager
-from agents.starter import run_starter_agent
+from agents.starter import stream_starter_agent
+from agents.limiter import agent_limiter
+from agents.cache import response_cache
+from agents.summarizer import summarize_conversation
+from agents.single_flight import flight_key, starter_flights
+from agents.node_planner import expand_mindmap
+from agents.prefetch import expansion_prefetcher
 from nodes import MindMapNode, MindMapManager
+from nodes.layout import LAYOUT_MODES, IncrementalRadialLayout, apply_layout, compute_layout, place_new_node
+from nodes.snapshot import dump_snapshot, iter_snapshot_export
+from nodes.viewport import DEFAULT_MIN_SIZE, viewport_query
+from map_store import MapStore
+from sse import END_FRAME, chunk_frame, coalesce_text, encode_event
 
 # 加载环境变量
 load_dotenv()
@@ -35,10 +49,136 @@ templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # 初始化消息管理器
-message_manager = MessageManager(max_rounds=10)
+message_manager = MessageManager(
+    token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "2000")),
+    session_ttl=float(os.getenv("CHAT_SESSION_TTL", str(24 * 3600))),
+    memory_limit=int(os.getenv("CHAT_MEMORY_LIMIT")) if os.getenv("CHAT_MEMORY_LIMIT") else None
+)
+
+@app.on_event("startup")
+async def start_session_eviction():
+    """启动后台会话过期清理"""
+    message_manager.start_eviction()
+
+# 正在生成摘要的会话，及后台摘要任务（保留引用避免被回收）
+summarizing_sessions = set()
+summary_tasks = set()
+
+async def refresh_summary(session_id: str) -> None:
+    """将移出上下文窗口的早期消息增量并入会话摘要（每次最多一批，摘要调用的大小有上限）"""
+    summarized = False
+    try:
+        generation, previous, pending = message_manager.get_summary_batch(
+            session_id, max_tokens=message_manager.summary_batch_tokens * 2
+        )
+        summary = await summarize_conversation(previous, pending)
+        # 摘要生成期间会话被清空或这批消息已被并入时，set_summary 丢弃这份摘要
+        if summary is not None:
+            summarized = message_manager.set_summary(session_id, summary, generation, pending)
+    finally:
+        summarizing_sessions.discard(session_id)
+    # 之前失败积压的消息继续分批摘要；失败时不立即重试，等下一轮回复再调度
+    if summarized:
+        schedule_summary(session_id)
+
+def schedule_summary(session_id: str) -> None:
+    """待摘要消息足够多时在后台生成摘要，不阻塞当前回复"""
+    if session_id in summarizing_sessions or not message_manager.needs_summary(session_id):
+        return
+    summarizing_sessions.add(session_id)
+    task = asyncio.create_task(refresh_summary(session_id))
+    summary_tasks.add(task)
+    task.add_done_callback(summary_tasks.discard)
+
+# 初始化思维导图存储（按会话/导图ID管理，冷数据写入磁盘）
+map_store = MapStore(
+    storage_dir=os.getenv("MINDMAP_STORAGE_DIR", "data/maps"),
+    max_maps=int(os.getenv("MINDMAP_MAX_MAPS", "1000")),
+    max_nodes=int(os.getenv("MINDMAP_MAX_NODES")) if os.getenv("MINDMAP_MAX_NODES") else None
+)
+
+@asynccontextmanager
+async def use_map(map_id: str, create: bool = False):
+    """
+    请求期间使用导图：持有导图的锁使同一导图上的请求依次执行，并固定导图使其不会被换出内存
+    导图不存在时得到None
+    """
+    async with map_store.lock(map_id):
+        # 导图可能需要从磁盘加载（并触发冷数据写回），在线程池中进行以免阻塞事件循环
+        manager = await run_in_threadpool(map_store.acquire, map_id, create)
+        try:
+            yield manager
+        finally:
+            if manager is not None:
+                await run_in_threadpool(map_store.release, map_id)
+
+# 各导图的增量放射状布局缓存（导图对象被回收时自动丢弃）
+map_layouts = weakref.WeakKeyDictionary()
+
+# 导图元数据中记录最近一次应用的布局模式（随导图保存），未记录时按放射状布局处理
+LAYOUT_MODE_KEY = "layout_mode"
+
+def layout_mode(manager: MindMapManager) -> str:
+    """获取导图当前的布局模式"""
+    return manager.metadata.get(LAYOUT_MODE_KEY, "radial")
+
+def set_layout_mode(manager: MindMapManager, mode: str) -> None:
+    """记录导图的布局模式"""
+    if manager.metadata.get(LAYOUT_MODE_KEY) != mode:
+        manager.metadata[LAYOUT_MODE_KEY] = mode
+        manager.dirty = True
+
+def get_incremental_layout(manager: MindMapManager) -> IncrementalRadialLayout:
+    """
+    获取导图的增量放射状布局：缓存因整体布局或切断连线失效后按现有位置重建（不移动节点），
+    导图从未布局过时全量布局一次
+    """
+    layout = map_layouts.get(manager)
+    if layout is None:
+        layout = IncrementalRadialLayout(manager)
+        if LAYOUT_MODE_KEY in manager.metadata:
+            layout.restore()
+        else:
+            layout.relayout()
+            set_layout_mode(manager, "radial")
+        map_layouts[manager] = layout
+    return layout
+
+def current_layout(manager: MindMapManager):
+    """在修改导图之前获取增量放射状布局，导图不是放射状布局时返回None"""
+    return get_incremental_layout(manager) if layout_mode(manager) == "radial" else None
+
+def place_nodes(manager: MindMapManager, layout, node_ids) -> list:
+    """
+    按导图的布局模式放置新加入的节点：放射状布局增量更新，其他模式在父节点附近就近放置，都不重新计算整个布局
+
+    Args:
+        manager: 思维导图管理器
+        layout: 加入节点之前由 current_layout 取得的布局
+        node_ids: 新节点ID（父节点在前）
+
+    Returns:
+        位置发生变化的节点ID列表
+    """
+    moved = {}
+    for node_id in node_ids:
+        if layout is not None:
+            moved.update(dict.fromkeys(layout.node_added(node_id)))
+        else:
+            moved.update(dict.fromkeys(place_new_node(manager, node_id, layout_mode(manager))))
+    return list(moved)
+
+def moved_positions(manager: MindMapManager, node_ids) -> dict:
+    """按列返回位置变化的节点坐标"""
+    nodes = [manager.nodes[node_id] for node_id in node_ids]
+    return {"node_ids": list(node_ids), "x": [node._x for node in nodes], "y": [node._y for node in nodes]}
+
+@app.on_event("shutdown")
+def flush_map_store():
+    """关闭服务前将内存中的导图写入磁盘，并停止会话过期清理"""
+    map_store.flush()
+    message_manager.stop_eviction()
 
-# 初始化思维导图管理器
-mindmap_manager = MindMapManager()
 @app.get("/", response_class=HTMLResponse)
 def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -54,12 +194,17 @@ async def chat_endpoint(request: Request):
         if not user_message:
             return {"error": "消息不能为空"}
         
-        # 添加用户消息到历史
-        message_manager.add_message(session_id, "user", user_message)
+        # 同一会话的相同消息正在处理时（重试、多个标签页）合并到进行中的调用，不重复记录消息
+        key = flight_key(session_id, user_message)
+        message_seq = None
+        if not starter_flights.in_flight(key):
+            # 添加用户消息到历史
+            message_seq = message_manager.add_message(session_id, "user", user_message)
+        events, _ = starter_flights.subscribe(key, lambda: starter_agent_events(user_message, session_id, message_seq))
         
         # 返回流式响应
         return StreamingResponse(
-            stream_starter_agent_response(user_message, session_id),
+            stream_starter_agent_response(events),
             media_type="text/plain"
         )
         
@@ -75,6 +220,7 @@ async def clear_chat(request: Request):
         
         if session_id:
             message_manager.clear_conversation(session_id)
+            expansion_prefetcher.discard(session_id)
             return {"message": "聊天历史已清空"}
         else:
             return {"error": "缺少session_id"}
@@ -82,6 +228,44 @@ async def clear_chat(request: Request):
     except Exception as e:
         return {"error": f"清空聊天历史时出错: {str(e)}"}
 
+@app.post("/chat/focus")
+async def focus_node(request: Request):
+    """
+    用户聚焦节点时获取该节点的扩展建议（请求体包含 session_id、title，可选 content）
+    聚焦的是预取过的建议节点时直接返回预取结果，否则取消预取并现场规划
+    """
+    try:
+        data = await request.json()
+        session_id = data.get("session_id")
+        title = data.get("title", "")
+        if not session_id or not title:
+            return {"error": "缺少session_id或title"}
+        
+        content = data.get("content", "")
+        result = await expansion_prefetcher.focus(session_id, title, f"{title}: {content}" if content else title)
+        if result is None:
+            return {"error": "Agent处理失败"}
+        return {
+            "buid_new_nodes": result.buid_new_nodes,
+            "child_nodes": [
+                {"title": node_info.name, "content": node_info.description or "", "node_type": "subtask"}
+                for node_info in result.new_node_list
+            ]
+        }
+    except Exception as e:
+        return {"error": f"获取扩展建议时出错: {str(e)}"}
+
+@app.get("/agents/stats")
+async def get_agent_stats():
+    """获取agent调用的并发、排队、结果缓存、请求合并和预取统计，以及会话存储统计"""
+    return {
+        **agent_limiter.get_stats(),
+        "cache": response_cache.get_stats(),
+        "single_flight": starter_flights.get_stats(),
+        "prefetch": expansion_prefetcher.get_stats(),
+        "conversations": message_manager.get_stats()
+    }
+
 @app.get("/chat/info/{session_id}")
 async def get_chat_info(session_id: str):
     """获取会话信息"""
@@ -91,27 +275,274 @@ async def get_chat_info(session_id: str):
     except Exception as e:
         return {"error": f"获取会话信息时出错: {str(e)}"}
 
-async def stream_starter_agent_response(user_message: str, session_id: str) -> AsyncGenerator[str, None]:
-    """使用starter_agent的流式响应生成器"""
+# 导出下载时每次发送的数据块大小（字节），避免逐节点发送过多小块
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def iter_export_chunks(lines, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """将逐行导出的JSON合并为较大的数据块"""
+    chunk = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b"".join(chunk)
+
+@app.get("/mindmap/{map_id}")
+async def get_mindmap(map_id: str):
+    """获取思维导图"""
+    async with use_map(map_id) as manager:
+        if manager is None:
+            return {"error": "思维导图不存在"}
+        # 持有导图的锁期间没有其他请求修改导图，可以在线程池中导出
+        return await run_in_threadpool(manager.export_to_dict)
+
+@app.post("/mindmap/{map_id}")
+async def save_mindmap(map_id: str, request: Request):
+    """保存思维导图（请求体为 export_to_dict 格式）"""
     try:
-        # 在线程池中运行starter_agent（因为它是同步的）
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, run_starter_agent, user_message)
+        data = await request.json()
+        data["mindmap_id"] = map_id
+        manager = MindMapManager.from_dict(data)
+        async with map_store.lock(map_id):
+            await run_in_threadpool(map_store.put, map_id, manager)
+        return {"message": "思维导图已保存"}
+    except Exception as e:
+        return {"error": f"保存思维导图时出错: {str(e)}"}
+
+@app.post("/mindmap/{map_id}/expand")
+async def expand_mindmap_nodes(map_id: str, request: Request):
+    """
+    自动扩展思维导图：请求体可包含 node_ids（默认为所有叶子节点）、levels（1-3层）、message（扩展指令）、max_nodes
+    每层的父节点批量规划，新节点一次批量插入
+    """
+    try:
+        data = await request.json()
+        # 规划期间导图被固定在内存中，新节点不会加入已被换出的旧对象
+        async with use_map(map_id) as manager:
+            if manager is None:
+                return {"error": "思维导图不存在"}
+            
+            node_ids = data.get("node_ids") or [node.node_id for node in manager.get_leaf_nodes()]
+            options = {
+                "levels": min(max(int(data.get("levels", 1)), 1), 3),
+                "max_nodes": int(data.get("max_nodes", 500))
+            }
+            if data.get("message"):
+                options["user_message"] = data["message"]
+            layout = current_layout(manager)
+            added = await expand_mindmap(manager, node_ids, **options)
+            added = [node_id for node_id in added if node_id in manager.nodes]
+            moved = place_nodes(manager, layout, added)
+            return {
+                "added": [manager.nodes[node_id].to_dict() for node_id in added],
+                "moved": moved_positions(manager, moved)
+            }
+    except Exception as e:
+        return {"error": f"扩展思维导图时出错: {str(e)}"}
+
+@app.post("/mindmap/{map_id}/layout")
+async def layout_mindmap(map_id: str, request: Request):
+    """
+    在服务端计算整个导图的布局（请求体可包含 mode: radial/tree/tidy/force，apply: 是否写回节点位置，默认写回）
+    force 模式从当前位置继续迭代，可用 iterations（默认50，最多500）和 time_budget（秒）限制计算量
+    写回时记住导图的布局模式，之后添加的节点按该模式放置
+    返回按列排列的坐标 {"node_ids": [...], "x": [...], "y": [...]}，前端无需自行计算布局
+    """
+    try:
+        data = await request.json()
+        mode = data.get("mode", "radial")
+        if mode not in LAYOUT_MODES:
+            return {"error": f"未知的布局模式: {mode}"}
+        async with use_map(map_id) as manager:
+            if manager is None:
+                return {"error": "思维导图不存在"}
+            
+            options = {}
+            if mode == "force":
+                options["iterations"] = max(1, min(int(data.get("iterations", 50)), 500))
+                if data.get("time_budget") is not None:
+                    options["time_budget"] = float(data["time_budget"])
+            layout = compute_layout(manager, mode, **options)
+            if data.get("apply", True):
+                apply_layout(manager, layout)
+                set_layout_mode(manager, mode)
+                # 位置已被整体替换，增量布局缓存失效（放射状模式下次使用时按新位置重建）
+                map_layouts.pop(manager, None)
+            return {"mode": mode, **layout.to_dict()}
+    except Exception as e:
+        return {"error": f"计算布局时出错: {str(e)}"}
+
+@app.post("/mindmap/{map_id}/nodes")
+async def add_mindmap_node(map_id: str, request: Request):
+    """
+    添加节点（请求体包含 title，可选 content、node_type、parent_id，未指定父节点时添加到焦点节点下）
+    按导图的布局模式放置新节点（放射状布局增量更新），只返回位置发生变化的节点坐标
+    """
+    try:
+        data = await request.json()
+        async with use_map(map_id) as manager:
+            if manager is None:
+                return {"error": "思维导图不存在"}
+            
+            layout = current_layout(manager)
+            node = MindMapNode(
+                title=data.get("title", ""),
+                content=data.get("content", ""),
+                node_type=data.get("node_type", "idea"),
+                parent_id=data.get("parent_id")
+            )
+            added = manager.add_node(node) if node.parent_id else manager.add_child_to_focus_node(node)
+            if not added:
+                return {"error": "添加节点失败"}
+            moved = place_nodes(manager, layout, [node.node_id])
+            return {"node": node.to_dict(), "moved": moved_positions(manager, moved)}
+    except Exception as e:
+        return {"error": f"添加节点时出错: {str(e)}"}
+
+@app.delete("/mindmap/{map_id}/nodes/{node_id}")
+async def remove_mindmap_node(map_id: str, node_id: str):
+    """删除节点，放射状布局增量更新，只返回位置发生变化的节点坐标"""
+    async with use_map(map_id) as manager:
+        if manager is None or node_id not in manager.nodes:
+            return {"error": "节点不存在"}
         
-        if result is None:
-            yield f"data: {json.dumps({'error': 'Agent处理失败', 'type': 'error'})}\n\n"
-            return
+        layout = current_layout(manager)
+        parent_id = manager.nodes[node_id].parent_id
+        manager.remove_node(node_id)
+        moved = layout.node_removed(node_id, parent_id) if layout is not None else []
+        return {"moved": moved_positions(manager, moved)}
+
+@app.post("/mindmap/{map_id}/cut")
+async def cut_mindmap_edges(map_id: str, request: Request):
+    """
+    批量切断父子连线（请求体包含 points: 切割轨迹 [[x, y], ...]（画布坐标），或 edges: [[父节点ID, 子节点ID], ...]）
+    被切断的子节点连同子树成为根节点，整批作为一次操作写入
+    """
+    try:
+        data = await request.json()
+        async with use_map(map_id) as manager:
+            if manager is None:
+                return {"error": "思维导图不存在"}
+            
+            if "points" in data:
+                cut_ids = manager.cut_crossed_edges([(float(x), float(y)) for x, y in data["points"]])
+            else:
+                cut_ids = manager.cut_edges([(parent_id, child_id) for parent_id, child_id in data.get("edges", [])])
+            if cut_ids:
+                # 结构变化，增量布局缓存失效，下次使用时按现有位置重建，节点不会被整体重新布局
+                map_layouts.pop(manager, None)
+            return {"cut": cut_ids}
+    except Exception as e:
+        return {"error": f"切断连线时出错: {str(e)}"}
+
+@app.get("/mindmap/{map_id}/viewport")
+async def get_mindmap_viewport(
+    map_id: str,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    zoom: float = 1.0,
+    min_size: float = DEFAULT_MIN_SIZE
+):
+    """
+    获取视口内需要绘制的部分（视口为画布坐标矩形，zoom 为屏幕像素 / 画布单位）
+    折叠的子树和屏幕上小于 min_size 像素的子树以聚合节点返回，大导图的前端只需绘制这些元素
+    """
+    async with use_map(map_id) as manager:
+        if manager is None:
+            return {"error": "思维导图不存在"}
+        try:
+            # 持有导图的锁期间没有其他请求修改导图；首次查询需要全量计算子树包围盒，放到线程池中
+            return await run_in_threadpool(viewport_query, manager, min_x, min_y, max_x, max_y, zoom, min_size)
+        except Exception as e:
+            return {"error": f"查询视口时出错: {str(e)}"}
+
+def snapshot_bytes(manager: MindMapManager) -> bytes:
+    """在内存中生成导图的二进制快照"""
+    buffer = io.BytesIO()
+    dump_snapshot(manager, buffer)
+    return buffer.getvalue()
+
+@app.get("/mindmap/{map_id}/export")
+async def export_mindmap(map_id: str):
+    """
+    以逐行JSON（NDJSON）流式下载思维导图，不在内存中构建完整文档
+    持有导图的锁生成紧凑的二进制快照后即释放，之后由快照逐行导出：导出内容不会被并发修改撕裂，下载较慢时也不阻塞对导图的修改
+    """
+    async with use_map(map_id) as manager:
+        if manager is None:
+            return {"error": "思维导图不存在"}
+        data = await run_in_threadpool(snapshot_bytes, manager)
+    return StreamingResponse(
+        iter_export_chunks(iter_snapshot_export(data)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{map_id}.ndjson"'}
+    )
+
+async def starter_agent_events(user_message: str, session_id: str, message_seq: Optional[int] = None):
+    """
+    发起一次starter_agent调用并转发其事件（由请求合并器在独立任务中运行），
+    助手回复在这里记录一次，与订阅的客户端数量及其是否断开无关
+
+    Args:
+        user_message: 本轮用户消息
+        session_id: 会话ID
+        message_seq: 本轮用户消息在会话中的序号，从历史中按序号排除（同一会话的其他消息可能已追加在其后）
+    """
+    # 上下文：早期对话摘要 + 尚未并入摘要的最近消息（不超过token预算） + 窗口内消息（不含本轮用户消息）
+    history = [
+        message for message in message_manager.get_pending_context(session_id) + message_manager.get_context_messages(session_id)
+        if message.seq != message_seq
+    ]
+    summary = message_manager.get_summary(session_id)
+    
+    async for kind, value in stream_starter_agent(user_message, history, summary):
+        if kind == "output":
+            # 添加助手回复到历史
+            message_manager.add_message(session_id, "assistant", value.reply)
+            schedule_summary(session_id)
+            if value.start_mindmap and value.dicuss_next:
+                schedule_prefetch(session_id, value)
+        yield kind, value
+
+def schedule_prefetch(session_id: str, result) -> None:
+    """回复完成后在后台预取建议讨论的下一个节点的扩展"""
+    description = result.dicuss_next
+    for node_info in result.new_node_list or []:
+        if node_info.name == result.dicuss_next and node_info.description:
+            description = f"{node_info.name}: {node_info.description}"
+            break
+    expansion_prefetcher.schedule(session_id, result.dicuss_next, description)
+
+async def stream_starter_agent_response(events) -> AsyncGenerator[str, None]:
+    """使用starter_agent的流式响应生成器，转发（可能被多个请求共享的）调用事件"""
+    try:
+        # 模型生成回复文本时即转发，结构化字段在完整解析后返回
+        outputs = []
         
-        # 构建响应文本
-        response_text = result.reply
+        async def reply_pieces():
+            async for kind, value in events:
+                if kind == "reply":
+                    yield value
+                else:
+                    outputs.append(value)
         
-        # 模拟流式输出（逐字符发送）
-        for char in response_text:
-            yield f"data: {json.dumps({'content': char, 'type': 'chunk'})}\n\n"
-            await asyncio.sleep(0.01)  # 模拟打字效果
+        # 按时间/字节合并回复文本，减少帧数
+        async for text in coalesce_text(reply_pieces()):
+            yield chunk_frame(text)
+        
+        if not outputs:
+            yield encode_event({'error': 'Agent处理失败', 'type': 'error'})
+            return
         
-        # 添加助手回复到历史
-        message_manager.add_message(session_id, "assistant", response_text)
+        result = outputs[0]
         
         # 如果启动思维导图，发送节点创建指令给前端
         if result.start_mindmap:
@@ -136,15 +567,15 @@ async def stream_starter_agent_response(user_message: str, session_id: str) -> A
                         "node_type": "subtask"
                     })
             
-            yield f"data: {json.dumps(mindmap_instruction)}\n\n"
+            yield encode_event(mindmap_instruction)
         
         # 发送完成信号
-        yield f"data: {json.dumps({'content': '', 'type': 'end'})}\n\n"
+        yield END_FRAME
         
     except Exception as e:
         # 发送错误信息
         print(f"Starter agent error: {str(e)}")
-        yield f"data: {json.dumps({'error': str(e), 'type': 'error'})}\n\n"
+        yield encode_event({'error': str(e), 'type': 'error'})
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
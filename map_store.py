@@ -0,0 +1,426 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+import asyncio
+import os
+import threading
+import weakref
+from nodes import MindMapManager
+from nodes.snapshot import SNAPSHOT_EXTENSION
+
+
+class MapStore:
+    """
+    多思维导图存储
+    以会话ID或导图ID为键管理 MindMapManager 实例：热数据常驻内存，超出数量或节点数预算时
+    按最近最少使用（LRU）淘汰，淘汰的导图以二进制快照格式写入磁盘，再次访问时按需加载；
+    只有自上次写入或加载后被修改过（manager.dirty）的导图才会写回，写入先写临时文件再原子替换
+
+    读写磁盘时不持有全局锁，只阻塞同一导图的其他读写；请求期间使用 acquire / release 固定导图，
+    被固定的导图不会被淘汰。get / put / acquire / release 可能读写磁盘，异步代码中应放到线程池中调用
+    """
+
+    def __init__(
+        self,
+        storage_dir: str = "data/maps",
+        max_maps: int = 1000,
+        max_nodes: Optional[int] = None
+    ):
+        """
+        初始化导图存储
+
+        Args:
+            storage_dir: 冷数据快照的存放目录
+            max_maps: 内存中最多保留的导图数
+            max_nodes: 内存中所有导图的节点总数上限（近似内存预算），None表示不限制
+        """
+        self.storage_dir = storage_dir
+        self.max_maps = max_maps
+        self.max_nodes = max_nodes
+        self._maps: "OrderedDict[str, MindMapManager]" = OrderedDict()
+        # 各导图放入内存或上次访问时的节点数及其总和，检查预算时无需遍历所有导图
+        self._sizes: Dict[str, int] = {}
+        self._node_count = 0
+        # 正在使用的导图的引用计数
+        self._pins: Dict[str, int] = {}
+        # 正在从磁盘加载或写入磁盘的导图，同一导图的其他读写等待其完成
+        self._busy: Set[str] = set()
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        # 各导图的异步锁，无人持有或等待时自动回收
+        self._map_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.writes = 0
+
+        os.makedirs(storage_dir, exist_ok=True)
+
+    def _path(self, map_id: str) -> str:
+        """
+        获取导图快照文件路径
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            快照文件路径
+        """
+        return os.path.join(self.storage_dir, quote(map_id, safe="") + SNAPSHOT_EXTENSION)
+
+    def get(self, map_id: str) -> Optional[MindMapManager]:
+        """
+        获取导图，不在内存中时从磁盘加载
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            思维导图管理器，如果不存在则返回None
+        """
+        with self._lock:
+            self._wait_idle(map_id)
+            manager = self._maps.get(map_id)
+            if manager is not None:
+                self._maps.move_to_end(map_id)
+                self.hits += 1
+                # 热数据在内存中被修改后节点数可能增长，访问时也检查预算
+                self._resize(map_id)
+                victims = self._select_victims()
+            else:
+                self.misses += 1
+                path = self._path(map_id)
+                if not os.path.exists(path):
+                    return None
+                self._busy.add(map_id)
+
+        if manager is None:
+            manager, victims = self._load(map_id, path)
+        self._spill(victims)
+        return manager
+
+    def get_or_create(self, map_id: str) -> MindMapManager:
+        """
+        获取导图，不存在时创建新导图
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            思维导图管理器
+        """
+        while True:
+            manager = self.get(map_id)
+            if manager is not None:
+                return manager
+            with self._lock:
+                self._wait_idle(map_id)
+                # 其间可能已被其他线程创建（甚至已被淘汰到磁盘），重新获取
+                if map_id in self._maps or os.path.exists(self._path(map_id)):
+                    continue
+                manager = MindMapManager(mindmap_id=map_id)
+                victims = self._insert(map_id, manager)
+            self._spill(victims)
+            return manager
+
+    def acquire(self, map_id: str, create: bool = False) -> Optional[MindMapManager]:
+        """
+        获取并固定导图，调用 release 之前导图不会被淘汰，期间的修改不会丢失
+
+        Args:
+            map_id: 导图ID
+            create: 不存在时是否创建新导图
+
+        Returns:
+            思维导图管理器，如果不存在则返回None
+        """
+        while True:
+            manager = self.get_or_create(map_id) if create else self.get(map_id)
+            if manager is None:
+                return None
+            with self._lock:
+                # 返回前可能已被其他线程淘汰，只固定仍在内存中的同一个实例
+                if self._maps.get(map_id) is manager:
+                    self._pins[map_id] = self._pins.get(map_id, 0) + 1
+                    return manager
+
+    def release(self, map_id: str) -> None:
+        """
+        解除 acquire 的固定，并按导图当前的节点数检查预算
+
+        Args:
+            map_id: 导图ID
+        """
+        with self._lock:
+            count = self._pins.get(map_id, 0) - 1
+            if count > 0:
+                self._pins[map_id] = count
+            else:
+                self._pins.pop(map_id, None)
+            if map_id in self._maps:
+                self._resize(map_id)
+            victims = self._select_victims()
+        self._spill(victims)
+
+    def lock(self, map_id: str) -> asyncio.Lock:
+        """
+        获取导图的异步锁，异步端点持有该锁使同一导图上的请求依次执行
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            该导图的 asyncio.Lock
+        """
+        with self._lock:
+            lock = self._map_locks.get(map_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._map_locks[map_id] = lock
+            return lock
+
+    def put(self, map_id: str, manager: MindMapManager) -> None:
+        """
+        存入导图（替换同ID的导图）
+
+        Args:
+            map_id: 导图ID
+            manager: 思维导图管理器
+        """
+        with self._lock:
+            self._wait_idle(map_id)
+            self._discard(map_id)
+            victims = self._insert(map_id, manager)
+        self._spill(victims)
+
+    def remove(self, map_id: str) -> bool:
+        """
+        删除导图（内存和磁盘）
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            是否删除成功
+        """
+        with self._lock:
+            self._wait_idle(map_id)
+            removed = self._discard(map_id) is not None
+            path = self._path(map_id)
+            if os.path.exists(path):
+                os.remove(path)
+                removed = True
+            return removed
+
+    def _wait_idle(self, map_id: str) -> None:
+        """
+        等待导图的加载或写盘完成（需持有锁）
+
+        Args:
+            map_id: 导图ID
+        """
+        while map_id in self._busy:
+            self._idle.wait()
+
+    def _load(self, map_id: str, path: str) -> Tuple[Optional[MindMapManager], List[Tuple[str, MindMapManager]]]:
+        """
+        在锁外从磁盘加载导图（调用前已标记为正在读写），加载后放入内存
+
+        Args:
+            map_id: 导图ID
+            path: 快照文件路径
+
+        Returns:
+            (思维导图管理器（失败时为None）, 需要写盘淘汰的导图)
+        """
+        manager = None
+        victims = []
+        try:
+            manager = MindMapManager.load_from_file(path)
+        finally:
+            with self._lock:
+                self._busy.discard(map_id)
+                self._idle.notify_all()
+                if manager is not None:
+                    manager.dirty = False
+                    self.loads += 1
+                    victims = self._insert(map_id, manager)
+        return manager, victims
+
+    def _insert(self, map_id: str, manager: MindMapManager) -> List[Tuple[str, MindMapManager]]:
+        """
+        将导图放入内存并选出超出预算需要淘汰的导图（需持有锁）
+
+        Args:
+            map_id: 导图ID
+            manager: 思维导图管理器
+
+        Returns:
+            需要写盘淘汰的导图
+        """
+        self._maps[map_id] = manager
+        self._sizes[map_id] = 0
+        self._resize(map_id)
+        return self._select_victims()
+
+    def _discard(self, map_id: str) -> Optional[MindMapManager]:
+        """
+        将导图移出内存（需持有锁）
+
+        Args:
+            map_id: 导图ID
+
+        Returns:
+            被移出的管理器，不在内存中时返回None
+        """
+        manager = self._maps.pop(map_id, None)
+        if manager is not None:
+            self._node_count -= self._sizes.pop(map_id)
+        return manager
+
+    def _resize(self, map_id: str) -> None:
+        """
+        按导图当前的节点数更新节点总数（需持有锁）
+
+        Args:
+            map_id: 导图ID
+        """
+        size = len(self._maps[map_id].nodes)
+        self._node_count += size - self._sizes[map_id]
+        self._sizes[map_id] = size
+
+    def _over_budget(self, map_count: int, node_count: int) -> bool:
+        """
+        判断内存中的导图是否超出预算
+
+        Args:
+            map_count: 导图数
+            node_count: 节点总数
+
+        Returns:
+            是否超出预算
+        """
+        return map_count > self.max_maps or (self.max_nodes is not None and node_count > self.max_nodes)
+
+    def _select_victims(self) -> List[Tuple[str, MindMapManager]]:
+        """
+        按最近最少使用顺序选出需要淘汰的导图直到满足预算（最近访问的和被固定的导图不淘汰），
+        将其移出内存并标记为正在写盘（需持有锁，写盘由 _spill 在锁外完成）
+
+        Returns:
+            需要写盘淘汰的导图
+        """
+        map_count, node_count = len(self._maps), self._node_count
+        if map_count <= 1 or not self._over_budget(map_count, node_count):
+            return []
+        newest = next(reversed(self._maps))
+        chosen = []
+        for map_id in self._maps:
+            if not self._over_budget(map_count, node_count):
+                break
+            if map_id == newest or map_id in self._pins:
+                continue
+            chosen.append(map_id)
+            map_count -= 1
+            node_count -= self._sizes[map_id]
+
+        victims = []
+        for map_id in chosen:
+            victims.append((map_id, self._discard(map_id)))
+            self._busy.add(map_id)
+        return victims
+
+    def _spill(self, victims: List[Tuple[str, MindMapManager]]) -> None:
+        """
+        在锁外将淘汰的导图写入磁盘，写入失败的导图放回内存
+
+        Args:
+            victims: (导图ID, 管理器) 列表
+        """
+        for map_id, manager in victims:
+            saved = False
+            try:
+                saved = self._save(map_id, manager)
+            finally:
+                with self._lock:
+                    self._busy.discard(map_id)
+                    self._idle.notify_all()
+                    if saved:
+                        self.evictions += 1
+                    else:
+                        print(f"导图 {map_id} 写入磁盘失败，保留在内存中")
+                        self._maps[map_id] = manager
+                        self._maps.move_to_end(map_id, last=False)
+                        self._sizes[map_id] = 0
+                        self._resize(map_id)
+
+    def _save(self, map_id: str, manager: MindMapManager) -> bool:
+        """
+        将有修改的导图写入磁盘，未修改且磁盘上已有快照时跳过
+
+        Args:
+            map_id: 导图ID
+            manager: 思维导图管理器
+
+        Returns:
+            磁盘上的快照是否为最新
+        """
+        path = self._path(map_id)
+        if not manager.dirty and os.path.exists(path):
+            return True
+        if not manager.save_to_file(path):
+            return False
+        manager.dirty = False
+        with self._lock:
+            self.writes += 1
+        return True
+
+    def node_count(self) -> int:
+        """
+        获取内存中导图的节点总数（按各导图放入内存、上次访问或释放时的节点数统计）
+
+        Returns:
+            节点总数
+        """
+        with self._lock:
+            return self._node_count
+
+    def flush(self) -> None:
+        """
+        将内存中的所有导图写入磁盘（用于关闭服务前）
+        """
+        with self._lock:
+            for map_id, manager in self._maps.items():
+                self._save(map_id, manager)
+
+    def hot_map_ids(self) -> List[str]:
+        """
+        获取内存中的导图ID（从最久未使用到最近使用）
+
+        Returns:
+            导图ID列表
+        """
+        with self._lock:
+            return list(self._maps)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "hot_maps": len(self._maps),
+                "hot_nodes": self._node_count,
+                "pinned_maps": len(self._pins),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "writes": self.writes
+            }
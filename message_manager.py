@@ -1,27 +1,145 @@
-from typing import List, Dict
+from collections import OrderedDict, deque
+from typing import Deque, List, Dict, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import re
+import threading
 import time
 
+# 中日韩字符（每字约1个token）
+_CJK_PATTERN = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+# 会话代数：会话创建或清空时取新值，在途的摘要据此识别会话已被清空或重建
+_generations = itertools.count(1)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数：中日韩字符每字按1个token，其余字符每4个按1个token
+    
+    Args:
+        text: 文本
+        
+    Returns:
+        估算的token数
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
 class ChatMessage:
-    def __init__(self, role: str, content: str):
+    __slots__ = ("role", "content", "tokens", "seq")
+    
+    def __init__(self, role: str, content: str, seq: int = 0):
         self.role = role
         self.content = content
+        self.tokens = estimate_tokens(content)  # 缓存的token估算值
+        self.seq = seq  # 会话内的消息序号，按添加顺序递增
+
+class Conversation:
+    """
+    单个会话的状态：上下文窗口内的消息、待摘要消息、摘要及访问时间
+    消息以双端队列保存，追加和从头部移出都是O(1)
+    """
+    __slots__ = (
+        "messages", "window_tokens", "pending_summary", "pending_tokens", "summary",
+        "created_at", "last_access", "memory", "generation", "next_seq"
+    )
+    
+    def __init__(self):
+        self.messages: Deque[ChatMessage] = deque()
+        # 上下文窗口内消息的token总数
+        self.window_tokens = 0
+        # 已移出窗口、尚未并入摘要的消息
+        self.pending_summary: Deque[ChatMessage] = deque()
+        self.pending_tokens = 0
+        # 更早对话的摘要（增量更新）
+        self.summary: Optional[str] = None
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # 占用的内存（按消息和摘要的字符数估算）
+        self.memory = 0
+        self.generation = next(_generations)
+        # 下一条消息的序号
+        self.next_seq = 1
+
+class _Shard:
+    """
+    会话分片：每个分片有自己的锁、按最近访问排序的会话表和过期堆
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        # (记录时的最近访问时间, 会话ID) 最小堆；会话被访问后堆中的时间会过时，弹出时再按实际时间重新入堆
+        self.expiry_heap: List = []
+        self.memory = 0
 
 class MessageManager:
     def __init__(
         self, 
         system_prompt: str = "你是Eure，善于启发用户的灵感。",
-        max_rounds: int = 10
+        max_rounds: Optional[int] = None,
+        token_budget: int = 2000,
+        summary_batch_tokens: int = 500,
+        session_ttl: float = 24 * 3600,
+        memory_limit: Optional[int] = None,
+        num_shards: int = 16
     ):
         """
         初始化消息管理器
         
         Args:
-            max_rounds: 最大对话轮数，默认10轮
+            max_rounds: 最大对话轮数，None表示只按token预算限制
+            token_budget: 上下文窗口的token预算，超出的早期消息移入待摘要列表
+            summary_batch_tokens: 待摘要消息累计超过该token数时才生成摘要，避免每轮都调用摘要模型
+            session_ttl: 会话在最后一次访问后保留的时间（秒），由 evict_expired 或后台清理任务移除
+            memory_limit: 所有会话占用内存的上限（按字符数估算），超出时移除最久未访问的会话，None表示不限制
+            num_shards: 会话分片数，不同分片的会话可以并发访问
         """
         self.system_prompt = system_prompt
         self.max_rounds = max_rounds
-        self.conversations: Dict[str, List[ChatMessage]] = {}
-        self.conversation_timestamps: Dict[str, float] = {}
+        self.token_budget = token_budget
+        self.summary_batch_tokens = summary_batch_tokens
+        self.session_ttl = session_ttl
+        self.memory_limit = memory_limit
+        self._shards = [_Shard() for _ in range(num_shards)]
+        self._eviction_task: Optional[asyncio.Task] = None
+        
+        # 统计信息
+        self.expired = 0
+        self.evicted = 0
+    
+    def _shard(self, session_id: str) -> _Shard:
+        """
+        获取会话所在的分片
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            分片
+        """
+        return self._shards[hash(session_id) % len(self._shards)]
+    
+    def _access(self, shard: _Shard, session_id: str) -> Conversation:
+        """
+        获取或创建会话并记录访问（调用方需持有分片锁）
+        
+        Args:
+            shard: 会话所在的分片
+            session_id: 会话ID
+            
+        Returns:
+            会话状态
+        """
+        conversation = shard.sessions.get(session_id)
+        if conversation is None:
+            conversation = Conversation()
+            shard.sessions[session_id] = conversation
+            heapq.heappush(shard.expiry_heap, (conversation.last_access, session_id))
+        else:
+            conversation.last_access = time.time()
+            shard.sessions.move_to_end(session_id)
+        return conversation
     
     def get_or_create_conversation(self, session_id: str) -> List[ChatMessage]:
         """
@@ -31,14 +149,13 @@ class MessageManager:
             session_id: 会话ID
             
         Returns:
-            会话消息列表
+            会话消息列表（副本）
         """
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-            self.conversation_timestamps[session_id] = time.time()
-        return self.conversations[session_id]
+        shard = self._shard(session_id)
+        with shard.lock:
+            return list(self._access(shard, session_id).messages)
     
-    def add_message(self, session_id: str, role: str, content: str) -> None:
+    def add_message(self, session_id: str, role: str, content: str) -> int:
         """
         添加消息到会话
         
@@ -46,13 +163,27 @@ class MessageManager:
             session_id: 会话ID
             role: 消息角色 ('user' 或 'assistant')
             content: 消息内容
+            
+        Returns:
+            消息序号（见 ChatMessage.seq）
         """
-        conversation = self.get_or_create_conversation(session_id)
         message = ChatMessage(role=role, content=content)
-        conversation.append(message)
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = self._access(shard, session_id)
+            message.seq = conversation.next_seq
+            conversation.next_seq += 1
+            conversation.messages.append(message)
+            conversation.window_tokens += message.tokens
+            conversation.memory += len(content)
+            shard.memory += len(content)
+            
+            # 按token预算（及可选的轮数上限）限制上下文窗口
+            self._limit_conversation_window(conversation)
         
-        # 检查并限制对话轮数
-        self._limit_conversation_rounds(session_id)
+        if self.memory_limit is not None:
+            self._enforce_memory_limit()
+        return message.seq
     
     def get_context_messages(self, session_id: str) -> List[ChatMessage]:
         """
@@ -62,27 +193,153 @@ class MessageManager:
             session_id: 会话ID
             
         Returns:
-            对话历史
+            上下文窗口内的对话历史（不含已移出窗口的早期消息，其内容见 get_summary 和 get_summary_batch）
         """
-        conversation = self.get_or_create_conversation(session_id)
-        return conversation
+        return self.get_or_create_conversation(session_id)
+    
+    def _limit_conversation_window(self, conversation: Conversation) -> None:
+        """
+        限制上下文窗口：从最早的消息开始移出，直到窗口token数不超过预算，
+        移出的消息放入待摘要列表；最新一条消息总是保留
+        
+        Args:
+            conversation: 会话状态
+        """
+        messages = conversation.messages
+        pending = conversation.pending_summary
+        keep_messages = self.max_rounds * 2 if self.max_rounds is not None else len(messages)
+        
+        # 每条消息的token数在创建时已缓存，移出时只需减去
+        while len(messages) > 1 and (
+            conversation.window_tokens > self.token_budget or len(messages) > keep_messages
+        ):
+            message = messages.popleft()
+            conversation.window_tokens -= message.tokens
+            conversation.pending_tokens += message.tokens
+            pending.append(message)
+    
+    def get_summary(self, session_id: str) -> str:
+        """
+        获取会话早期对话的摘要
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            摘要文本，没有时为空字符串
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = shard.sessions.get(session_id)
+            return (conversation.summary or "") if conversation is not None else ""
+    
+    def get_summary_batch(
+        self, session_id: str, max_tokens: Optional[int] = None
+    ) -> Tuple[int, str, List[ChatMessage]]:
+        """
+        获取生成摘要所需的会话状态：会话代数、当前摘要和已移出窗口、尚未并入摘要的消息（从最早的开始）
+        
+        Args:
+            session_id: 会话ID
+            max_tokens: 返回消息的token总数上限，None表示全部返回；
+                至少返回一条消息，使单条超长消息也能被摘要移出
+            
+        Returns:
+            (会话代数, 摘要文本, 消息列表（副本）)，会话不存在时为 (0, "", [])
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = shard.sessions.get(session_id)
+            if conversation is None:
+                return 0, "", []
+            batch = []
+            tokens = 0
+            for message in conversation.pending_summary:
+                if max_tokens is not None and batch and tokens + message.tokens > max_tokens:
+                    break
+                batch.append(message)
+                tokens += message.tokens
+            return conversation.generation, conversation.summary or "", batch
+    
+    def get_pending_context(self, session_id: str) -> List[ChatMessage]:
+        """
+        获取放入提示词的待摘要消息：只保留最近的、token总数不超过 token_budget 的部分，
+        摘要模型失败导致待摘要消息堆积时提示词大小仍然有上限
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            消息列表（按时间顺序）
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = shard.sessions.get(session_id)
+            if conversation is None:
+                return []
+            recent = []
+            tokens = 0
+            for message in reversed(conversation.pending_summary):
+                if tokens + message.tokens > self.token_budget:
+                    break
+                recent.append(message)
+                tokens += message.tokens
+            recent.reverse()
+            return recent
     
-    def _limit_conversation_rounds(self, session_id: str) -> None:
+    def needs_summary(self, session_id: str) -> bool:
         """
-        限制对话轮数，保持最新的对话
+        判断待摘要消息是否已累计到需要生成摘要
         
         Args:
             session_id: 会话ID
+            
+        Returns:
+            是否需要生成摘要
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = shard.sessions.get(session_id)
+            return conversation is not None and conversation.pending_tokens >= self.summary_batch_tokens
+    
+    def set_summary(self, session_id: str, summary: str, generation: int, summarized: List[ChatMessage]) -> bool:
         """
-        conversation = self.conversations[session_id]
+        更新摘要，并移除已并入摘要的待摘要消息
         
-        # 计算当前轮数（每轮包含用户和助手各一条消息）
-        current_rounds = len(conversation) // 2
+        摘要生成期间会话可能被清空、过期重建，或待摘要消息已被其他摘要并入，
+        此时会话代数或待摘要消息的序号范围与生成时不同，丢弃这份摘要
         
-        if current_rounds > self.max_rounds:
-            # 保留最新的 max_rounds 轮对话
-            keep_messages = self.max_rounds * 2
-            self.conversations[session_id] = conversation[-keep_messages:]
+        Args:
+            session_id: 会话ID
+            summary: 新的摘要（已包含之前的摘要内容）
+            generation: 生成摘要时的会话代数（见 get_summary_batch）
+            summarized: 本次并入摘要的待摘要消息（从最早的开始，见 get_summary_batch）
+            
+        Returns:
+            摘要是否被采用
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = shard.sessions.get(session_id)
+            if conversation is None or conversation.generation != generation:
+                return False
+            pending = conversation.pending_summary
+            # 待摘要消息的序号连续，首条序号相同且数量足够即说明覆盖的范围未变
+            if summarized and (
+                len(pending) < len(summarized)
+                or pending[0].seq != summarized[0].seq
+                or pending[len(summarized) - 1].seq != summarized[-1].seq
+            ):
+                return False
+            freed = len(conversation.summary or "") - len(summary)
+            for _ in range(len(summarized)):
+                message = pending.popleft()
+                conversation.pending_tokens -= message.tokens
+                freed += len(message.content)
+            conversation.summary = summary
+            conversation.memory -= freed
+            shard.memory -= freed
+            return True
     
     def clear_conversation(self, session_id: str) -> None:
         """
@@ -91,9 +348,19 @@ class MessageManager:
         Args:
             session_id: 会话ID
         """
-        if session_id in self.conversations:
-            self.conversations[session_id] = []
-            self.conversation_timestamps[session_id] = time.time()
+        shard = self._shard(session_id)
+        with shard.lock:
+            if session_id in shard.sessions:
+                conversation = self._access(shard, session_id)
+                shard.memory -= conversation.memory
+                conversation.messages.clear()
+                conversation.window_tokens = 0
+                conversation.pending_summary.clear()
+                conversation.pending_tokens = 0
+                conversation.summary = None
+                conversation.created_at = conversation.last_access
+                conversation.memory = 0
+                conversation.generation = next(_generations)
     
     def get_conversation_info(self, session_id: str) -> Dict:
         """
@@ -105,32 +372,167 @@ class MessageManager:
         Returns:
             会话信息字典
         """
-        conversation = self.get_or_create_conversation(session_id)
-        current_rounds = len(conversation) // 2
+        shard = self._shard(session_id)
+        with shard.lock:
+            conversation = self._access(shard, session_id)
+            current_rounds = len(conversation.messages) // 2
+            
+            return {
+                "session_id": session_id,
+                "current_rounds": current_rounds,
+                "max_rounds": self.max_rounds,
+                "total_messages": len(conversation.messages),
+                "window_tokens": conversation.window_tokens,
+                "token_budget": self.token_budget,
+                "pending_summary_messages": len(conversation.pending_summary),
+                "has_summary": conversation.summary is not None,
+                "created_at": conversation.created_at,
+                "last_access": conversation.last_access
+            }
+    
+    def _remove(self, shard: _Shard, session_id: str) -> None:
+        """
+        移除会话（调用方需持有分片锁）
         
-        return {
-            "session_id": session_id,
-            "current_rounds": current_rounds,
-            "max_rounds": self.max_rounds,
-            "total_messages": len(conversation),
-            "created_at": self.conversation_timestamps.get(session_id, 0)
-        }
+        Args:
+            shard: 会话所在的分片
+            session_id: 会话ID
+        """
+        conversation = shard.sessions.pop(session_id)
+        shard.memory -= conversation.memory
+    
+    def evict_expired(self, max_age_seconds: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """
+        移除超过指定时间未访问的会话（按过期堆增量处理，不扫描全部会话）
+        
+        Args:
+            max_age_seconds: 最大空闲时间（秒），默认为 session_ttl
+            limit: 每个分片最多处理的堆条目数，None表示处理到没有过期会话为止
+            
+        Returns:
+            移除的会话数
+        """
+        max_age = self.session_ttl if max_age_seconds is None else max_age_seconds
+        deadline = time.time() - max_age
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                heap = shard.expiry_heap
+                processed = 0
+                while heap and heap[0][0] < deadline and (limit is None or processed < limit):
+                    _, session_id = heapq.heappop(heap)
+                    processed += 1
+                    conversation = shard.sessions.get(session_id)
+                    if conversation is None:
+                        continue  # 已被移除
+                    if conversation.last_access < deadline:
+                        self._remove(shard, session_id)
+                        removed += 1
+                    else:
+                        # 期间被访问过，按实际访问时间重新入堆
+                        heapq.heappush(heap, (conversation.last_access, session_id))
+                # 被LRU淘汰或清理后堆中会留下失效条目，失效条目过多时重建
+                if len(heap) > 2 * len(shard.sessions) + 64:
+                    shard.expiry_heap = [(conversation.last_access, session_id)
+                                         for session_id, conversation in shard.sessions.items()]
+                    heapq.heapify(shard.expiry_heap)
+        self.expired += removed
+        return removed
     
-    def cleanup_old_conversations(self, max_age_hours: int = 24) -> None:
+    def cleanup_old_conversations(self, max_age_hours: float = 24) -> None:
         """
-        清理过期的会话
+        清理过期的会话（按最后访问时间计算）
         
         Args:
             max_age_hours: 最大保留时间（小时）
         """
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
+        self.evict_expired(max_age_hours * 3600)
+    
+    def _enforce_memory_limit(self) -> None:
+        """
+        所有会话占用的内存超过上限时，按最近访问时间从最久未访问的会话开始移除
+        """
+        while self.memory_usage() > self.memory_limit:
+            # 各分片内按访问顺序排列，比较各分片最久未访问的会话
+            oldest = None
+            for shard in self._shards:
+                with shard.lock:
+                    if shard.sessions:
+                        session_id, conversation = next(iter(shard.sessions.items()))
+                        if oldest is None or conversation.last_access < oldest[0]:
+                            oldest = (conversation.last_access, shard, session_id)
+            if oldest is None:
+                return
+            _, shard, session_id = oldest
+            with shard.lock:
+                conversation = shard.sessions.get(session_id)
+                if conversation is not None and conversation.last_access == oldest[0]:
+                    self._remove(shard, session_id)
+                    self.evicted += 1
+    
+    def memory_usage(self) -> int:
+        """
+        获取所有会话占用的内存（按字符数估算）
+        
+        Returns:
+            占用的字符数
+        """
+        return sum(shard.memory for shard in self._shards)
+    
+    def session_count(self) -> int:
+        """
+        获取会话数
+        
+        Returns:
+            会话数
+        """
+        return sum(len(shard.sessions) for shard in self._shards)
+    
+    def start_eviction(self, interval: float = 60, batch_size: int = 1000) -> None:
+        """
+        在当前事件循环上启动后台过期清理任务
+        
+        Args:
+            interval: 清理间隔（秒）
+            batch_size: 每个分片每次最多处理的堆条目数，避免长时间占用分片锁
+        """
+        if self._eviction_task is None or self._eviction_task.done():
+            self._eviction_task = asyncio.ensure_future(self._eviction_loop(interval, batch_size))
+    
+    async def _eviction_loop(self, interval: float, batch_size: int) -> None:
+        """
+        后台过期清理循环
         
-        expired_sessions = []
-        for session_id, timestamp in self.conversation_timestamps.items():
-            if current_time - timestamp > max_age_seconds:
-                expired_sessions.append(session_id)
+        Args:
+            interval: 清理间隔（秒）
+            batch_size: 每个分片每次最多处理的堆条目数
+        """
+        while True:
+            await asyncio.sleep(interval)
+            # 一批处理满时说明还有积压，让出事件循环后继续
+            while self.evict_expired(limit=batch_size) >= batch_size:
+                await asyncio.sleep(0)
+    
+    def stop_eviction(self) -> None:
+        """
+        停止后台过期清理任务
+        """
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            self._eviction_task = None
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取会话存储统计信息
         
-        for session_id in expired_sessions:
-            del self.conversations[session_id]
-            del self.conversation_timestamps[session_id] 
\ No newline at end of file
+        Returns:
+            统计信息字典
+        """
+        return {
+            "sessions": self.session_count(),
+            "memory_usage": self.memory_usage(),
+            "memory_limit": self.memory_limit,
+            "session_ttl": self.session_ttl,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
\ No newline at end of file
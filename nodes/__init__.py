@@ -6,6 +6,7 @@
 
 from .mindmap_node import MindMapNode
 from .mindmap_manager import MindMapManager
+from .lazy_manager import LazyMindMapManager
 
-__all__ = ['MindMapNode', 'MindMapManager']
+__all__ = ['MindMapNode', 'MindMapManager', 'LazyMindMapManager']
 __version__ = '1.0.0' 
\ No newline at end of file
@@ -0,0 +1,196 @@
+from bisect import bisect_left, insort
+import heapq
+from typing import Dict, List, Set
+from .mindmap_node import MindMapNode
+from .node_table import NodeTable
+
+
+class AttributeIndex:
+    """
+    节点属性二级索引
+    维护 节点类型 -> 节点句柄、优先级 -> 节点句柄（按优先级有序）以及叶子节点集合，
+    使类型查询、优先级 top-k 查询和统计信息无需全量扫描
+    """
+
+    def __init__(self, table: NodeTable):
+        """
+        初始化属性索引
+
+        Args:
+            table: 管理器的节点句柄表（共享引用）
+        """
+        self.table = table
+        self.by_type: Dict[str, Set[int]] = {}
+        self.by_priority: Dict[int, Set[int]] = {}
+        # 升序排列的已出现优先级
+        self.priorities: List[int] = []
+        self.leaves: Set[int] = set()
+        for handle, node in enumerate(table.nodes):
+            if node is not None:
+                self.add(handle)
+
+    def _add_type(self, handle: int, node_type: str) -> None:
+        """
+        加入类型索引
+
+        Args:
+            handle: 节点句柄
+            node_type: 节点类型
+        """
+        ids = self.by_type.get(node_type)
+        if ids is None:
+            self.by_type[node_type] = {handle}
+        else:
+            ids.add(handle)
+
+    def _remove_type(self, handle: int, node_type: str) -> None:
+        """
+        移出类型索引
+
+        Args:
+            handle: 节点句柄
+            node_type: 节点类型
+        """
+        ids = self.by_type.get(node_type)
+        if ids is not None:
+            ids.discard(handle)
+            if not ids:
+                del self.by_type[node_type]
+
+    def _add_priority(self, handle: int, priority: int) -> None:
+        """
+        加入优先级索引
+
+        Args:
+            handle: 节点句柄
+            priority: 优先级
+        """
+        ids = self.by_priority.get(priority)
+        if ids is None:
+            self.by_priority[priority] = {handle}
+            insort(self.priorities, priority)
+        else:
+            ids.add(handle)
+
+    def _remove_priority(self, handle: int, priority: int) -> None:
+        """
+        移出优先级索引
+
+        Args:
+            handle: 节点句柄
+            priority: 优先级
+        """
+        ids = self.by_priority.get(priority)
+        if ids is not None:
+            ids.discard(handle)
+            if not ids:
+                del self.by_priority[priority]
+                del self.priorities[bisect_left(self.priorities, priority)]
+
+    def add(self, handle: int) -> None:
+        """
+        索引节点
+
+        Args:
+            handle: 节点句柄
+        """
+        node = self.table.nodes[handle]
+        self._add_type(handle, node.node_type)
+        self._add_priority(handle, node.priority)
+        if node.is_leaf():
+            self.leaves.add(handle)
+
+    def remove(self, handle: int) -> None:
+        """
+        移除节点索引
+
+        Args:
+            handle: 节点句柄
+        """
+        node = self.table.nodes[handle]
+        self._remove_type(handle, node.node_type)
+        self._remove_priority(handle, node.priority)
+        self.leaves.discard(handle)
+
+    def update(self, handle: int, field: str, old_value) -> None:
+        """
+        节点属性变化后更新索引
+
+        Args:
+            handle: 节点句柄
+            field: 字段名（node_type、priority 或 children）
+            old_value: 变化前的值
+        """
+        node = self.table.nodes[handle]
+        if field == "node_type":
+            self._remove_type(handle, old_value)
+            self._add_type(handle, node.node_type)
+        elif field == "priority":
+            self._remove_priority(handle, old_value)
+            self._add_priority(handle, node.priority)
+        elif field == "children":
+            if node.is_leaf():
+                self.leaves.add(handle)
+            else:
+                self.leaves.discard(handle)
+
+    def _sorted(self, handles: Set[int]) -> List[MindMapNode]:
+        """
+        按加入顺序返回节点
+
+        Args:
+            handles: 节点句柄集合
+
+        Returns:
+            节点列表
+        """
+        nodes = self.table.nodes
+        return [nodes[handle] for handle in sorted(handles, key=self.table.order.__getitem__)]
+
+    def find_by_type(self, node_type: str) -> List[MindMapNode]:
+        """
+        根据类型查找节点
+
+        Args:
+            node_type: 节点类型
+
+        Returns:
+            匹配的节点列表（按加入顺序）
+        """
+        return self._sorted(self.by_type.get(node_type, set()))
+
+    def find_leaves(self) -> List[MindMapNode]:
+        """
+        获取所有叶子节点
+
+        Returns:
+            叶子节点列表（按加入顺序）
+        """
+        return self._sorted(self.leaves)
+
+    def top_priority(self, k: int) -> List[MindMapNode]:
+        """
+        获取优先级最高的k个节点，优先级相同时按加入顺序
+
+        Args:
+            k: 数量
+
+        Returns:
+            节点列表
+        """
+        result: List[MindMapNode] = []
+        for priority in reversed(self.priorities):
+            if len(result) >= k:
+                break
+            handles = heapq.nsmallest(k - len(result), self.by_priority[priority], key=self.table.order.__getitem__)
+            result.extend(self.table.nodes[handle] for handle in handles)
+        return result
+
+    def type_counts(self) -> Dict[str, int]:
+        """
+        按类型统计节点数
+
+        Returns:
+            类型到数量的映射
+        """
+        return {node_type: len(ids) for node_type, ids in self.by_type.items()}
@@ -0,0 +1,419 @@
+"""
+思维导图操作日志
+
+将 MindMapManager 的修改操作以紧凑的 JSON 行追加写入日志文件，持久化成本与编辑频率成正比而不是与导图大小成正比。
+
+文件布局:
+    <path>          二进制快照（见 snapshot 模块），管理器信息中的 journal_seq 为快照包含的最后一条操作序号
+    <path>.log      当前日志，每行一条操作记录
+    <path>.log.1    压缩过程中被冻结的日志，快照写入完成后删除
+
+操作记录字段:
+    s   操作序号（单调递增）
+    t   操作时间（Unix时间戳）
+    op  操作类型：add / add_many / remove / move / cut / focus / unfocus / set / positions
+    其余字段随操作类型而定，见 MindMapManager 中对应方法的记录调用
+
+恢复时加载快照，再按顺序重放 .log.1 和 .log 中序号大于 journal_seq 的记录；日志末尾写了一半的行会被丢弃。
+"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type, TYPE_CHECKING
+
+from .mindmap_node import MindMapNode
+from .snapshot import decode_meta, dump_snapshot, load_snapshot, read_header
+
+if TYPE_CHECKING:
+    from .mindmap_manager import MindMapManager
+
+
+# 需要记录到日志的节点字段变化（children 由结构操作隐含，不单独记录）
+JOURNALED_FIELDS = ("title", "content", "node_type", "priority", "style", "position", "is_expanded", "is_visible", "metadata")
+
+
+def node_field_value(node: MindMapNode, field: str) -> Any:
+    """
+    获取节点字段在日志中记录的值
+
+    Args:
+        node: 节点对象
+        field: JOURNALED_FIELDS 中的字段名
+
+    Returns:
+        可JSON序列化的字段值
+    """
+    if field == "style":
+        return {"color": node.color, "icon": node.icon}
+    if field == "position":
+        return {"x": node._x, "y": node._y}
+    if field == "metadata":
+        return node._metadata or {}
+    return getattr(node, field)
+
+
+def apply_operation(manager: 'MindMapManager', record: Dict[str, Any]) -> bool:
+    """
+    在管理器上重放一条操作记录
+
+    Args:
+        manager: 思维导图管理器（重放时不应挂接日志）
+        record: 操作记录
+
+    Returns:
+        是否重放成功
+    """
+    op = record["op"]
+    if op == "add":
+        node = MindMapNode.from_dict(record["node"])
+        applied = manager.add_node(node)
+        if applied:
+            # 挂接父节点时会刷新修改时间，恢复为记录时的值
+            node.updated_at = datetime.fromisoformat(record["node"]["updated_at"])
+            parent = manager.get_node(node.parent_id) if node.parent_id else None
+            if parent is not None:
+                parent._updated_ts = record["t"]
+    elif op == "add_many":
+        nodes = [MindMapNode.from_dict(node_data) for node_data in record["nodes"]]
+        applied = bool(manager.add_nodes(nodes))
+        if applied:
+            for node, node_data in zip(nodes, record["nodes"]):
+                if node._owner is manager:
+                    node.updated_at = datetime.fromisoformat(node_data["updated_at"])
+                    parent = manager.get_node(node.parent_id) if node.parent_id else None
+                    if parent is not None:
+                        parent._updated_ts = record["t"]
+    elif op == "remove":
+        applied = manager.remove_node(record["id"])
+    elif op == "move":
+        applied = manager.move_node(record["id"], record.get("parent"))
+    elif op == "cut":
+        nodes = manager.nodes
+        applied = bool(manager.cut_edges(
+            (nodes[node_id].parent_id, node_id) for node_id in record["ids"] if node_id in nodes
+        ))
+    elif op == "focus":
+        applied = manager.set_focus_node(record["id"])
+    elif op == "unfocus":
+        applied = manager.clear_focus()
+    elif op == "set":
+        node = manager.get_node(record["id"])
+        applied = node is not None
+        if applied:
+            field, value = record["field"], record["value"]
+            if field == "style":
+                node.color = value["color"]
+                node.icon = value["icon"]
+            elif field == "position":
+                # 经由 position 属性赋值，管理器的空间索引随之更新
+                node.position = value
+            else:
+                setattr(node, field, value)
+            node._updated_ts = record["t"]
+    elif op == "positions":
+        applied = manager.set_positions(record["ids"], record["x"], record["y"]) > 0
+        for node_id in record["ids"]:
+            node = manager.get_node(node_id)
+            if node is not None:
+                node._updated_ts = record["t"]
+    else:
+        raise ValueError(f"未知的操作类型: {op}")
+
+    if applied:
+        manager.updated_at = datetime.fromtimestamp(record["t"])
+    return applied
+
+
+def read_journal(filepath: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    读取日志文件中的完整记录
+
+    Args:
+        filepath: 日志文件路径
+
+    Returns:
+        (操作记录列表, 完整记录的字节长度)，遇到写了一半的行即停止
+    """
+    records = []
+    valid_length = 0
+    if not os.path.exists(filepath):
+        return records, valid_length
+    with open(filepath, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            valid_length += len(line)
+    return records, valid_length
+
+
+class OperationJournal:
+    """
+    追加写入的操作日志
+
+    - append 只把记录放入内存缓冲区，后台线程按 flush_interval 或缓冲条数达到 batch_size 时批量写入并 fsync
+    - 日志条数超过 compact_threshold 时由后台线程自动压缩：只在锁内冻结当前日志（重命名文件），
+      之后在独立线程中加载上一份快照、重放冻结日志得到冻结时的状态并编码为新快照，
+      不读取正在被修改的管理器，修改操作的调用方不承担快照编码的开销
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 64,
+        flush_interval: float = 0.05,
+        compact_threshold: int = 10000
+    ):
+        """
+        初始化操作日志
+
+        Args:
+            path: 快照文件路径，日志文件为 path + ".log"
+            batch_size: 缓冲记录数达到该值时立即唤醒后台写入
+            flush_interval: 后台批量写入的时间间隔（秒）
+            compact_threshold: 日志记录数超过该值时压缩为快照，0表示不自动压缩
+        """
+        self.path = path
+        self.log_path = path + ".log"
+        self.frozen_path = path + ".log.1"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self.manager: Optional['MindMapManager'] = None
+        self.seq = 0
+        # 当前日志中的记录数（决定何时压缩）
+        self.log_records = 0
+
+        self._buffer: List[bytes] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # 日志条数达到阈值后置位，由后台写入线程启动压缩
+        self._compact_requested = False
+        self._manager_cls: Optional[Type['MindMapManager']] = None
+        self._closed = False
+        self._file = None
+        self._flusher: Optional[threading.Thread] = None
+        self._compactor: Optional[threading.Thread] = None
+
+    def recover(self, manager_cls: Type['MindMapManager'], mindmap_id: Optional[str] = None) -> 'MindMapManager':
+        """
+        加载快照并重放日志，返回挂接了本日志的管理器
+
+        Args:
+            manager_cls: 管理器类
+            mindmap_id: 快照不存在时新建导图使用的ID
+
+        Returns:
+            思维导图管理器对象
+        """
+        self._manager_cls = manager_cls
+        snapshot_seq = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            manager = load_snapshot(manager_cls, data)
+            snapshot_seq = decode_meta(data, read_header(data)).get("journal_seq", 0)
+        else:
+            manager = manager_cls(mindmap_id=mindmap_id)
+            # 写入空导图的初始快照，后台压缩总是以上一份快照为基础重放日志
+            buffer = io.BytesIO()
+            dump_snapshot(manager, buffer, extra_meta={"journal_seq": 0})
+            self._replace_snapshot(buffer.getvalue())
+
+        self.seq = snapshot_seq
+        frozen, _ = read_journal(self.frozen_path)
+        active, valid_length = read_journal(self.log_path)
+        for record in frozen + active:
+            if record["s"] > snapshot_seq:
+                apply_operation(manager, record)
+            self.seq = max(self.seq, record["s"])
+
+        # 截掉当前日志末尾写了一半的行，再以追加方式打开
+        self._file = open(self.log_path, "ab")
+        self._file.truncate(valid_length)
+        self.log_records = len(active)
+
+        manager.attach_journal(self)
+        self._flusher = threading.Thread(target=self._flush_loop, name="mindmap-journal", daemon=True)
+        self._flusher.start()
+
+        # 上次压缩未完成，立即重新压缩
+        if frozen:
+            self.compact()
+        return manager
+
+    def append(self, op: str, **fields: Any) -> None:
+        """
+        追加一条操作记录
+
+        Args:
+            op: 操作类型
+            **fields: 操作字段
+        """
+        with self._lock:
+            self.seq += 1
+            record = {"s": self.seq, "t": time.time(), "op": op, **fields}
+            self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+            self.log_records += 1
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+            if self.compact_threshold and self.log_records >= self.compact_threshold and not self._compact_requested:
+                # 压缩交给后台线程，调用方只置位并唤醒
+                self._compact_requested = True
+                self._wakeup.set()
+
+    def record_update(self, node: MindMapNode, field: str) -> None:
+        """
+        记录节点字段更新
+
+        Args:
+            node: 节点对象
+            field: 字段名
+        """
+        self.append("set", id=node.node_id, field=field, value=node_field_value(node, field))
+
+    def _write_buffer(self) -> None:
+        """
+        将缓冲区写入日志文件并 fsync（调用方需持有锁）
+        """
+        if not self._buffer:
+            return
+        self._file.write(b"".join(self._buffer))
+        self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def flush(self) -> None:
+        """
+        立即将缓冲的记录写入并 fsync
+        """
+        with self._lock:
+            self._write_buffer()
+
+    def _flush_loop(self) -> None:
+        """
+        后台批量写入线程
+        """
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"写入操作日志失败: {e}")
+            if self._compact_requested and not self._closed:
+                try:
+                    if self.compact():
+                        self._compact_requested = False
+                except Exception as e:
+                    self._compact_requested = False
+                    print(f"压缩操作日志失败: {e}")
+
+    def compact(self) -> bool:
+        """
+        将当前日志冻结并在后台压缩为快照，之后清理已包含在快照中的日志
+
+        调用方只在锁内完成冻结（写入缓冲并重命名日志文件），快照的构建、编码和写入都在压缩线程中进行
+
+        Returns:
+            是否启动了压缩（已有压缩在进行时返回False）
+        """
+        if self.manager is None or (self._compactor is not None and self._compactor.is_alive()):
+            return False
+
+        with self._lock:
+            # 冻结当前日志，之后的记录写入新日志
+            self._write_buffer()
+            self._file.close()
+            if os.path.exists(self.frozen_path):
+                # 上次压缩失败留下的冻结日志，追加而不是覆盖
+                with open(self.log_path, "rb") as src, open(self.frozen_path, "ab") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.frozen_path)
+            self._file = open(self.log_path, "ab")
+            self.log_records = 0
+            frozen_seq = self.seq
+
+        self._compactor = threading.Thread(
+            target=self._compact_frozen, args=(frozen_seq,), name="mindmap-compact", daemon=True
+        )
+        self._compactor.start()
+        return True
+
+    def _compact_frozen(self, frozen_seq: int) -> None:
+        """
+        后台压缩：在独立的管理器上加载上一份快照并重放冻结日志，得到冻结时的状态，
+        编码为新快照后原子替换，最后删除冻结日志
+
+        Args:
+            frozen_seq: 冻结日志中最后一条记录的序号
+        """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            manager = load_snapshot(self._manager_cls, data)
+            snapshot_seq = decode_meta(data, read_header(data)).get("journal_seq", 0)
+            records, _ = read_journal(self.frozen_path)
+            for record in records:
+                if snapshot_seq < record["s"] <= frozen_seq:
+                    apply_operation(manager, record)
+
+            buffer = io.BytesIO()
+            dump_snapshot(manager, buffer, extra_meta={"journal_seq": frozen_seq})
+            self._replace_snapshot(buffer.getvalue())
+            os.remove(self.frozen_path)
+        except Exception as e:
+            print(f"压缩操作日志失败: {e}")
+
+    def _replace_snapshot(self, data: bytes) -> None:
+        """
+        写入快照：先在同一目录写唯一命名的临时文件并 fsync，再原子替换，失败时删除临时文件
+
+        Args:
+            data: 快照数据
+        """
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or ".", prefix=os.path.basename(self.path) + ".", suffix=".tmp"
+        )
+        replaced = False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            replaced = True
+        finally:
+            if not replaced:
+                os.remove(temp_path)
+
+    def close(self) -> None:
+        """
+        写入剩余记录，等待压缩完成并关闭日志
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._write_buffer()
+            self._file.close()
+        if self.manager is not None:
+            self.manager.detach_journal()
@@ -0,0 +1,869 @@
+"""
+思维导图服务端布局
+
+为整个 MindMapManager 计算节点坐标，坐标计算以 NumPy 数组向量化完成：
+    radial  放射状布局：根节点居中，按深度分环，每个子树按叶子数分配扇区
+    tree    平衡树布局：按深度分层，每个子树按叶子数分配水平区间
+    tidy    Reingold–Tilford 紧凑树布局：子树按轮廓尽量靠拢，父节点位于子节点中间
+    force   力导向布局：父子边和兄弟关系（siblings）为弹簧，节点间斥力用 Barnes–Hut 四叉树近似
+
+多个根节点（以及父节点不在导图中的节点）视为同一虚拟根的子节点。
+计算结果为 Layout，可通过 apply_layout 批量写回节点位置，也可直接发送给前端。
+IncrementalRadialLayout 缓存放射状布局的子树权重和扇区，单个节点增删后只重新计算受影响的子树。
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import math
+import time
+import numpy as np
+
+
+class TreeArrays:
+    """
+    导图树的先序数组表示，下标为节点在先序遍历中的位置
+
+    Attributes:
+        node_ids: 先序排列的节点ID
+        parent: 父节点位置，根节点为-1
+        depth: 深度（根节点为0）
+        size: 子树节点数（含自身），子树占据先序区间 [i, i + size[i])
+        leaves: 子树叶子数
+        leaf_before: 先序位置之前的叶子数
+        root_count: 根节点数
+    """
+
+    def __init__(self, node_ids: List[str], parent: np.ndarray, depth: np.ndarray):
+        self.node_ids = node_ids
+        self.parent = parent
+        self.depth = depth
+        n = len(node_ids)
+
+        # 按深度分组，自底向上累加子树大小
+        self.levels = _split_levels(depth)
+        self.size = np.ones(n, dtype=np.int64)
+        for level in reversed(self.levels[1:]):
+            np.add.at(self.size, parent[level], self.size[level])
+
+        has_parent = parent >= 0
+        child_count = np.bincount(parent[has_parent], minlength=n)
+        is_leaf = (child_count == 0).astype(np.int64)
+        leaf_prefix = np.concatenate(([0], np.cumsum(is_leaf)))
+        positions = np.arange(n)
+        self.leaves = leaf_prefix[positions + self.size] - leaf_prefix[positions]
+        self.leaf_before = leaf_prefix[:n]
+        self.root_count = int(n - has_parent.sum())
+
+
+def _split_levels(depth: np.ndarray) -> List[np.ndarray]:
+    """
+    将先序位置按深度分组（组内保持先序）
+
+    Args:
+        depth: 深度数组
+
+    Returns:
+        每个深度的先序位置数组
+    """
+    if len(depth) == 0:
+        return []
+    order = np.argsort(depth, kind="stable")
+    counts = np.bincount(depth)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def tree_arrays(manager) -> TreeArrays:
+    """
+    按父子关系先序遍历导图，生成树的数组表示
+
+    子节点按 children 列表的顺序排列；父节点不在导图中的节点及环上的节点作为根节点
+
+    Args:
+        manager: 思维导图管理器
+
+    Returns:
+        树的数组表示
+    """
+    nodes = manager.nodes
+    node_ids: List[str] = []
+    parents: List[int] = []
+    depths: List[int] = []
+    visited = set()
+
+    def visit(root_id: str) -> None:
+        stack = [(root_id, -1, 0)]
+        while stack:
+            node_id, parent, node_depth = stack.pop()
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+            position = len(node_ids)
+            node_ids.append(node_id)
+            parents.append(parent)
+            depths.append(node_depth)
+            children = [
+                child_id for child_id in nodes[node_id].child_ids
+                if child_id in nodes and child_id not in visited and nodes[child_id].parent_id == node_id
+            ]
+            for child_id in reversed(children):
+                stack.append((child_id, position, node_depth + 1))
+
+    for root_id in manager.root_nodes:
+        if root_id in nodes:
+            visit(root_id)
+    if len(visited) < len(nodes):
+        for node_id in nodes:
+            if node_id not in visited:
+                visit(node_id)
+
+    return TreeArrays(node_ids, np.array(parents, dtype=np.int64), np.array(depths, dtype=np.int64))
+
+
+class Layout:
+    """
+    布局结果：节点ID及对应的坐标数组
+    """
+
+    def __init__(self, node_ids: List[str], x: np.ndarray, y: np.ndarray):
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def get_position(self, node_id: str) -> Dict[str, float]:
+        """
+        获取节点坐标
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            坐标 {"x": x, "y": y}
+        """
+        index = self.node_ids.index(node_id)
+        return {"x": float(self.x[index]), "y": float(self.y[index])}
+
+    def to_dict(self) -> Dict[str, List]:
+        """
+        转换为紧凑的字典格式（按列保存，适合直接发送给前端）
+
+        Returns:
+            {"node_ids": [...], "x": [...], "y": [...]}
+        """
+        return {"node_ids": self.node_ids, "x": self.x.tolist(), "y": self.y.tolist()}
+
+
+def radial_layout(
+    manager,
+    radius_step: float = 250,
+    start_angle: float = -90,
+    center: Tuple[float, float] = (0, 0)
+) -> Layout:
+    """
+    放射状布局：深度为d的节点位于半径 d * radius_step 的圆上，
+    每个节点占据与其子树叶子数成正比的扇区，位于扇区中间
+
+    Args:
+        manager: 思维导图管理器
+        radius_step: 相邻两环的半径差
+        start_angle: 第一个一级节点的角度（度，-90为正上方，顺时针增加，与前端 applyRadialLayout 一致）
+        center: 中心坐标
+
+    Returns:
+        布局结果
+    """
+    tree = tree_arrays(manager)
+    if len(tree.node_ids) == 0:
+        return Layout([], np.zeros(0), np.zeros(0))
+    ring, start, span = _radial_sectors(tree, start_angle)
+    angle = np.radians(start + span / 2)
+    radius = ring * radius_step
+    return Layout(tree.node_ids, center[0] + radius * np.cos(angle), center[1] + radius * np.sin(angle))
+
+
+def _radial_sectors(tree: TreeArrays, start_angle: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    计算放射状布局中每个节点所在的环和扇区
+
+    Args:
+        tree: 树的数组表示（非空）
+        start_angle: 第一个一级节点的角度（度）
+
+    Returns:
+        (环序号, 扇区起始角度, 扇区角度跨度)
+    """
+    n = len(tree.node_ids)
+    # 单个根节点位于中心；多个根节点时以虚拟根为中心，根节点位于第一环
+    ring = tree.depth + (1 if tree.root_count > 1 else 0)
+    first = 0 if tree.root_count > 1 else min(1, n - 1)
+    total = max(int(tree.leaves[tree.parent < 0].sum()), 1)
+
+    unit = 360.0 / total
+    start = start_angle + (tree.leaf_before - tree.leaves[first] / 2) * unit
+    return ring, start, tree.leaves * unit
+
+
+def tree_layout(
+    manager,
+    sibling_spacing: float = 180,
+    level_spacing: float = 150,
+    center: Tuple[float, float] = (0, 0)
+) -> Layout:
+    """
+    平衡树布局：按深度分层，每个节点占据与其子树叶子数成正比的水平区间，位于区间中间
+
+    Args:
+        manager: 思维导图管理器
+        sibling_spacing: 相邻叶子节点的水平间距
+        level_spacing: 相邻两层的垂直间距
+        center: 根节点层的中心坐标
+
+    Returns:
+        布局结果
+    """
+    tree = tree_arrays(manager)
+    total = int(tree.leaves[tree.parent < 0].sum()) if len(tree.node_ids) else 0
+    x = (tree.leaf_before + tree.leaves / 2 - total / 2) * sibling_spacing + center[0]
+    y = tree.depth * level_spacing + center[1]
+    return Layout(tree.node_ids, x.astype(float), y.astype(float))
+
+
+def tidy_layout(
+    manager,
+    sibling_spacing: float = 180,
+    level_spacing: float = 150,
+    center: Tuple[float, float] = (0, 0)
+) -> Layout:
+    """
+    Reingold–Tilford 紧凑树布局：自底向上合并子树轮廓，相邻子树在每一层至少相隔 sibling_spacing，
+    父节点位于第一个和最后一个子节点中间；相对偏移确定后按层向量化累加出绝对坐标
+
+    Args:
+        manager: 思维导图管理器
+        sibling_spacing: 相邻节点的最小水平间距
+        level_spacing: 相邻两层的垂直间距
+        center: 根节点层的中心坐标
+
+    Returns:
+        布局结果
+    """
+    tree = tree_arrays(manager)
+    n = len(tree.node_ids)
+    if n == 0:
+        return Layout([], np.zeros(0), np.zeros(0))
+
+    parent = tree.parent
+    children: List[List[int]] = [[] for _ in range(n + 1)]  # 最后一项为虚拟根
+    for position in range(n):
+        children[parent[position] if parent[position] >= 0 else n].append(position)
+
+    # offset: 节点相对父节点的水平偏移；contours: 子树各层相对子树根的最左/最右坐标
+    offset = np.zeros(n)
+    contours: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    leaf_contour = (np.zeros(1), np.zeros(1))
+    for position in list(range(n - 1, -1, -1)) + [n]:
+        child_list = children[position]
+        if not child_list:
+            contours[position] = leaf_contour
+            continue
+
+        left, right = contours.pop(child_list[0])
+        left, right = left.copy(), right.copy()
+        shifts = [0.0]
+        for child in child_list[1:]:
+            child_left, child_right = contours.pop(child)
+            common = min(len(right), len(child_left))
+            shift = float(np.max(right[:common] - child_left[:common])) + sibling_spacing
+            shifts.append(shift)
+            # 右侧新子树在公共层上成为最右轮廓，更深的层直接接上
+            right[:common] = child_right[:common] + shift
+            if len(child_left) > len(left):
+                left = np.concatenate((left, child_left[len(left):] + shift))
+                right = np.concatenate((right, child_right[len(right):] + shift))
+
+        middle = (shifts[0] + shifts[-1]) / 2
+        offset[child_list] = np.array(shifts) - middle
+        if position < n:
+            contours[position] = (np.concatenate(([0.0], left - middle)), np.concatenate(([0.0], right - middle)))
+
+    x = np.zeros(n)
+    for level in tree.levels:
+        has_parent = parent[level] >= 0
+        x[level] = offset[level] + np.where(has_parent, x[np.maximum(parent[level], 0)], 0.0)
+    return Layout(tree.node_ids, x + center[0], (tree.depth * level_spacing + center[1]).astype(float))
+
+
+class IncrementalRadialLayout:
+    """
+    可增量更新的放射状布局
+    缓存每个节点的子树叶子数（权重）、所在环和扇区；节点增删后更新祖先链上的权重，
+    只在父节点的扇区内重新划分兄弟节点的扇区，扇区发生变化的兄弟子树随之移动。
+    父节点每个叶子分到的角度低于全图平均值的 balance 倍时，沿祖先链向上找到足够宽松的祖先再重新划分，
+    因此常见的单节点编辑代价为 O(深度 + 兄弟数)，而不是 O(n)
+    """
+
+    def __init__(
+        self,
+        manager,
+        radius_step: float = 250,
+        start_angle: float = -90,
+        center: Tuple[float, float] = (0, 0),
+        balance: float = 0.5
+    ):
+        """
+        初始化增量布局（首次使用前需调用 relayout）
+
+        Args:
+            manager: 思维导图管理器
+            radius_step: 相邻两环的半径差
+            start_angle: 第一个一级节点的角度（度）
+            center: 中心坐标
+            balance: 触发向上重新划分的拥挤阈值（相对全图平均每叶子角度的比例）
+        """
+        self.manager = manager
+        self.radius_step = radius_step
+        self.start_angle = start_angle
+        self.center = center
+        self.balance = balance
+
+        # 子树叶子数；扇区 (起始角度, 角度跨度)，键None为多根时的虚拟根；所在环
+        self.weight: Dict[Optional[str], int] = {}
+        self.sector: Dict[Optional[str], Tuple[float, float]] = {}
+        self.ring: Dict[Optional[str], int] = {}
+        self._multi_root = False
+
+    def relayout(self) -> List[str]:
+        """
+        全量计算布局并写回节点位置，重建缓存
+
+        Returns:
+            位置发生变化的节点ID列表
+        """
+        tree = self._build(self.start_angle)
+        return self._write(tree.node_ids)
+
+    def restore(self) -> None:
+        """
+        按当前的树结构重建缓存，但不写回节点位置（用于批量修改或整体布局后缓存失效的情况）
+
+        起始角度按第一个一级节点的现有位置对齐，节点位置来自放射状布局时缓存与现有位置一致；
+        之后的增量更新只移动被重新划分扇区的子树
+        """
+        start_angle = self.start_angle
+        tree = tree_arrays(self.manager)
+        if tree.node_ids:
+            first = self.manager.nodes[tree.node_ids[0 if tree.root_count > 1 else min(1, len(tree.node_ids) - 1)]]
+            dx, dy = first._x - self.center[0], first._y - self.center[1]
+            if math.hypot(dx, dy) > 1e-9:
+                start_angle = math.degrees(math.atan2(dy, dx))
+        self._build(start_angle, tree)
+
+    def _build(self, start_angle: float, tree: Optional[TreeArrays] = None) -> TreeArrays:
+        """
+        计算所有节点的权重、环和扇区并重建缓存
+
+        Args:
+            start_angle: 第一个一级节点的角度（度）
+            tree: 树的数组表示，不提供时现场生成
+
+        Returns:
+            树的数组表示
+        """
+        if tree is None:
+            tree = tree_arrays(self.manager)
+        self.weight.clear()
+        self.sector.clear()
+        self.ring.clear()
+        self._multi_root = tree.root_count > 1
+        if not tree.node_ids:
+            return tree
+
+        ring, start, span = _radial_sectors(tree, start_angle)
+        self.weight.update(zip(tree.node_ids, tree.leaves.tolist()))
+        self.sector.update(zip(tree.node_ids, zip(start.tolist(), span.tolist())))
+        self.ring.update(zip(tree.node_ids, ring.tolist()))
+        if self._multi_root:
+            first_weight = self.weight[tree.node_ids[0]]
+            total = int(tree.leaves[tree.parent < 0].sum())
+            self.weight[None] = total
+            self.sector[None] = (start_angle - first_weight / 2 * 360.0 / total, 360.0)
+            self.ring[None] = 0
+        return tree
+
+    def node_added(self, node_id: str) -> List[str]:
+        """
+        节点加入管理器后更新布局
+
+        Args:
+            node_id: 新节点ID
+
+        Returns:
+            位置发生变化的节点ID列表（包括新节点）
+        """
+        node = self.manager.nodes.get(node_id)
+        parent_id = node.parent_id if node is not None else None
+        if parent_id not in self.sector or parent_id is None:
+            # 新增根节点会改变各环的划分，全量重新布局
+            return self.relayout()
+        return self._refresh(parent_id)
+
+    def node_removed(self, node_id: str, parent_id: Optional[str]) -> List[str]:
+        """
+        节点从管理器移除后更新布局
+
+        Args:
+            node_id: 被移除的节点ID
+            parent_id: 被移除节点原来的父节点ID
+
+        Returns:
+            位置发生变化的节点ID列表
+        """
+        for cache in (self.weight, self.sector, self.ring):
+            cache.pop(node_id, None)
+        # 被移除节点的子节点会被提升为根节点，此时环的划分改变，全量重新布局
+        root_ring = 1 if self._multi_root else 0
+        promoted = any(
+            self.ring.get(root_id, root_ring) != root_ring for root_id in self.manager.root_nodes
+        )
+        if promoted or parent_id is None or parent_id not in self.sector:
+            return self.relayout()
+        return self._refresh(parent_id)
+
+    def _children(self, node_id: Optional[str]) -> List[str]:
+        """
+        获取节点在树中的子节点（None 为虚拟根，子节点为所有根节点）
+        """
+        nodes = self.manager.nodes
+        if node_id is None:
+            return [root_id for root_id in self.manager.root_nodes if root_id in nodes]
+        return [
+            child_id for child_id in nodes[node_id].child_ids
+            if child_id in nodes and nodes[child_id].parent_id == node_id
+        ]
+
+    def _parent(self, node_id: str) -> Optional[str]:
+        """
+        获取节点在布局中的父节点（多根时根节点的父节点为虚拟根None）
+        """
+        return self.manager.nodes[node_id].parent_id
+
+    def _subtree_weight(self, node_id: str) -> int:
+        """
+        获取子树叶子数，未缓存的子树（如新加入的节点）现场计算并缓存
+        """
+        weight = self.weight.get(node_id)
+        if weight is None:
+            children = self._children(node_id)
+            weight = sum(self._subtree_weight(child_id) for child_id in children) if children else 1
+            self.weight[node_id] = weight
+        return weight
+
+    def _refresh(self, parent_id: Optional[str]) -> List[str]:
+        """
+        父节点的子节点变化后：更新祖先链权重，找到足够宽松的祖先并重新划分其扇区
+
+        Args:
+            parent_id: 子节点发生变化的节点ID
+
+        Returns:
+            位置发生变化的节点ID列表
+        """
+        children = self._children(parent_id)
+        new_weight = sum(self._subtree_weight(child_id) for child_id in children) if children else 1
+        delta = new_weight - self.weight.get(parent_id, 1)
+        self.weight[parent_id] = new_weight
+
+        # 沿祖先链更新权重 O(深度)
+        node_id = parent_id
+        while node_id is not None:
+            node_id = self._parent(node_id)
+            if node_id is None and not self._multi_root:
+                break
+            self.weight[node_id] += delta
+
+        # 全图平均每叶子角度
+        root_weight = self.weight[None] if self._multi_root else self.weight[self._root_of(parent_id)]
+        threshold = self.balance * 360.0 / max(root_weight, 1)
+        target = parent_id
+        while target is not None and self.sector[target][1] / self.weight[target] < threshold:
+            upper = self._parent(target)
+            if upper is None and not self._multi_root:
+                break
+            target = upper
+        changed = self._assign(target)
+        if target != parent_id:
+            # 叶子节点下新增子节点时祖先的扇区都不变，从祖先开始的划分不会下探到新节点
+            changed = list(dict.fromkeys(changed + self._assign(parent_id)))
+        return self._write(changed)
+
+    def _root_of(self, node_id: str) -> str:
+        """
+        获取节点所在树的根节点
+        """
+        while self.manager.nodes[node_id].parent_id is not None:
+            node_id = self.manager.nodes[node_id].parent_id
+        return node_id
+
+    def _assign(self, node_id: Optional[str]) -> List[str]:
+        """
+        在节点的扇区内按权重重新划分子节点扇区，扇区变化的子树递归重新划分
+
+        Args:
+            node_id: 节点ID（None 为虚拟根）
+
+        Returns:
+            扇区或环发生变化的节点ID列表
+        """
+        changed = []
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            start, span = self.sector[current]
+            children = self._children(current)
+            total = sum(self._subtree_weight(child_id) for child_id in children)
+            child_ring = self.ring[current] + 1
+            for child_id in children:
+                child_span = span * self.weight[child_id] / total
+                sector = (start, child_span)
+                start += child_span
+                old = self.sector.get(child_id)
+                if (
+                    old is not None and self.ring.get(child_id) == child_ring
+                    and math.isclose(old[0], sector[0]) and math.isclose(old[1], sector[1])
+                ):
+                    continue
+                self.sector[child_id] = sector
+                self.ring[child_id] = child_ring
+                changed.append(child_id)
+                stack.append(child_id)
+        return changed
+
+    def _write(self, node_ids: List[str]) -> List[str]:
+        """
+        按缓存的扇区计算坐标并批量写回，返回位置实际变化的节点
+
+        Args:
+            node_ids: 需要检查的节点ID
+
+        Returns:
+            位置发生变化的节点ID列表
+        """
+        if not node_ids:
+            return []
+        start, span = np.array([self.sector[node_id] for node_id in node_ids]).T
+        radius = np.array([self.ring[node_id] for node_id in node_ids]) * self.radius_step
+        angle = np.radians(start + span / 2)
+        x = self.center[0] + radius * np.cos(angle)
+        y = self.center[1] + radius * np.sin(angle)
+
+        nodes = self.manager.nodes
+        old_x = np.array([nodes[node_id]._x for node_id in node_ids], dtype=float)
+        old_y = np.array([nodes[node_id]._y for node_id in node_ids], dtype=float)
+        moved = ~(np.isclose(x, old_x, rtol=0, atol=1e-6) & np.isclose(y, old_y, rtol=0, atol=1e-6))
+        moved_ids = [node_id for node_id, flag in zip(node_ids, moved.tolist()) if flag]
+        self.manager.set_positions(moved_ids, x[moved].tolist(), y[moved].tolist())
+        return moved_ids
+
+
+class _QuadLevel:
+    """
+    四叉树的一层：2^level × 2^level 网格中非空的格子
+
+    Attributes:
+        keys: 格子编号（ix * 格数 + iy），升序
+        mass: 格子内的节点数
+        com_x, com_y: 格子内节点的质心
+        body_cell: 每个节点所在格子在 keys 中的下标
+    """
+
+    def __init__(self, grid_x: np.ndarray, grid_y: np.ndarray, scale: int, x: np.ndarray, y: np.ndarray):
+        keys = grid_x * scale + grid_y
+        self.keys, self.body_cell = np.unique(keys, return_inverse=True)
+        count = len(self.keys)
+        self.mass = np.bincount(self.body_cell, minlength=count).astype(float)
+        self.com_x = np.bincount(self.body_cell, weights=x, minlength=count) / self.mass
+        self.com_y = np.bincount(self.body_cell, weights=y, minlength=count) / self.mass
+
+
+def barnes_hut_repulsion(
+    x: np.ndarray,
+    y: np.ndarray,
+    strength: float,
+    theta: float = 0.8,
+    max_depth: int = 14
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    用 Barnes–Hut 四叉树近似计算节点间斥力（大小为 strength / 距离）
+
+    四叉树按层以网格编号构建，遍历时所有节点同时向下展开：(节点, 格子) 对中
+    格子足够远（边长/距离 < theta）或只含一个其他节点时直接按质心计算，否则展开为下一层的子格子，
+    总代价 O(n log n)
+
+    Args:
+        x, y: 节点坐标
+        strength: 斥力系数
+        theta: 近似阈值，越小越精确
+        max_depth: 四叉树最大层数，最深一层的格子整体按质心计算（排除节点自身）
+
+    Returns:
+        (x方向斥力, y方向斥力)
+    """
+    n = len(x)
+    force_x = np.zeros(n)
+    force_y = np.zeros(n)
+    if n < 2:
+        return force_x, force_y
+
+    min_x, min_y = x.min(), y.min()
+    size = max(x.max() - min_x, y.max() - min_y, 1e-6) * (1 + 1e-9)
+    unit_x = (x - min_x) / size
+    unit_y = (y - min_y) / size
+    theta2 = theta * theta
+
+    body = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)
+    level = _QuadLevel(np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), 1, x, y)
+    for depth in range(max_depth + 1):
+        mass = level.mass[cell]
+        dx = x[body] - level.com_x[cell]
+        dy = y[body] - level.com_y[cell]
+        own = level.body_cell[body] == cell
+
+        if depth == max_depth:
+            # 最深一层：格子整体按质心计算，并从质心中扣除节点自身
+            others = mass - own
+            keep = others > 0
+            dx = np.where(own, dx * mass / np.maximum(others, 1), dx)[keep]
+            dy = np.where(own, dy * mass / np.maximum(others, 1), dy)[keep]
+            accept_body, accept_mass = body[keep], others[keep]
+            open_mask = None
+        else:
+            single = mass == 1
+            cell_size = size / (1 << depth)
+            distance2 = dx * dx + dy * dy
+            accept = ~own & (single | (cell_size * cell_size < theta2 * distance2))
+            open_mask = ~accept & ~(own & single)
+            accept_body, accept_mass = body[accept], mass[accept]
+            dx, dy = dx[accept], dy[accept]
+
+        distance2 = np.maximum(dx * dx + dy * dy, 1e-4)
+        scale = strength * accept_mass / distance2
+        force_x += np.bincount(accept_body, weights=scale * dx, minlength=n)
+        force_y += np.bincount(accept_body, weights=scale * dy, minlength=n)
+
+        if open_mask is None or not open_mask.any():
+            break
+
+        # 展开为下一层存在的子格子
+        grid = 1 << depth
+        parent_keys = level.keys[cell[open_mask]]
+        parent_x, parent_y = parent_keys // grid, parent_keys % grid
+        opened_body = body[open_mask]
+        child_grid = grid * 2
+        level = _QuadLevel(
+            np.minimum((unit_x * child_grid).astype(np.int64), child_grid - 1),
+            np.minimum((unit_y * child_grid).astype(np.int64), child_grid - 1),
+            child_grid, x, y
+        )
+        candidates = []
+        for offset_x in (0, 1):
+            for offset_y in (0, 1):
+                candidates.append((parent_x * 2 + offset_x) * child_grid + parent_y * 2 + offset_y)
+        child_keys = np.concatenate(candidates)
+        child_index = np.minimum(np.searchsorted(level.keys, child_keys), len(level.keys) - 1)
+        exists = level.keys[child_index] == child_keys
+        body = np.tile(opened_body, 4)[exists]
+        cell = child_index[exists]
+    return force_x, force_y
+
+
+def _edge_arrays(manager, node_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    收集力导向布局中的弹簧：父子边和兄弟关系
+
+    Args:
+        manager: 思维导图管理器
+        node_ids: 节点ID列表（决定下标）
+
+    Returns:
+        (边起点下标, 边终点下标)
+    """
+    index = {node_id: position for position, node_id in enumerate(node_ids)}
+    sources, targets = [], []
+    for position, node_id in enumerate(node_ids):
+        node = manager.nodes[node_id]
+        parent = index.get(node.parent_id)
+        if parent is not None:
+            sources.append(parent)
+            targets.append(position)
+        for sibling_id in node.sibling_ids:
+            sibling = index.get(sibling_id)
+            # 兄弟关系通常是双向记录的，只保留一条
+            if sibling is not None and sibling > position:
+                sources.append(position)
+                targets.append(sibling)
+    return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+
+def force_layout(
+    manager,
+    iterations: int = 50,
+    edge_length: float = 200,
+    theta: float = 0.8,
+    gravity: float = 0.01,
+    time_budget: Optional[float] = None,
+    seed: int = 0
+) -> Layout:
+    """
+    力导向布局（Fruchterman–Reingold）：弹簧引力 d²/k、节点斥力 k²/d（Barnes–Hut 近似），
+    加上指向中心的弱引力使多个根节点的子图不会分散；每次迭代的位移不超过逐渐降低的温度
+
+    从节点现有的 position 开始迭代（暖启动），所有节点位置都相同时（如从未布局过）从放射状布局开始
+
+    Args:
+        manager: 思维导图管理器
+        iterations: 最大迭代次数
+        edge_length: 理想边长 k
+        theta: Barnes–Hut 近似阈值
+        gravity: 指向中心的引力系数
+        time_budget: 可选的计算时间上限（秒），到时提前结束
+        seed: 重合节点随机错开时使用的随机种子
+
+    Returns:
+        布局结果
+    """
+    started = time.perf_counter()
+    node_ids = list(manager.nodes)
+    n = len(node_ids)
+    if n == 0:
+        return Layout([], np.zeros(0), np.zeros(0))
+
+    nodes = manager.nodes
+    x = np.array([nodes[node_id]._x for node_id in node_ids], dtype=float)
+    y = np.array([nodes[node_id]._y for node_id in node_ids], dtype=float)
+    if np.ptp(x) == 0 and np.ptp(y) == 0:
+        initial = radial_layout(manager, radius_step=edge_length)
+        position = {node_id: i for i, node_id in enumerate(initial.node_ids)}
+        order = [position[node_id] for node_id in node_ids]
+        x, y = initial.x[order].copy(), initial.y[order].copy()
+    # 坐标完全相同的节点之间没有斥力方向，随机错开
+    rng = np.random.default_rng(seed)
+    x += rng.uniform(-1e-3, 1e-3, n) * edge_length
+    y += rng.uniform(-1e-3, 1e-3, n) * edge_length
+
+    sources, targets = _edge_arrays(manager, node_ids)
+    k2 = edge_length * edge_length
+    temperature = edge_length
+    cooling = 0.05 ** (1.0 / max(iterations, 1))
+    for _ in range(iterations):
+        force_x, force_y = barnes_hut_repulsion(x, y, k2, theta)
+
+        if len(sources):
+            dx = x[targets] - x[sources]
+            dy = y[targets] - y[sources]
+            distance = np.sqrt(dx * dx + dy * dy)
+            pull = distance / edge_length
+            force_x += np.bincount(sources, weights=pull * dx, minlength=n)
+            force_y += np.bincount(sources, weights=pull * dy, minlength=n)
+            force_x -= np.bincount(targets, weights=pull * dx, minlength=n)
+            force_y -= np.bincount(targets, weights=pull * dy, minlength=n)
+
+        force_x -= gravity * (x - x.mean()) * edge_length / 10
+        force_y -= gravity * (y - y.mean()) * edge_length / 10
+
+        magnitude = np.maximum(np.sqrt(force_x * force_x + force_y * force_y), 1e-9)
+        step = np.minimum(magnitude, temperature) / magnitude
+        x += force_x * step
+        y += force_y * step
+        temperature *= cooling
+        if time_budget is not None and time.perf_counter() - started > time_budget:
+            break
+    return Layout(node_ids, x, y)
+
+
+# 布局模式 -> 布局函数
+LAYOUT_MODES: Dict[str, Callable[..., Layout]] = {
+    "radial": radial_layout,
+    "tree": tree_layout,
+    "tidy": tidy_layout,
+    "force": force_layout,
+}
+
+
+def compute_layout(manager, mode: str = "radial", **options) -> Layout:
+    """
+    按模式计算布局
+
+    Args:
+        manager: 思维导图管理器
+        mode: 布局模式（radial、tree、tidy、force）
+        **options: 传给布局函数的参数
+
+    Returns:
+        布局结果
+    """
+    if mode not in LAYOUT_MODES:
+        raise ValueError(f"未知的布局模式: {mode}")
+    return LAYOUT_MODES[mode](manager, **options)
+
+
+def place_new_node(
+    manager,
+    node_id: str,
+    mode: str,
+    sibling_spacing: float = 180,
+    level_spacing: float = 150,
+    edge_length: float = 200
+) -> List[str]:
+    """
+    在非放射状布局的导图中就近放置新节点，不重新计算整个布局（放射状布局使用 IncrementalRadialLayout）
+
+    tree / tidy 模式放在父节点下一层、最右侧兄弟节点的右边；force 模式放在距父节点 edge_length 处，
+    方向背离祖父节点并按兄弟序号以黄金角错开；根节点放在现有根节点的右边
+
+    Args:
+        manager: 思维导图管理器
+        node_id: 新节点ID（已加入管理器）
+        mode: 布局模式（tree、tidy、force）
+        sibling_spacing: 相邻节点的水平间距（tree / tidy）
+        level_spacing: 相邻两层的垂直间距（tree / tidy）
+        edge_length: 理想边长（force）
+
+    Returns:
+        位置发生变化的节点ID列表（只有新节点）
+    """
+    nodes = manager.nodes
+    node = nodes[node_id]
+    parent = nodes.get(node.parent_id)
+    siblings = [
+        nodes[other_id] for other_id in (parent.child_ids if parent is not None else manager.root_nodes)
+        if other_id != node_id and other_id in nodes
+    ]
+    if parent is None:
+        x = max((sibling._x for sibling in siblings), default=-sibling_spacing) + sibling_spacing
+        y = max((sibling._y for sibling in siblings), default=0)
+    elif mode == "force":
+        grandparent = nodes.get(parent.parent_id)
+        base = math.atan2(parent._y - grandparent._y, parent._x - grandparent._x) if grandparent is not None else -math.pi / 2
+        angle = base + len(siblings) * math.radians(137.5)
+        x = parent._x + edge_length * math.cos(angle)
+        y = parent._y + edge_length * math.sin(angle)
+    else:
+        x = max((sibling._x + sibling_spacing for sibling in siblings), default=parent._x)
+        y = parent._y + level_spacing
+    return [node_id] if manager.set_positions([node_id], [float(x)], [float(y)]) else []
+
+
+def apply_layout(manager, layout: Layout) -> int:
+    """
+    将布局结果批量写回节点位置
+
+    Args:
+        manager: 思维导图管理器
+        layout: 布局结果
+
+    Returns:
+        写回的节点数
+    """
+    return manager.set_positions(layout.node_ids, layout.x.tolist(), layout.y.tolist())
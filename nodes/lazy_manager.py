@@ -0,0 +1,282 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .mindmap_node import MindMapNode
+from .mindmap_manager import MindMapManager
+from .snapshot import SnapshotReader
+
+
+class LazyNodeMap(Mapping):
+    """
+    按需物化的节点映射
+    以节点ID访问时从快照解码节点对象，并在有界LRU中保留最近访问的节点，
+    可直接传给 MindMapNode.get_ancestors / get_descendants 等接收节点映射的方法
+    """
+
+    def __init__(self, reader: SnapshotReader, capacity: int):
+        """
+        初始化节点映射
+
+        Args:
+            reader: 快照读取器
+            capacity: 常驻节点数上限
+        """
+        self._reader = reader
+        self._capacity = max(capacity, 1)
+        self._live: "OrderedDict[str, MindMapNode]" = OrderedDict()
+
+    def __getitem__(self, node_id: str) -> MindMapNode:
+        node = self._live.get(node_id)
+        if node is not None:
+            self._live.move_to_end(node_id)
+            return node
+        number = self._reader.find(node_id)
+        if number is None:
+            raise KeyError(node_id)
+        node = self._reader.node(number)
+        self._live[node_id] = node
+        if len(self._live) > self._capacity:
+            self._live.popitem(last=False)
+        return node
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._live or (isinstance(node_id, str) and self._reader.find(node_id) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        strings = self._reader.strings
+        for record in self._reader.iter_records():
+            yield strings[record[0]]
+
+    def __len__(self) -> int:
+        return self._reader.node_count
+
+    @property
+    def live_count(self) -> int:
+        """当前常驻内存的节点数"""
+        return len(self._live)
+
+
+class LazyMindMapManager:
+    """
+    只读为主的思维导图管理器
+    以内存映射方式打开二进制快照，打开时只解析头部和管理器信息，
+    节点在 get_node / get_subtree 等访问时才从快照解码，并由有界LRU缓存
+
+    物化出的节点对象不会写回快照，需要编辑时使用 to_manager() 全量加载
+    """
+
+    def __init__(self, reader: SnapshotReader, capacity: int = 10000):
+        """
+        初始化管理器
+
+        Args:
+            reader: 快照读取器
+            capacity: 常驻节点数上限
+        """
+        self._reader = reader
+        meta = reader.meta
+        self.mindmap_id = meta["mindmap_id"]
+        self.created_at = datetime.fromisoformat(meta["created_at"])
+        self.updated_at = datetime.fromisoformat(meta["updated_at"])
+        self.metadata = meta.get("metadata", {})
+        self.focused_node_id = meta.get("focused_node_id")
+        self.root_nodes = reader.root_ids()
+        self.nodes = LazyNodeMap(reader, capacity)
+        self._statistics: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def open(cls, filepath: str, capacity: int = 10000) -> Optional['LazyMindMapManager']:
+        """
+        打开二进制快照文件
+
+        Args:
+            filepath: 快照文件路径
+            capacity: 常驻节点数上限
+
+        Returns:
+            管理器对象，如果失败则返回None
+        """
+        try:
+            return cls(SnapshotReader(filepath), capacity)
+        except Exception as e:
+            print(f"打开思维导图快照失败: {e}")
+            return None
+
+    def close(self) -> None:
+        """
+        关闭快照文件
+        """
+        self._reader.close()
+
+    def __enter__(self) -> 'LazyMindMapManager':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get_node(self, node_id: str) -> Optional[MindMapNode]:
+        """
+        获取节点
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            节点对象，如果不存在则返回None
+        """
+        return self.nodes.get(node_id)
+
+    def get_root_nodes(self) -> List[MindMapNode]:
+        """
+        获取所有根节点
+
+        Returns:
+            根节点列表
+        """
+        return [self.nodes[node_id] for node_id in self.root_nodes if node_id in self.nodes]
+
+    def get_node_path(self, node_id: str) -> List[MindMapNode]:
+        """
+        获取节点路径（从根节点到指定节点的路径）
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            节点路径列表
+        """
+        node = self.get_node(node_id)
+        if node is None:
+            return []
+        return node.get_ancestors(self.nodes) + [node]
+
+    def get_subtree(self, node_id: str) -> List[MindMapNode]:
+        """
+        获取子树（指定节点及其所有后代）
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            子树节点列表
+        """
+        node = self.get_node(node_id)
+        if node is None:
+            return []
+        return [node] + node.get_descendants(self.nodes)
+
+    def get_focus_node(self) -> Optional[MindMapNode]:
+        """
+        获取当前焦点节点
+
+        Returns:
+            焦点节点对象，如果没有则返回None
+        """
+        if self.focused_node_id:
+            return self.get_node(self.focused_node_id)
+        return None
+
+    def get_focus_node_id(self) -> Optional[str]:
+        """
+        获取当前焦点节点ID
+
+        Returns:
+            焦点节点ID，如果没有则返回None
+        """
+        return self.focused_node_id
+
+    def to_manager(self) -> MindMapManager:
+        """
+        全量加载为可编辑的 MindMapManager
+
+        Returns:
+            思维导图管理器对象
+        """
+        reader = self._reader
+        manager = MindMapManager(mindmap_id=self.mindmap_id)
+        manager.created_at = self.created_at
+        manager.updated_at = self.updated_at
+        manager.metadata = dict(self.metadata)
+        manager.focused_node_id = self.focused_node_id
+        manager.root_nodes = list(self.root_nodes)
+        for number in range(reader.node_count):
+            node = reader.node(number)
+            manager.nodes[node.node_id] = node
+        manager.rebuild_indexes()
+        return manager
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        获取思维导图统计信息（首次调用时顺序扫描节点表，不物化节点对象）
+
+        Returns:
+            统计信息字典
+        """
+        if self._statistics is None:
+            self._statistics = self._scan_statistics()
+        return {
+            **self._statistics,
+            "focused_node_id": self.focused_node_id,
+            "has_focus_node": self.focused_node_id is not None,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+
+    def _scan_statistics(self) -> Dict[str, Any]:
+        """
+        扫描节点记录统计叶节点数、类型分布和最大深度
+
+        Returns:
+            与节点数量相关的统计字段
+        """
+        reader = self._reader
+        strings = reader.strings
+        # 以字符串编号统计，最后只解码出现过的类型名
+        type_numbers: Dict[int, int] = {}
+        record_of_id: Dict[int, int] = {}
+        parents: List[int] = []
+        leaf_nodes = 0
+        for number, record in enumerate(reader.iter_records()):
+            record_of_id[record[0]] = number
+            parents.append(record[4])
+            type_numbers[record[3]] = type_numbers.get(record[3], 0) + 1
+            if record[15] == 0:
+                leaf_nodes += 1
+
+        # 沿父指针计算深度（与 MindMapNode.get_depth 一致，父节点不存在即视为根）
+        depths = [-1] * len(parents)
+        for number in range(len(parents)):
+            chain = []
+            current = number
+            while current is not None and depths[current] == -1:
+                # -2 标记正在计算的节点，遇到父指针成环时停止
+                depths[current] = -2
+                chain.append(current)
+                current = record_of_id.get(parents[current])
+            depth = depths[current] if current is not None and depths[current] >= 0 else -1
+            for chained in reversed(chain):
+                depth += 1
+                depths[chained] = depth
+
+        type_counts: Dict[str, int] = {}
+        for string_number, count in type_numbers.items():
+            node_type = strings[string_number] if string_number >= 0 else None
+            type_counts[node_type] = type_counts.get(node_type, 0) + count
+        return {
+            "total_nodes": reader.node_count,
+            "root_nodes": len(self.root_nodes),
+            "leaf_nodes": leaf_nodes,
+            "max_depth": max(depths, default=0),
+            "type_counts": type_counts,
+        }
+
+    def __str__(self) -> str:
+        """字符串表示"""
+        return f"LazyMindMapManager(id={self.mindmap_id}, nodes={len(self.nodes)}, roots={len(self.root_nodes)})"
+
+    def __repr__(self) -> str:
+        """详细字符串表示"""
+        return (f"LazyMindMapManager(mindmap_id='{self.mindmap_id}', nodes_count={len(self.nodes)}, "
+                f"live_nodes={self.nodes.live_count})")
@@ -1,7 +1,20 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
 from datetime import datetime
 import json
+import os
+import tempfile
 from .mindmap_node import MindMapNode
+from .snapshot import SNAPSHOT_EXTENSION, dump_snapshot, is_snapshot_file, load_snapshot
+from .node_table import NodeTable
+from .tree_index import TreeIndex
+from .text_index import TextIndex
+from .attribute_index import AttributeIndex
+from .spatial_index import EdgeIndex, SpatialIndex
+from .journal import JOURNALED_FIELDS, OperationJournal
+
+
+# 逐行JSON导出文件的默认扩展名
+NDJSON_EXTENSION = ".ndjson"
 
 
 class MindMapManager:
@@ -24,6 +37,28 @@ class MindMapManager:
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.metadata: Dict[str, Any] = {}
+        # 自上次保存（或从文件加载）后是否被修改过，由存储层在写回磁盘后清除
+        self.dirty = True
+        
+        # 节点句柄表：内部索引以整数句柄代替字符串ID
+        self._table = NodeTable()
+        # 根节点ID集合，用于O(1)判断节点是否在 root_nodes 中
+        self._root_set = set()
+        
+        # 树索引（深度、欧拉序区间），随增删移动增量维护
+        self._tree = TreeIndex(self._table)
+        # 属性二级索引（类型、优先级、叶子节点）
+        self._attributes = AttributeIndex(self._table)
+        # 节点位置的网格空间索引，用于视口裁剪
+        self._spatial = SpatialIndex(self._table)
+        # 父子连线的网格空间索引，用于折线切割和视口内连线查询
+        self._edges = EdgeIndex(self._table)
+        # 可选的全文倒排索引，通过 enable_text_index 启用
+        self._text_index: Optional[TextIndex] = None
+        # 视口查询使用的子树包围盒，首次视口查询时创建（见 viewport.get_subtree_bounds），随修改增量失效
+        self._bounds = None
+        # 可选的操作日志，通过 open_journaled 或 attach_journal 挂接
+        self._journal: Optional[OperationJournal] = None
     
     def add_node(self, node: MindMapNode) -> bool:
         """
@@ -37,21 +72,90 @@ class MindMapManager:
         """
         if node.node_id not in self.nodes:
             self.nodes[node.node_id] = node
+            handle = self._table.add(node)
             
             # 如果是根节点，添加到根节点列表
             if node.is_root():
-                if node.node_id not in self.root_nodes:
-                    self.root_nodes.append(node.node_id)
+                self._add_root(node.node_id)
             
             # 如果有父节点，建立父子关系
             if node.parent_id and node.parent_id in self.nodes:
                 parent = self.nodes[node.parent_id]
                 parent.add_child(node)
+            self._adopt_waiting(node)
             
-            self.updated_at = datetime.now()
+            node._owner = self
+            self._tree.add(handle)
+            self._attributes.add(handle)
+            self._spatial.add(handle)
+            self._update_edges(node)
+            if self._text_index is not None:
+                self._text_index.add(handle)
+            if self._bounds is not None:
+                self._bounds.invalidate(handle)
+            self._mark_modified()
+            if self._journal is not None:
+                self._journal.append("add", node=node.to_dict())
             return True
         return False
-    
+
+    def add_nodes(self, nodes: Iterable[MindMapNode]) -> List[str]:
+        """
+        批量添加节点（例如一次扩展出的整层子节点）
+
+        节点全部登记后再统一建立父子关系和索引，批内父节点可以出现在子节点之后；
+        批量大于已有节点数时全量重建树索引，挂接操作日志时整批只记录一条操作
+
+        Args:
+            nodes: 要添加的节点，ID已存在（包括批内重复）的节点会被跳过
+
+        Returns:
+            添加成功的节点ID列表
+        """
+        added = []
+        for node in nodes:
+            if node.node_id not in self.nodes:
+                self.nodes[node.node_id] = node
+                self._table.add(node)
+                added.append(node)
+        if not added:
+            return []
+
+        # 先建立父子关系再设置所属管理器，批内节点挂接子节点时不会通知尚未索引的句柄
+        for node in added:
+            if node.is_root():
+                self._add_root(node.node_id)
+            elif node.parent_id in self.nodes:
+                self.nodes[node.parent_id].add_child(node)
+        for node in added:
+            self._adopt_waiting(node)
+
+        handles = []
+        for node in added:
+            node._owner = self
+            handle = self._table.get(node.node_id)
+            handles.append(handle)
+            self._attributes.add(handle)
+            self._spatial.add(handle)
+            if self._text_index is not None:
+                self._text_index.add(handle)
+        for node in added:
+            self._update_edges(node)
+        if len(added) * 2 > len(self.nodes):
+            self._tree.rebuild()
+            if self._bounds is not None:
+                self._bounds.reset()
+        else:
+            for handle in handles:
+                self._tree.add(handle)
+                if self._bounds is not None:
+                    self._bounds.invalidate(handle)
+
+        self._mark_modified()
+        if self._journal is not None:
+            self._journal.append("add_many", nodes=[node.to_dict() for node in added])
+        return [node.node_id for node in added]
+
     def remove_node(self, node_id: str) -> bool:
         """
         移除节点
@@ -73,21 +177,37 @@ class MindMapManager:
             parent.remove_child(node_id)
         
         # 处理子节点（可以选择删除或重新分配）
-        for child_id in node.children[:]:  # 复制列表避免修改迭代
+        promoted_ids = []
+        for child_id in list(node.child_ids):  # 复制列表避免修改迭代
             child = self.nodes.get(child_id)
             if child:
                 # 将子节点提升为根节点
                 child.parent_id = None
-                if child_id not in self.root_nodes:
-                    self.root_nodes.append(child_id)
+                promoted_ids.append(child_id)
+                self._add_root(child_id)
         
         # 从根节点列表中移除
-        if node_id in self.root_nodes:
-            self.root_nodes.remove(node_id)
+        self._remove_root(node_id)
         
         # 删除节点
         del self.nodes[node_id]
-        self.updated_at = datetime.now()
+        node._owner = None
+        handle = self._table.get(node_id)
+        self._tree.remove(handle, [self._table.get(child_id) for child_id in promoted_ids])
+        self._attributes.remove(handle)
+        self._spatial.remove(handle)
+        self._edges.remove(handle)
+        for child_id in promoted_ids:
+            self._edges.remove(self._table.get(child_id))
+        if self._text_index is not None:
+            self._text_index.remove(handle)
+        if self._bounds is not None:
+            self._bounds.remove(handle)
+            self._bounds.invalidate(self._table.get(node.parent_id))
+        self._table.remove(node_id)
+        self._mark_modified()
+        if self._journal is not None:
+            self._journal.append("remove", id=node_id)
         return True
     
     def get_node(self, node_id: str) -> Optional[MindMapNode]:
@@ -130,7 +250,28 @@ class MindMapManager:
         Returns:
             匹配的节点列表
         """
-        return [node for node in self.nodes.values() if node.node_type == node_type]
+        return self._attributes.find_by_type(node_type)
+    
+    def get_top_priority_nodes(self, k: int) -> List[MindMapNode]:
+        """
+        获取优先级最高的k个节点
+        
+        Args:
+            k: 数量
+            
+        Returns:
+            按优先级从高到低排列的节点列表，优先级相同时按加入顺序
+        """
+        return self._attributes.top_priority(k)
+    
+    def get_leaf_nodes(self) -> List[MindMapNode]:
+        """
+        获取所有叶子节点
+        
+        Returns:
+            叶子节点列表
+        """
+        return self._attributes.find_leaves()
     
     def find_nodes_by_title(self, title: str, case_sensitive: bool = False) -> List[MindMapNode]:
         """
@@ -143,6 +284,11 @@ class MindMapManager:
         Returns:
             匹配的节点列表
         """
+        if self._text_index is not None:
+            matched = self._text_index.search("title", title, case_sensitive)
+            if matched is not None:
+                return matched
+        
         if case_sensitive:
             return [node for node in self.nodes.values() if title in node.title]
         else:
@@ -159,11 +305,61 @@ class MindMapManager:
         Returns:
             匹配的节点列表
         """
+        if self._text_index is not None:
+            matched = self._text_index.search("content", content, case_sensitive)
+            if matched is not None:
+                return matched
+        
         if case_sensitive:
             return [node for node in self.nodes.values() if content in node.content]
         else:
             return [node for node in self.nodes.values() if content.lower() in node.content.lower()]
     
+    def find_nodes_in_rect(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[MindMapNode]:
+        """
+        查找位置落在矩形内（含边界）的节点（由网格空间索引支持）
+        
+        Args:
+            min_x, min_y: 矩形左上角
+            max_x, max_y: 矩形右下角
+            
+        Returns:
+            匹配的节点列表（按加入顺序）
+        """
+        table = self._table
+        handles = sorted(self._spatial.query(min_x, min_y, max_x, max_y), key=table.order.__getitem__)
+        return [table.nodes[handle] for handle in handles]
+    
+    def find_edges_in_rect(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[Tuple[str, str]]:
+        """
+        查找与矩形（含边界）相交的父子连线（由连线空间索引支持）
+        
+        Args:
+            min_x, min_y: 矩形左上角
+            max_x, max_y: 矩形右下角
+            
+        Returns:
+            (父节点ID, 子节点ID) 列表（按子节点加入顺序）
+        """
+        table = self._table
+        handles = sorted(self._edges.query(min_x, min_y, max_x, max_y), key=table.order.__getitem__)
+        return [(table.nodes[handle].parent_id, table.ids[handle]) for handle in handles]
+    
+    def find_crossed_edges(self, points: List[Tuple[float, float]]) -> List[Tuple[str, str]]:
+        """
+        查找与折线（如前端的切割轨迹）相交的父子连线
+        
+        只检查折线经过的网格中的连线，耗时与经过的网格数和命中数成正比
+        
+        Args:
+            points: 折线顶点 [(x, y), ...]（画布坐标）
+            
+        Returns:
+            (父节点ID, 子节点ID) 列表（按被折线首次切到的顺序）
+        """
+        table = self._table
+        return [(table.nodes[handle].parent_id, table.ids[handle]) for handle in self._edges.crossing(points)]
+    
     def get_node_path(self, node_id: str) -> List[MindMapNode]:
         """
         获取节点路径（从根节点到指定节点的路径）
@@ -196,6 +392,253 @@ class MindMapManager:
         node = self.nodes[node_id]
         return [node] + node.get_descendants(self.nodes)
     
+    def get_node_depth(self, node_id: str) -> Optional[int]:
+        """
+        获取节点深度（根节点深度为0），O(1)
+        
+        Args:
+            node_id: 节点ID
+            
+        Returns:
+            节点深度，如果节点不存在则返回None
+        """
+        handle = self._table.get(node_id)
+        if handle is None:
+            return None
+        return self._tree.get_depth(handle)
+    
+    def get_max_depth(self) -> int:
+        """
+        获取思维导图的最大深度
+        
+        Returns:
+            最大深度
+        """
+        return self._tree.get_max_depth()
+    
+    def is_ancestor(self, ancestor_id: str, node_id: str) -> bool:
+        """
+        判断一个节点是否为另一个节点的祖先，O(1)
+        
+        Args:
+            ancestor_id: 祖先节点ID
+            node_id: 后代节点ID
+            
+        Returns:
+            是否为祖先
+        """
+        ancestor = self._table.get(ancestor_id)
+        handle = self._table.get(node_id)
+        if ancestor is None or handle is None:
+            return False
+        return self._tree.is_ancestor(ancestor, handle)
+    
+    def rebuild_indexes(self, share_ids: bool = True) -> None:
+        """
+        全量重建索引（绕过管理器直接修改节点关系后调用）
+        
+        Args:
+            share_ids: 是否让关系中的ID引用节点自身的ID字符串（ID已共享时可跳过）
+        """
+        table = self._table
+        table.clear()
+        table.extend(self.nodes.values())
+        for node in self.nodes.values():
+            node._owner = self
+        
+        if share_ids:
+            self._share_ids()
+        self._root_set = set(self.root_nodes)
+        
+        self._tree.rebuild()
+        if self._bounds is not None:
+            self._bounds.reset()
+        self._attributes = AttributeIndex(table)
+        self._spatial = SpatialIndex(table, self._spatial.cell_size)
+        self._edges = EdgeIndex(table, self._edges.cell_size)
+        if self._text_index is not None:
+            self._text_index = TextIndex(table, self._text_index.fields)
+    
+    def _share_ids(self) -> None:
+        """
+        关系中的ID统一引用节点自身的ID字符串，避免加载后每处各存一份
+        """
+        canonical = self._table.canonical
+        for node in self.nodes.values():
+            node.parent_id = canonical(node.parent_id)
+            # 只改写已分配的列表，叶子节点和没有兄弟节点的节点不分配新列表
+            children = node._children
+            if children:
+                children[:] = [canonical(child_id) for child_id in children]
+            siblings = node._siblings
+            if siblings:
+                siblings[:] = [canonical(sibling_id) for sibling_id in siblings]
+        self.root_nodes[:] = [canonical(root_id) for root_id in self.root_nodes]
+    
+    def enable_text_index(self, fields: Tuple[str, ...] = ("title", "content")) -> None:
+        """
+        启用全文倒排索引，加速 find_nodes_by_title / find_nodes_by_content
+        
+        Args:
+            fields: 需要索引的字段
+        """
+        self._text_index = TextIndex(self._table, fields)
+    
+    def disable_text_index(self) -> None:
+        """
+        停用全文倒排索引
+        """
+        self._text_index = None
+    
+    def _mark_modified(self) -> None:
+        """
+        记录导图被修改：刷新修改时间并标记为未保存
+        """
+        self.updated_at = datetime.now()
+        self.dirty = True
+    
+    def _on_node_changed(self, node: MindMapNode, field: str, old_value: Any) -> None:
+        """
+        节点字段变化回调，由 MindMapNode 调用
+        
+        Args:
+            node: 发生变化的节点
+            field: 字段名
+            old_value: 变化前的值
+        """
+        handle = self._table.get(node.node_id)
+        if handle is None or self._table.nodes[handle] is not node:
+            return
+        self.dirty = True
+        if field in ("title", "content"):
+            if self._text_index is not None:
+                self._text_index.update(handle, field, old_value)
+        elif field == "position":
+            self._spatial.move(handle)
+            self._update_edges(node)
+            if self._bounds is not None:
+                self._bounds.invalidate(handle)
+        else:
+            self._attributes.update(handle, field, old_value)
+        if self._journal is not None and field in JOURNALED_FIELDS:
+            self._journal.record_update(node, field)
+    
+    def attach_journal(self, journal: OperationJournal) -> None:
+        """
+        挂接操作日志，之后的修改操作都会追加到日志中
+        
+        Args:
+            journal: 操作日志
+        """
+        self._journal = journal
+        journal.manager = self
+    
+    def detach_journal(self) -> None:
+        """
+        解除操作日志
+        """
+        self._journal = None
+    
+    def _add_root(self, node_id: str) -> None:
+        """
+        将节点加入根节点列表（已存在则忽略）
+        
+        Args:
+            node_id: 节点ID
+        """
+        if node_id not in self._root_set:
+            self._root_set.add(node_id)
+            self.root_nodes.append(node_id)
+    
+    def _remove_root(self, node_id: str) -> None:
+        """
+        将节点移出根节点列表
+        
+        Args:
+            node_id: 节点ID
+        """
+        if node_id in self._root_set:
+            self._root_set.discard(node_id)
+            self.root_nodes.remove(node_id)
+    
+    def _adopt_waiting(self, node: MindMapNode) -> None:
+        """
+        将先于该节点加入、父指针指向该节点的子节点加入其子节点列表（需在设置所属管理器之前调用）
+
+        Args:
+            node: 新加入的节点
+        """
+        for handle in self._tree.waiting_children(node.node_id):
+            node.add_child(self._table.nodes[handle])
+
+    def _update_edges(self, node: MindMapNode) -> None:
+        """
+        重新登记节点到父节点以及节点到各子节点的连线
+        
+        Args:
+            node: 加入导图或位置变化的节点
+        """
+        self._edges.update(self._table.get(node.node_id))
+        for child_id in node.child_ids:
+            handle = self._table.get(child_id)
+            if handle is not None:
+                self._edges.update(handle)
+    
+    def set_positions(self, node_ids: List[str], xs: List[float], ys: List[float]) -> int:
+        """
+        批量设置节点位置（如写回服务端布局结果）
+        
+        挂接操作日志时整批只记录一条操作
+        
+        Args:
+            node_ids: 节点ID列表
+            xs: 横坐标列表
+            ys: 纵坐标列表
+            
+        Returns:
+            设置成功的节点数（不存在的节点被跳过）
+        """
+        written_ids, written_xs, written_ys = [], [], []
+        written = []
+        for node_id, x, y in zip(node_ids, xs, ys):
+            node = self.nodes.get(node_id)
+            if node is None:
+                continue
+            node._x = x
+            node._y = y
+            node._touch()
+            written.append(node)
+            written_ids.append(node_id)
+            written_xs.append(x)
+            written_ys.append(y)
+        
+        if len(written) * 2 > len(self.nodes):
+            # 整体布局写回：重建空间索引比逐个移动更快
+            self._spatial = SpatialIndex(self._table, self._spatial.cell_size)
+            self._edges = EdgeIndex(self._table, self._edges.cell_size)
+            if self._bounds is not None:
+                self._bounds.reset()
+        else:
+            # 两端任一节点移动过的连线各重新登记一次
+            edge_handles = set()
+            for node in written:
+                handle = self._table.get(node.node_id)
+                self._spatial.move(handle)
+                edge_handles.add(handle)
+                if self._bounds is not None:
+                    self._bounds.invalidate(handle)
+                for child_id in node.child_ids:
+                    edge_handles.add(self._table.get(child_id))
+            edge_handles.discard(None)
+            for handle in edge_handles:
+                self._edges.update(handle)
+        
+        if written_ids:
+            self._mark_modified()
+            if self._journal is not None:
+                self._journal.append("positions", ids=written_ids, x=written_xs, y=written_ys)
+        return len(written_ids)
+    
     def move_node(self, node_id: str, new_parent_id: Optional[str]) -> bool:
         """
         移动节点到新的父节点
@@ -210,6 +653,13 @@ class MindMapManager:
         if node_id not in self.nodes:
             return False
         
+        # 新父节点必须存在，且不能是节点自身或其后代（否则会形成环）
+        if new_parent_id:
+            if new_parent_id not in self.nodes:
+                return False
+            if new_parent_id == node_id or self.is_ancestor(node_id, new_parent_id):
+                return False
+        
         node = self.nodes[node_id]
         old_parent_id = node.parent_id
         
@@ -219,25 +669,80 @@ class MindMapManager:
             old_parent.remove_child(node_id)
         
         # 从根节点列表移除（如果之前是根节点）
-        if node_id in self.root_nodes:
-            self.root_nodes.remove(node_id)
+        self._remove_root(node_id)
         
         # 设置新的父节点
         if new_parent_id:
-            if new_parent_id not in self.nodes:
-                return False
-            
             new_parent = self.nodes[new_parent_id]
             new_parent.add_child(node)
         else:
             # 移动到根级别
             node.parent_id = None
-            if node_id not in self.root_nodes:
-                self.root_nodes.append(node_id)
+            self._add_root(node_id)
         
-        self.updated_at = datetime.now()
+        self._tree.move(self._table.get(node_id))
+        self._edges.update(self._table.get(node_id))
+        if self._bounds is not None:
+            self._bounds.invalidate(self._table.get(old_parent_id))
+            self._bounds.invalidate(self._table.get(new_parent_id))
+        self._mark_modified()
+        if self._journal is not None:
+            self._journal.append("move", id=node_id, parent=new_parent_id)
         return True
     
+    def cut_edges(self, edges: Iterable[Tuple[str, str]]) -> List[str]:
+        """
+        批量切断父子连线：子节点从父节点移除（remove_child）并成为根节点，子树保持不变
+        
+        整批作为一次操作：先校验全部连线再统一修改，挂接操作日志时只记录一条操作
+        
+        Args:
+            edges: (父节点ID, 子节点ID) 列表，父子关系已不成立的连线被跳过
+            
+        Returns:
+            被切断连线的子节点ID列表
+        """
+        cut_ids = []
+        seen = set()
+        for parent_id, child_id in edges:
+            child = self.nodes.get(child_id)
+            if child is None or child_id in seen or not parent_id or child.parent_id != parent_id:
+                continue
+            seen.add(child_id)
+            cut_ids.append(child_id)
+        if not cut_ids:
+            return []
+        
+        for child_id in cut_ids:
+            child = self.nodes[child_id]
+            parent = self.nodes.get(child.parent_id)
+            if parent is not None:
+                parent.remove_child(child_id)
+            child.parent_id = None
+            self._add_root(child_id)
+            handle = self._table.get(child_id)
+            self._tree.move(handle)
+            self._edges.remove(handle)
+            if self._bounds is not None and parent is not None:
+                self._bounds.invalidate(self._table.get(parent.node_id))
+        
+        self._mark_modified()
+        if self._journal is not None:
+            self._journal.append("cut", ids=cut_ids)
+        return cut_ids
+    
+    def cut_crossed_edges(self, points: List[Tuple[float, float]]) -> List[str]:
+        """
+        切断与折线相交的所有父子连线（服务端执行的整条切割轨迹）
+        
+        Args:
+            points: 折线顶点 [(x, y), ...]（画布坐标）
+            
+        Returns:
+            被切断连线的子节点ID列表
+        """
+        return self.cut_edges(self.find_crossed_edges(points))
+    
     def duplicate_node(self, node_id: str, new_parent_id: Optional[str] = None) -> Optional[str]:
         """
         复制节点
@@ -294,7 +799,9 @@ class MindMapManager:
         # 设置新的焦点节点
         self.focused_node_id = node_id
         self.nodes[node_id].set_focus(True)
-        self.updated_at = datetime.now()
+        self._mark_modified()
+        if self._journal is not None:
+            self._journal.append("focus", id=node_id)
         return True
     
     def get_focus_node(self) -> Optional[MindMapNode]:
@@ -318,7 +825,9 @@ class MindMapManager:
         if self.focused_node_id and self.focused_node_id in self.nodes:
             self.nodes[self.focused_node_id].set_focus(False)
             self.focused_node_id = None
-            self.updated_at = datetime.now()
+            self._mark_modified()
+            if self._journal is not None:
+                self._journal.append("unfocus")
             return True
         return False
     
@@ -408,38 +917,144 @@ class MindMapManager:
             node = MindMapNode.from_dict(node_data)
             manager.nodes[node_id] = node
         
+        manager.rebuild_indexes()
         return manager
     
-    def save_to_file(self, filepath: str) -> bool:
+    def iter_export(self) -> Iterator[str]:
+        """
+        以换行分隔的JSON（NDJSON）逐行导出思维导图，不构建完整的文档
+        
+        第一行为管理器信息（type 为 "mindmap"），之后每行一个节点（type 为 "node"，其余字段同 MindMapNode.to_dict）。
+        导出开始时记录节点列表，导出过程中新增的节点不会被导出
+        
+        Returns:
+            以换行符结尾的JSON行迭代器
+        """
+        yield json.dumps({
+            "type": "mindmap",
+            "mindmap_id": self.mindmap_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "metadata": self.metadata,
+            "root_nodes": self.root_nodes,
+            "focused_node_id": self.focused_node_id
+        }, ensure_ascii=False) + "\n"
+        for node in list(self.nodes.values()):
+            yield json.dumps({"type": "node", **node.to_dict()}, ensure_ascii=False) + "\n"
+    
+    @classmethod
+    def stream_import(cls, lines: Iterable[Union[str, bytes]]) -> 'MindMapManager':
+        """
+        从 iter_export 格式的JSON行逐行构建思维导图管理器
+        
+        Args:
+            lines: JSON行（可以是打开的文件或任意行迭代器），空行会被忽略
+            
+        Returns:
+            思维导图管理器对象
+        """
+        manager = None
+        for line in lines:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if manager is None:
+                if data.get("type") != "mindmap":
+                    raise ValueError("第一行必须是思维导图信息")
+                manager = cls(mindmap_id=data["mindmap_id"])
+                manager.created_at = datetime.fromisoformat(data["created_at"])
+                manager.updated_at = datetime.fromisoformat(data["updated_at"])
+                manager.metadata = data.get("metadata", {})
+                manager.root_nodes = data.get("root_nodes", [])
+                manager.focused_node_id = data.get("focused_node_id")
+            elif data.get("type") == "node":
+                node = MindMapNode.from_dict(data)
+                manager.nodes[node.node_id] = node
+        
+        if manager is None:
+            raise ValueError("缺少思维导图信息")
+        manager.rebuild_indexes()
+        return manager
+    
+    def save_to_file(self, filepath: str, file_format: Optional[str] = None) -> bool:
         """
         保存思维导图到文件
         
         Args:
             filepath: 文件路径
+            file_format: 文件格式，"json"、"ndjson" 或 "binary"；不提供时按扩展名选择（.mmb 为二进制快照，.ndjson 为逐行JSON）
             
         Returns:
             是否保存成功
         """
+        if file_format is None:
+            if filepath.endswith(SNAPSHOT_EXTENSION):
+                file_format = "binary"
+            elif filepath.endswith(NDJSON_EXTENSION):
+                file_format = "ndjson"
+            else:
+                file_format = "json"
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.export_to_dict(), f, ensure_ascii=False, indent=2)
+            if file_format not in ("binary", "ndjson", "json"):
+                raise ValueError(f"不支持的文件格式: {file_format}")
+            # 先在同一目录写唯一命名的临时文件并 fsync，再原子替换，写入中途失败不会破坏原文件，
+            # 并发保存到同一路径时也不会互相覆盖临时文件
+            fd, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(filepath) or ".", prefix=os.path.basename(filepath) + ".", suffix=".tmp"
+            )
+            replaced = False
+            try:
+                if file_format == "binary":
+                    with os.fdopen(fd, 'wb') as f:
+                        dump_snapshot(self, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        if file_format == "ndjson":
+                            f.writelines(self.iter_export())
+                        else:
+                            json.dump(self.export_to_dict(), f, ensure_ascii=False, indent=2)
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(temp_path, filepath)
+                replaced = True
+            finally:
+                if not replaced:
+                    os.remove(temp_path)
             return True
         except Exception as e:
             print(f"保存思维导图失败: {e}")
             return False
     
     @classmethod
-    def load_from_file(cls, filepath: str) -> Optional['MindMapManager']:
+    def load_from_file(cls, filepath: str, file_format: Optional[str] = None) -> Optional['MindMapManager']:
         """
         从文件加载思维导图
         
         Args:
             filepath: 文件路径
+            file_format: 文件格式，"json"、"ndjson" 或 "binary"；不提供时根据文件头和扩展名自动识别
             
         Returns:
             思维导图管理器对象，如果失败则返回None
         """
+        if file_format is None:
+            if is_snapshot_file(filepath):
+                file_format = "binary"
+            elif filepath.endswith(NDJSON_EXTENSION):
+                file_format = "ndjson"
+            else:
+                file_format = "json"
         try:
+            if file_format == "binary":
+                with open(filepath, 'rb') as f:
+                    return load_snapshot(cls, f.read())
+            if file_format == "ndjson":
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    return cls.stream_import(f)
+            if file_format != "json":
+                raise ValueError(f"不支持的文件格式: {file_format}")
             with open(filepath, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             return cls.from_dict(data)
@@ -447,6 +1062,32 @@ class MindMapManager:
             print(f"加载思维导图失败: {e}")
             return None
     
+    @classmethod
+    def open_journaled(cls, filepath: str, mindmap_id: Optional[str] = None, **options: Any) -> Optional['MindMapManager']:
+        """
+        打开带操作日志的思维导图：加载快照、重放日志，之后的修改增量写入日志并定期压缩为快照
+        
+        Args:
+            filepath: 快照文件路径，日志文件为 filepath + ".log"
+            mindmap_id: 快照不存在时新建导图使用的ID
+            **options: 传给 OperationJournal 的参数（batch_size、flush_interval、compact_threshold）
+            
+        Returns:
+            思维导图管理器对象，如果失败则返回None；使用完毕后调用 close_journal
+        """
+        try:
+            return OperationJournal(filepath, **options).recover(cls, mindmap_id)
+        except Exception as e:
+            print(f"打开思维导图日志失败: {e}")
+            return None
+    
+    def close_journal(self) -> None:
+        """
+        写入剩余日志记录并关闭操作日志
+        """
+        if self._journal is not None:
+            self._journal.close()
+    
     def get_statistics(self) -> Dict[str, Any]:
         """
         获取思维导图统计信息
@@ -456,18 +1097,13 @@ class MindMapManager:
         """
         total_nodes = len(self.nodes)
         root_nodes = len(self.root_nodes)
-        leaf_nodes = sum(1 for node in self.nodes.values() if node.is_leaf())
+        leaf_nodes = len(self._attributes.leaves)
         
-        # 按类型统计
-        type_counts = {}
-        for node in self.nodes.values():
-            type_counts[node.node_type] = type_counts.get(node.node_type, 0) + 1
+        # 按类型统计（由属性索引维护，O(类型数)）
+        type_counts = self._attributes.type_counts()
         
-        # 计算最大深度
-        max_depth = 0
-        for node in self.nodes.values():
-            depth = node.get_depth(self.nodes)
-            max_depth = max(max_depth, depth)
+        # 最大深度由树索引维护
+        max_depth = self._tree.get_max_depth()
         
         return {
             "total_nodes": total_nodes,
@@ -1,5 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence
 from datetime import datetime
+import time
 import uuid
 
 
@@ -7,8 +8,18 @@ class MindMapNode:
     """
     思维导图节点类
     包含节点信息、子节点和父节点的管理
+    
+    采用紧凑存储：使用 __slots__ 而非实例 __dict__，时间戳存为浮点秒，
+    坐标存为两个数值，children / siblings / metadata 在首次使用时才分配
     """
     
+    __slots__ = (
+        "_owner", "node_id", "_title", "_content", "_node_type", "parent_id", "_metadata",
+        "_created_ts", "_updated_ts", "_children", "_siblings",
+        "_is_expanded", "_is_visible", "_priority", "is_focused",
+        "color", "icon", "_x", "_y",
+    )
+    
     def __init__(
         self,
         title: str,
@@ -29,31 +40,193 @@ class MindMapNode:
             node_id: 节点唯一ID，如果不提供则自动生成
             metadata: 额外的元数据
         """
+        # 所属的管理器，字段变化时通知其更新索引
+        self._owner = None
+        
         self.node_id = node_id or str(uuid.uuid4())
-        self.title = title
-        self.content = content
-        self.node_type = node_type
+        self._title = title
+        self._content = content
+        self._node_type = node_type
         self.parent_id = parent_id
-        self.metadata = metadata or {}
+        self._metadata: Optional[Dict[str, Any]] = metadata or None
         
-        # 时间戳
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        # 时间戳（Unix时间戳，读取时转换为datetime）
+        self._created_ts = self._updated_ts = time.time()
         
-        # 节点关系
-        self.children: List[str] = []  # 子节点ID列表
-        self.siblings: List[str] = []  # 兄弟节点ID列表
+        # 节点关系（为空时不分配列表）
+        self._children: Optional[List[str]] = None  # 子节点ID列表
+        self._siblings: Optional[List[str]] = None  # 兄弟节点ID列表
         
         # 节点状态
-        self.is_expanded: bool = True
-        self.is_visible: bool = True
-        self.priority: int = 0  # 优先级，数字越大优先级越高
+        self._is_expanded: bool = True
+        self._is_visible: bool = True
+        self._priority: int = 0  # 优先级，数字越大优先级越高
         self.is_focused: bool = False  # 是否为当前讨论的焦点节点
         
         # 样式信息
         self.color: Optional[str] = None
         self.icon: Optional[str] = None
-        self.position: Dict[str, float] = {"x": 0, "y": 0}
+        self._x: float = 0
+        self._y: float = 0
+    
+    def _notify(self, field: str, old_value: Any) -> None:
+        """
+        通知所属管理器字段已变化
+        
+        Args:
+            field: 字段名
+            old_value: 变化前的值
+        """
+        if self._owner is not None:
+            self._owner._on_node_changed(self, field, old_value)
+    
+    @property
+    def title(self) -> str:
+        """节点标题"""
+        return self._title
+    
+    @title.setter
+    def title(self, value: str) -> None:
+        old_value = self._title
+        self._title = value
+        self._notify("title", old_value)
+    
+    @property
+    def content(self) -> str:
+        """节点内容描述"""
+        return self._content
+    
+    @content.setter
+    def content(self, value: str) -> None:
+        old_value = self._content
+        self._content = value
+        self._notify("content", old_value)
+    
+    @property
+    def node_type(self) -> str:
+        """节点类型"""
+        return self._node_type
+    
+    @node_type.setter
+    def node_type(self, value: str) -> None:
+        old_value = self._node_type
+        self._node_type = value
+        self._notify("node_type", old_value)
+    
+    @property
+    def priority(self) -> int:
+        """优先级，数字越大优先级越高"""
+        return self._priority
+    
+    @priority.setter
+    def priority(self, value: int) -> None:
+        old_value = self._priority
+        self._priority = value
+        self._notify("priority", old_value)
+    
+    @property
+    def is_expanded(self) -> bool:
+        """子节点是否展开（折叠的子树在视口查询中汇总为一个节点）"""
+        return self._is_expanded
+    
+    @is_expanded.setter
+    def is_expanded(self, value: bool) -> None:
+        old_value = self._is_expanded
+        self._is_expanded = value
+        self._notify("is_expanded", old_value)
+    
+    @property
+    def is_visible(self) -> bool:
+        """节点是否可见"""
+        return self._is_visible
+    
+    @is_visible.setter
+    def is_visible(self, value: bool) -> None:
+        old_value = self._is_visible
+        self._is_visible = value
+        self._notify("is_visible", old_value)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """
+        额外的元数据
+        
+        原地修改返回的字典不会通知管理器（不会写入操作日志），请使用 update_metadata 或整体赋值
+        """
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+    
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]) -> None:
+        old_value = self._metadata
+        self._metadata = value or None
+        self._notify("metadata", old_value)
+    
+    @property
+    def children(self) -> List[str]:
+        """子节点ID列表（副本，增删子节点须通过 add_child / remove_child，以便通知管理器更新索引）"""
+        return list(self._children or ())
+    
+    @property
+    def child_ids(self) -> Sequence[str]:
+        """子节点ID（只读，叶子节点不分配列表）"""
+        return self._children or ()
+    
+    @property
+    def siblings(self) -> List[str]:
+        """兄弟节点ID列表"""
+        if self._siblings is None:
+            self._siblings = []
+        return self._siblings
+    
+    @siblings.setter
+    def siblings(self, value: List[str]) -> None:
+        self._siblings = value
+    
+    @property
+    def sibling_ids(self) -> Sequence[str]:
+        """兄弟节点ID（只读，没有兄弟节点时不分配列表）"""
+        return self._siblings or ()
+    
+    @property
+    def created_at(self) -> datetime:
+        """创建时间"""
+        return datetime.fromtimestamp(self._created_ts)
+    
+    @created_at.setter
+    def created_at(self, value: datetime) -> None:
+        self._created_ts = value.timestamp()
+    
+    @property
+    def updated_at(self) -> datetime:
+        """更新时间"""
+        return datetime.fromtimestamp(self._updated_ts)
+    
+    @updated_at.setter
+    def updated_at(self, value: datetime) -> None:
+        self._updated_ts = value.timestamp()
+    
+    def _touch(self) -> None:
+        """
+        更新修改时间
+        """
+        self._updated_ts = time.time()
+    
+    @property
+    def position(self) -> Dict[str, float]:
+        """
+        节点位置 {"x": x, "y": y}
+        
+        每次读取返回新的字典，修改返回值不会影响节点，请使用 set_position 或整体赋值
+        """
+        return {"x": self._x, "y": self._y}
+    
+    @position.setter
+    def position(self, value: Dict[str, float]) -> None:
+        self._x = value.get("x", 0)
+        self._y = value.get("y", 0)
+        self._notify("position", None)
     
     def add_child(self, child_node: 'MindMapNode') -> bool:
         """
@@ -65,11 +238,14 @@ class MindMapNode:
         Returns:
             是否添加成功
         """
-        if child_node.node_id not in self.children:
-            self.children.append(child_node.node_id)
+        if child_node.node_id not in self.child_ids:
+            if self._children is None:
+                self._children = []
+            self._children.append(child_node.node_id)
             child_node.parent_id = self.node_id
-            child_node.updated_at = datetime.now()
-            self.updated_at = datetime.now()
+            child_node._touch()
+            self._touch()
+            self._notify("children", None)
             return True
         return False
     
@@ -83,9 +259,10 @@ class MindMapNode:
         Returns:
             是否移除成功
         """
-        if child_id in self.children:
-            self.children.remove(child_id)
-            self.updated_at = datetime.now()
+        if child_id in self.child_ids:
+            self._children.remove(child_id)
+            self._touch()
+            self._notify("children", None)
             return True
         return False
     
@@ -99,12 +276,12 @@ class MindMapNode:
         Returns:
             是否添加成功
         """
-        if sibling_node.node_id not in self.siblings:
+        if sibling_node.node_id not in self.sibling_ids:
             self.siblings.append(sibling_node.node_id)
             sibling_node.siblings.append(self.node_id)
             sibling_node.parent_id = self.parent_id
-            sibling_node.updated_at = datetime.now()
-            self.updated_at = datetime.now()
+            sibling_node._touch()
+            self._touch()
             return True
         return False
     
@@ -118,7 +295,7 @@ class MindMapNode:
         Returns:
             子节点对象列表
         """
-        return [node_map[child_id] for child_id in self.children if child_id in node_map]
+        return [node_map[child_id] for child_id in self.child_ids if child_id in node_map]
     
     def get_siblings(self, node_map: Dict[str, 'MindMapNode']) -> List['MindMapNode']:
         """
@@ -130,7 +307,7 @@ class MindMapNode:
         Returns:
             兄弟节点对象列表
         """
-        return [node_map[sibling_id] for sibling_id in self.siblings if sibling_id in node_map]
+        return [node_map[sibling_id] for sibling_id in self.sibling_ids if sibling_id in node_map]
     
     def get_parent(self, node_map: Dict[str, 'MindMapNode']) -> Optional['MindMapNode']:
         """
@@ -173,12 +350,17 @@ class MindMapNode:
         Returns:
             后代节点列表
         """
+        # 迭代先序遍历，避免深层节点触发递归深度限制
         descendants = []
-        for child_id in self.children:
-            if child_id in node_map:
+        stack = [iter(self.child_ids)]
+        while stack:
+            child_id = next(stack[-1], None)
+            if child_id is None:
+                stack.pop()
+            elif child_id in node_map:
                 child = node_map[child_id]
                 descendants.append(child)
-                descendants.extend(child.get_descendants(node_map))
+                stack.append(iter(child.child_ids))
         return descendants
     
     def get_depth(self, node_map: Dict[str, 'MindMapNode']) -> int:
@@ -226,7 +408,7 @@ class MindMapNode:
         Returns:
             是否为叶子节点
         """
-        return len(self.children) == 0
+        return not self._children
     
     def update_content(self, new_content: str) -> None:
         """
@@ -236,7 +418,7 @@ class MindMapNode:
             new_content: 新的内容
         """
         self.content = new_content
-        self.updated_at = datetime.now()
+        self._touch()
     
     def update_title(self, new_title: str) -> None:
         """
@@ -246,7 +428,7 @@ class MindMapNode:
             new_title: 新的标题
         """
         self.title = new_title
-        self.updated_at = datetime.now()
+        self._touch()
     
     def set_position(self, x: float, y: float) -> None:
         """
@@ -256,8 +438,10 @@ class MindMapNode:
             x: X坐标
             y: Y坐标
         """
-        self.position = {"x": x, "y": y}
-        self.updated_at = datetime.now()
+        self._x = x
+        self._y = y
+        self._touch()
+        self._notify("position", None)
     
     def set_style(self, color: Optional[str] = None, icon: Optional[str] = None) -> None:
         """
@@ -271,7 +455,30 @@ class MindMapNode:
             self.color = color
         if icon is not None:
             self.icon = icon
-        self.updated_at = datetime.now()
+        self._touch()
+        self._notify("style", None)
+    
+    def update_metadata(self, values: Dict[str, Any]) -> None:
+        """
+        更新元数据
+        
+        Args:
+            values: 要合并到元数据中的键值
+        """
+        metadata = dict(self._metadata or {})
+        metadata.update(values)
+        self.metadata = metadata
+        self._touch()
+    
+    def set_expanded(self, expanded: bool = True) -> None:
+        """
+        展开或折叠子节点
+        
+        Args:
+            expanded: 是否展开
+        """
+        self.is_expanded = expanded
+        self._touch()
     
     def set_focus(self, focused: bool = True) -> None:
         """
@@ -281,7 +488,7 @@ class MindMapNode:
             focused: 是否为焦点节点
         """
         self.is_focused = focused
-        self.updated_at = datetime.now()
+        self._touch()
     
     def is_focus_node(self) -> bool:
         """
@@ -305,18 +512,18 @@ class MindMapNode:
             "content": self.content,
             "node_type": self.node_type,
             "parent_id": self.parent_id,
-            "metadata": self.metadata,
+            "metadata": self._metadata if self._metadata is not None else {},
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
-            "children": self.children,
-            "siblings": self.siblings,
+            "children": self._children if self._children is not None else [],
+            "siblings": self._siblings if self._siblings is not None else [],
             "is_expanded": self.is_expanded,
             "is_visible": self.is_visible,
             "priority": self.priority,
             "is_focused": self.is_focused,
             "color": self.color,
             "icon": self.icon,
-            "position": self.position
+            "position": {"x": self._x, "y": self._y}
         }
     
     @classmethod
@@ -346,8 +553,8 @@ class MindMapNode:
             node.updated_at = datetime.fromisoformat(data["updated_at"])
         
         # 恢复关系
-        node.children = data.get("children", [])
-        node.siblings = data.get("siblings", [])
+        node._children = data.get("children") or None
+        node._siblings = data.get("siblings") or None
         
         # 恢复状态
         node.is_expanded = data.get("is_expanded", True)
@@ -358,14 +565,65 @@ class MindMapNode:
         # 恢复样式
         node.color = data.get("color")
         node.icon = data.get("icon")
-        node.position = data.get("position", {"x": 0, "y": 0})
+        if "position" in data:
+            node.position = data["position"]
         
         return node
     
+    @classmethod
+    def _restore(
+        cls,
+        node_id: str,
+        title: str,
+        content: str,
+        node_type: str,
+        parent_id: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        created_ts: float,
+        updated_ts: float,
+        children: Optional[List[str]],
+        siblings: Optional[List[str]],
+        is_expanded: bool,
+        is_visible: bool,
+        priority: int,
+        is_focused: bool,
+        color: Optional[str],
+        icon: Optional[str],
+        x: float,
+        y: float
+    ) -> 'MindMapNode':
+        """
+        批量加载时直接填充字段创建节点，跳过 __init__ 和字段变化通知
+        
+        Returns:
+            节点对象
+        """
+        node = cls.__new__(cls)
+        node._owner = None
+        node.node_id = node_id
+        node._title = title
+        node._content = content
+        node._node_type = node_type
+        node.parent_id = parent_id
+        node._metadata = metadata
+        node._created_ts = created_ts
+        node._updated_ts = updated_ts
+        node._children = children
+        node._siblings = siblings
+        node._is_expanded = is_expanded
+        node._is_visible = is_visible
+        node._priority = priority
+        node.is_focused = is_focused
+        node.color = color
+        node.icon = icon
+        node._x = x
+        node._y = y
+        return node
+    
     def __str__(self) -> str:
         """字符串表示"""
         return f"MindMapNode(id={self.node_id}, title='{self.title}', type={self.node_type})"
     
     def __repr__(self) -> str:
         """详细字符串表示"""
-        return f"MindMapNode(node_id='{self.node_id}', title='{self.title}', content='{self.content[:50]}...', parent_id='{self.parent_id}', children_count={len(self.children)})" 
\ No newline at end of file
+        return f"MindMapNode(node_id='{self.node_id}', title='{self.title}', content='{self.content[:50]}...', parent_id='{self.parent_id}', children_count={len(self.child_ids)})" 
\ No newline at end of file
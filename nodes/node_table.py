@@ -0,0 +1,133 @@
+from typing import Dict, Iterable, List, Optional
+from .mindmap_node import MindMapNode
+
+
+class NodeTable:
+    """
+    节点句柄表
+    将字符串节点ID映射为稠密整数句柄，索引内部以句柄为下标使用数组存储，
+    只在管理器API和序列化边界转换回字符串ID。被移除节点的句柄会被复用
+    """
+
+    def __init__(self):
+        """
+        初始化句柄表
+        """
+        self.handles: Dict[str, int] = {}
+        # 以句柄为下标的数组，空位为None
+        self.ids: List[Optional[str]] = []
+        self.nodes: List[Optional[MindMapNode]] = []
+        # 节点加入顺序，索引查询结果按此排序以与遍历 MindMapManager.nodes 的顺序一致
+        self.order: List[int] = []
+        self._free: List[int] = []
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.handles
+
+    @property
+    def capacity(self) -> int:
+        """句柄数组的长度（句柄上界）"""
+        return len(self.ids)
+
+    def add(self, node: MindMapNode) -> int:
+        """
+        为节点分配句柄
+
+        Args:
+            node: 节点对象
+
+        Returns:
+            节点句柄
+        """
+        handle = self.handles.get(node.node_id)
+        if handle is not None:
+            return handle
+        if self._free:
+            handle = self._free.pop()
+            self.ids[handle] = node.node_id
+            self.nodes[handle] = node
+            self.order[handle] = self._next_order
+        else:
+            handle = len(self.ids)
+            self.ids.append(node.node_id)
+            self.nodes.append(node)
+            self.order.append(self._next_order)
+        self._next_order += 1
+        self.handles[node.node_id] = handle
+        return handle
+
+    def extend(self, nodes: Iterable[MindMapNode]) -> None:
+        """
+        批量为节点顺序分配句柄（用于空表的全量构建）
+
+        Args:
+            nodes: 节点对象
+        """
+        if self._free:
+            for node in nodes:
+                self.add(node)
+            return
+        start = len(self.ids)
+        self.nodes.extend(nodes)
+        self.ids.extend(node.node_id for node in self.nodes[start:])
+        count = len(self.nodes) - start
+        self.order.extend(range(self._next_order, self._next_order + count))
+        self._next_order += count
+        self.handles.update(zip(self.ids[start:], range(start, start + count)))
+
+    def remove(self, node_id: str) -> Optional[int]:
+        """
+        释放节点句柄
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            被释放的句柄，节点不存在时返回None
+        """
+        handle = self.handles.pop(node_id, None)
+        if handle is not None:
+            self.ids[handle] = None
+            self.nodes[handle] = None
+            self._free.append(handle)
+        return handle
+
+    def get(self, node_id: Optional[str]) -> Optional[int]:
+        """
+        获取节点句柄
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            节点句柄，不存在时返回None
+        """
+        return self.handles.get(node_id)
+
+    def canonical(self, node_id: Optional[str]) -> Optional[str]:
+        """
+        返回表中保存的同值ID字符串对象，使 children / parent_id 等处共享同一个字符串
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            共享的ID字符串，不在表中时原样返回
+        """
+        handle = self.handles.get(node_id)
+        return node_id if handle is None else self.ids[handle]
+
+    def clear(self) -> None:
+        """
+        清空句柄表
+        """
+        self.handles.clear()
+        self.ids.clear()
+        self.nodes.clear()
+        self.order.clear()
+        self._free.clear()
+        self._next_order = 0
@@ -0,0 +1,575 @@
+"""
+思维导图二进制快照格式
+
+文件布局（小端序）:
+    头部        HEADER，记录各段的偏移和数量
+    字符串索引  string_count + 1 个 u64 偏移（相对字符串数据段），第i个字符串为 [off[i], off[i+1])
+    字符串数据  UTF-8 编码的字符串池，字符串之间以 NUL 分隔，相同字符串只存一次
+    节点表      node_count 条定长 NODE_RECORD 记录，顺序与 MindMapManager.nodes 一致
+    引用数组    i32 字符串编号数组，存放各节点的 children / siblings 以及根节点列表
+    管理器信息  JSON，记录 mindmap_id、时间戳、元数据和焦点节点
+    ID索引      开放寻址哈希表，u32 槽位存放 节点记录序号 + 1（0为空槽），按节点ID的CRC32定位，
+                供 SnapshotReader 在不解码整个文件的情况下按ID查找节点
+
+节点记录中的字符串字段均为字符串池编号，-1 表示 None
+"""
+
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Type, TYPE_CHECKING
+
+from .mindmap_node import MindMapNode
+
+if TYPE_CHECKING:
+    from .mindmap_manager import MindMapManager
+
+
+MAGIC = b"MMSN"
+VERSION = 1
+# 快照文件的默认扩展名，save_to_file / load_from_file 据此选择格式
+SNAPSHOT_EXTENSION = ".mmb"
+
+# 头部标志位：字符串均不含 NUL，可一次解码后按 NUL 切分
+FLAG_NUL_SEPARATED = 0x1
+
+HEADER = struct.Struct(
+    "<4sHH"     # magic, version, flags
+    "IIIII"     # node_count, string_count, ref_count, root_start, root_count
+    "4x"        # 对齐
+    "QQQ"       # string_index_offset, string_data_offset, string_data_length
+    "QQ"        # node_table_offset, refs_offset
+    "QQ"        # meta_offset, meta_length
+    "QQ"        # id_index_offset, id_index_slots（可选的ID哈希索引段，0表示不存在）
+)
+
+NODE_RECORD = struct.Struct(
+    "<8i"       # node_id, title, content, node_type, parent_id, color, icon, metadata 的字符串编号
+    "ddq"       # created_ts, updated_ts, priority
+    "B"         # 状态标志
+    "dd"        # x, y
+    "IIII"      # children_start, children_count, siblings_start, siblings_count
+)
+
+# 节点状态标志位
+NODE_EXPANDED = 0x1
+NODE_VISIBLE = 0x2
+NODE_FOCUSED = 0x4
+# 坐标原本为整数（保证与JSON格式往返一致）
+NODE_X_INT = 0x8
+NODE_Y_INT = 0x10
+
+
+def is_snapshot_file(filepath: str) -> bool:
+    """
+    根据文件头判断是否为二进制快照
+
+    Args:
+        filepath: 文件路径
+
+    Returns:
+        是否为二进制快照
+    """
+    try:
+        with open(filepath, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _int_array(typecode: str, data: bytes) -> array:
+    """
+    从小端字节构造数组
+
+    Args:
+        typecode: 数组类型码
+        data: 字节数据
+
+    Returns:
+        数组
+    """
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _int_array_bytes(values: array) -> bytes:
+    """
+    将数组转换为小端字节
+
+    Args:
+        values: 数组
+
+    Returns:
+        字节数据
+    """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _StringPool:
+    """
+    快照写入时的字符串池，相同字符串只存一次
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        """
+        加入字符串
+
+        Args:
+            value: 字符串，None 返回 -1
+
+        Returns:
+            字符串编号
+        """
+        if value is None:
+            return -1
+        number = self.index.get(value)
+        if number is None:
+            number = len(self.strings)
+            self.index[value] = number
+            self.strings.append(value)
+        return number
+
+
+def dump_snapshot(manager: 'MindMapManager', f: BinaryIO, extra_meta: Optional[Dict[str, Any]] = None) -> None:
+    """
+    将思维导图写为二进制快照
+
+    Args:
+        manager: 思维导图管理器
+        f: 以二进制方式打开的可写文件
+        extra_meta: 附加写入管理器信息段的字段（如操作日志的 journal_seq）
+    """
+    pool = _StringPool()
+    add_string = pool.add
+    refs = array("i")
+    records = bytearray()
+    pack = NODE_RECORD.pack
+
+    for node in manager.nodes.values():
+        children_start = len(refs)
+        refs.extend(add_string(child_id) for child_id in node.child_ids)
+        siblings_start = len(refs)
+        refs.extend(add_string(sibling_id) for sibling_id in node.sibling_ids)
+
+        x, y = node._x, node._y
+        flags = (
+            (NODE_EXPANDED if node.is_expanded else 0)
+            | (NODE_VISIBLE if node.is_visible else 0)
+            | (NODE_FOCUSED if node.is_focused else 0)
+            | (NODE_X_INT if isinstance(x, int) else 0)
+            | (NODE_Y_INT if isinstance(y, int) else 0)
+        )
+        metadata = node._metadata
+        records += pack(
+            add_string(node.node_id),
+            add_string(node.title),
+            add_string(node.content),
+            add_string(node.node_type),
+            add_string(node.parent_id),
+            add_string(node.color),
+            add_string(node.icon),
+            add_string(json.dumps(metadata, ensure_ascii=False)) if metadata else -1,
+            node._created_ts,
+            node._updated_ts,
+            node.priority,
+            flags,
+            x,
+            y,
+            children_start,
+            siblings_start - children_start,
+            siblings_start,
+            len(refs) - siblings_start,
+        )
+
+    root_start = len(refs)
+    refs.extend(add_string(root_id) for root_id in manager.root_nodes)
+
+    # 字符串池
+    strings = pool.strings
+    node_id_numbers = [pool.index[node_id] for node_id in manager.nodes]
+    flags = 0 if any("\x00" in value for value in strings) else FLAG_NUL_SEPARATED
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = array("Q", [0])
+    position = 0
+    for value in encoded:
+        position += len(value) + 1
+        offsets.append(position)
+    string_data = b"\x00".join(encoded) + (b"\x00" if encoded else b"")
+
+    # ID哈希索引
+    slots = 1 << max(3, (2 * len(node_id_numbers) - 1).bit_length())
+    mask = slots - 1
+    id_index = array("I", bytes(4 * slots))
+    for record_number, string_number in enumerate(node_id_numbers):
+        slot = zlib.crc32(encoded[string_number]) & mask
+        while id_index[slot]:
+            slot = (slot + 1) & mask
+        id_index[slot] = record_number + 1
+
+    meta = json.dumps({
+        "mindmap_id": manager.mindmap_id,
+        "created_at": manager.created_at.isoformat(),
+        "updated_at": manager.updated_at.isoformat(),
+        "metadata": manager.metadata,
+        "focused_node_id": manager.focused_node_id,
+        **(extra_meta or {}),
+    }, ensure_ascii=False).encode("utf-8")
+
+    string_index_offset = HEADER.size
+    string_data_offset = string_index_offset + len(offsets) * 8
+    node_table_offset = string_data_offset + len(string_data)
+    refs_offset = node_table_offset + len(records)
+    meta_offset = refs_offset + len(refs) * 4
+    id_index_offset = meta_offset + len(meta)
+
+    f.write(HEADER.pack(
+        MAGIC, VERSION, flags,
+        len(manager.nodes), len(strings), len(refs), root_start, len(manager.root_nodes),
+        string_index_offset, string_data_offset, len(string_data),
+        node_table_offset, refs_offset,
+        meta_offset, len(meta),
+        id_index_offset, slots,
+    ))
+    f.write(_int_array_bytes(offsets))
+    f.write(string_data)
+    f.write(records)
+    f.write(_int_array_bytes(refs))
+    f.write(meta)
+    f.write(_int_array_bytes(id_index))
+
+
+def read_header(data: bytes) -> Tuple:
+    """
+    解析并校验快照头部
+
+    Args:
+        data: 快照数据（至少包含头部）
+
+    Returns:
+        头部字段元组
+    """
+    header = HEADER.unpack_from(data, 0)
+    if header[0] != MAGIC:
+        raise ValueError("不是思维导图快照文件")
+    if header[1] != VERSION:
+        raise ValueError(f"不支持的快照版本: {header[1]}")
+    return header
+
+
+def decode_strings(data: bytes, header: Tuple) -> List[str]:
+    """
+    一次性解码整个字符串池
+
+    Args:
+        data: 快照数据
+        header: 头部字段元组
+
+    Returns:
+        字符串列表（下标为字符串编号）
+    """
+    (_, _, flags, _, string_count, _, _, _,
+     string_index_offset, string_data_offset, string_data_length, *_) = header
+    if string_count == 0:
+        return []
+    raw = data[string_data_offset:string_data_offset + string_data_length]
+    if flags & FLAG_NUL_SEPARATED:
+        # 末尾的 NUL 会产生一个空串，去掉
+        return raw.decode("utf-8").split("\x00")[:string_count]
+    offsets = _int_array("Q", data[string_index_offset:string_index_offset + (string_count + 1) * 8])
+    return [raw[offsets[i]:offsets[i + 1] - 1].decode("utf-8") for i in range(string_count)]
+
+
+def decode_meta(data: bytes, header: Tuple) -> Dict[str, Any]:
+    """
+    解码管理器信息
+
+    Args:
+        data: 快照数据
+        header: 头部字段元组
+
+    Returns:
+        管理器信息字典
+    """
+    meta_offset, meta_length = header[13], header[14]
+    return json.loads(bytes(data[meta_offset:meta_offset + meta_length]).decode("utf-8"))
+
+
+def restore_node(record: Tuple, strings: List[str], refs: array) -> MindMapNode:
+    """
+    由节点记录恢复节点对象（跳过 __init__）
+
+    Args:
+        record: NODE_RECORD 解包后的元组
+        strings: 字符串列表（也可以是支持按编号取值的对象）
+        refs: 引用数组
+
+    Returns:
+        节点对象
+    """
+    (node_id, title, content, node_type, parent_id, color, icon, metadata,
+     created_ts, updated_ts, priority, flags, x, y,
+     children_start, children_count, siblings_start, siblings_count) = record
+    return MindMapNode._restore(
+        strings[node_id],
+        strings[title] if title >= 0 else None,
+        strings[content] if content >= 0 else None,
+        strings[node_type] if node_type >= 0 else None,
+        strings[parent_id] if parent_id >= 0 else None,
+        json.loads(strings[metadata]) if metadata >= 0 else None,
+        created_ts,
+        updated_ts,
+        [strings[i] for i in refs[children_start:children_start + children_count]] if children_count else None,
+        [strings[i] for i in refs[siblings_start:siblings_start + siblings_count]] if siblings_count else None,
+        bool(flags & NODE_EXPANDED),
+        bool(flags & NODE_VISIBLE),
+        priority,
+        bool(flags & NODE_FOCUSED),
+        strings[color] if color >= 0 else None,
+        strings[icon] if icon >= 0 else None,
+        int(x) if flags & NODE_X_INT else x,
+        int(y) if flags & NODE_Y_INT else y,
+    )
+
+
+def load_snapshot(manager_cls: Type['MindMapManager'], data: bytes) -> 'MindMapManager':
+    """
+    从二进制快照批量构建思维导图管理器
+
+    Args:
+        manager_cls: 管理器类
+        data: 快照数据
+
+    Returns:
+        思维导图管理器对象
+    """
+    header = read_header(data)
+    node_count, ref_count, root_start, root_count = header[3], header[5], header[6], header[7]
+    node_table_offset, refs_offset = header[11], header[12]
+
+    strings = decode_strings(data, header)
+    refs = _int_array("i", data[refs_offset:refs_offset + ref_count * 4])
+    meta = decode_meta(data, header)
+
+    manager = manager_cls(mindmap_id=meta["mindmap_id"])
+    manager.created_at = datetime.fromisoformat(meta["created_at"])
+    manager.updated_at = datetime.fromisoformat(meta["updated_at"])
+    manager.metadata = meta.get("metadata", {})
+    manager.focused_node_id = meta.get("focused_node_id")
+    manager.root_nodes = [strings[i] for i in refs[root_start:root_start + root_count]]
+
+    table = data[node_table_offset:node_table_offset + node_count * NODE_RECORD.size]
+    nodes = manager.nodes
+    for record in NODE_RECORD.iter_unpack(table):
+        node = restore_node(record, strings, refs)
+        nodes[node.node_id] = node
+
+    # 字符串池中相同的ID已是同一个对象，无需再共享
+    manager.rebuild_indexes(share_ids=False)
+    return manager
+
+
+def iter_snapshot_export(data: bytes) -> Iterator[str]:
+    """
+    由快照数据逐行生成与 MindMapManager.iter_export 相同的NDJSON，不构建管理器和索引
+    （先在内存中生成快照，再在不持有导图的情况下流式导出）
+
+    Args:
+        data: 快照数据
+
+    Returns:
+        以换行符结尾的JSON行迭代器
+    """
+    header = read_header(data)
+    node_count, ref_count, root_start, root_count = header[3], header[5], header[6], header[7]
+    node_table_offset, refs_offset = header[11], header[12]
+
+    strings = decode_strings(data, header)
+    refs = _int_array("i", data[refs_offset:refs_offset + ref_count * 4])
+    meta = decode_meta(data, header)
+    yield json.dumps({
+        "type": "mindmap",
+        "mindmap_id": meta["mindmap_id"],
+        "created_at": meta["created_at"],
+        "updated_at": meta["updated_at"],
+        "metadata": meta.get("metadata", {}),
+        "root_nodes": [strings[i] for i in refs[root_start:root_start + root_count]],
+        "focused_node_id": meta.get("focused_node_id")
+    }, ensure_ascii=False) + "\n"
+
+    table = data[node_table_offset:node_table_offset + node_count * NODE_RECORD.size]
+    for record in NODE_RECORD.iter_unpack(table):
+        node = restore_node(record, strings, refs)
+        yield json.dumps({"type": "node", **node.to_dict()}, ensure_ascii=False) + "\n"
+
+
+class _MappedStrings:
+    """
+    按编号从映射的字符串池中解码字符串
+    """
+
+    _OFFSET = struct.Struct("<Q")
+
+    def __init__(self, buffer, index_offset: int, data_offset: int):
+        self._buffer = buffer
+        self._index_offset = index_offset
+        self._data_offset = data_offset
+
+    def raw(self, number: int) -> bytes:
+        """
+        获取字符串的UTF-8字节
+
+        Args:
+            number: 字符串编号
+
+        Returns:
+            字节数据
+        """
+        start = self._OFFSET.unpack_from(self._buffer, self._index_offset + number * 8)[0]
+        end = self._OFFSET.unpack_from(self._buffer, self._index_offset + number * 8 + 8)[0] - 1
+        return self._buffer[self._data_offset + start:self._data_offset + end]
+
+    def __getitem__(self, number: int) -> str:
+        return self.raw(number).decode("utf-8")
+
+
+class _MappedInts:
+    """
+    映射的 i32 引用数组，支持按切片读取
+    """
+
+    def __init__(self, buffer, offset: int, length: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+
+    def __getitem__(self, key: slice) -> Tuple[int, ...]:
+        start, stop, _ = key.indices(self._length)
+        if stop <= start:
+            return ()
+        return struct.unpack_from(f"<{stop - start}i", self._buffer, self._offset + start * 4)
+
+
+class SnapshotReader:
+    """
+    快照随机访问读取器
+    以只读方式内存映射快照文件，打开时只解析头部，字符串和节点记录按需解码
+    """
+
+    def __init__(self, filepath: str):
+        """
+        打开快照文件
+
+        Args:
+            filepath: 快照文件路径
+        """
+        self._file = open(filepath, "rb")
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header = read_header(self._buffer)
+        except Exception:
+            self._file.close()
+            raise
+
+        header = self.header
+        self.node_count = header[3]
+        self._root_start, self._root_count = header[6], header[7]
+        self._node_table_offset = header[11]
+        self._id_index_offset, self._id_index_slots = header[15], header[16]
+        self.strings = _MappedStrings(self._buffer, header[8], header[9])
+        self.refs = _MappedInts(self._buffer, header[12], header[5])
+        self.meta = decode_meta(self._buffer, header)
+        # 没有ID索引段时，首次查找前构建的 ID -> 记录序号 映射
+        self._id_lookup: Optional[Dict[str, int]] = None
+
+    def close(self) -> None:
+        """
+        关闭映射和文件
+        """
+        self._buffer.close()
+        self._file.close()
+
+    def record(self, number: int) -> Tuple:
+        """
+        读取节点记录
+
+        Args:
+            number: 记录序号
+
+        Returns:
+            NODE_RECORD 解包后的元组
+        """
+        return NODE_RECORD.unpack_from(self._buffer, self._node_table_offset + number * NODE_RECORD.size)
+
+    def iter_records(self):
+        """
+        顺序遍历所有节点记录
+
+        Returns:
+            记录元组的迭代器
+        """
+        end = self._node_table_offset + self.node_count * NODE_RECORD.size
+        return NODE_RECORD.iter_unpack(memoryview(self._buffer)[self._node_table_offset:end])
+
+    def node(self, number: int) -> MindMapNode:
+        """
+        由记录序号恢复节点对象
+
+        Args:
+            number: 记录序号
+
+        Returns:
+            节点对象
+        """
+        return restore_node(self.record(number), self.strings, self.refs)
+
+    def root_ids(self) -> List[str]:
+        """
+        获取根节点ID列表
+
+        Returns:
+            根节点ID列表
+        """
+        return [self.strings[i] for i in self.refs[self._root_start:self._root_start + self._root_count]]
+
+    def find(self, node_id: str) -> Optional[int]:
+        """
+        按节点ID查找记录序号
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            记录序号，不存在时返回None
+        """
+        if not self._id_index_slots:
+            if self._id_lookup is None:
+                self._id_lookup = {self.strings[record[0]]: number for number, record in enumerate(self.iter_records())}
+            return self._id_lookup.get(node_id)
+
+        key = node_id.encode("utf-8")
+        mask = self._id_index_slots - 1
+        slot = zlib.crc32(key) & mask
+        id_field = struct.Struct("<i")
+        while True:
+            entry = struct.unpack_from("<I", self._buffer, self._id_index_offset + slot * 4)[0]
+            if entry == 0:
+                return None
+            number = entry - 1
+            string_number = id_field.unpack_from(self._buffer, self._node_table_offset + number * NODE_RECORD.size)[0]
+            if self.strings.raw(string_number) == key:
+                return number
+            slot = (slot + 1) & mask
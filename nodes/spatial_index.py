@@ -0,0 +1,392 @@
+from typing import Dict, List, Optional, Set, Tuple
+import math
+from .node_table import NodeTable
+
+
+# 网格边长（画布坐标），与放射状布局的环间距同一量级
+DEFAULT_CELL_SIZE = 256.0
+# 网格遍历中两个方向到达下一条网格线的参数 t 相差不超过该值时视为经过角点
+WALK_EPSILON = 1e-9
+
+
+class SpatialIndex:
+    """
+    节点位置空间索引
+    将画布划分为均匀网格，维护 网格 -> 节点句柄集合，矩形查询只访问与矩形相交的网格，
+    由管理器在增删节点和节点位置变化时增量更新
+    """
+
+    def __init__(self, table: NodeTable, cell_size: float = DEFAULT_CELL_SIZE):
+        """
+        初始化空间索引
+
+        Args:
+            table: 管理器的节点句柄表（共享引用）
+            cell_size: 网格边长
+        """
+        self.table = table
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+        # 以句柄为下标的节点所在网格，未索引为None
+        self.cell_of: List[Optional[Tuple[int, int]]] = []
+        for handle, node in enumerate(table.nodes):
+            if node is not None:
+                self.add(handle)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        """
+        计算坐标所在网格
+
+        Args:
+            x: X坐标
+            y: Y坐标
+
+        Returns:
+            网格坐标
+        """
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def add(self, handle: int) -> None:
+        """
+        索引节点
+
+        Args:
+            handle: 节点句柄
+        """
+        missing = self.table.capacity - len(self.cell_of)
+        if missing > 0:
+            self.cell_of.extend([None] * missing)
+        node = self.table.nodes[handle]
+        cell = self._cell(node._x, node._y)
+        handles = self.cells.get(cell)
+        if handles is None:
+            self.cells[cell] = {handle}
+        else:
+            handles.add(handle)
+        self.cell_of[handle] = cell
+
+    def remove(self, handle: int) -> None:
+        """
+        移除节点索引
+
+        Args:
+            handle: 节点句柄
+        """
+        cell = self.cell_of[handle]
+        if cell is None:
+            return
+        handles = self.cells[cell]
+        handles.discard(handle)
+        if not handles:
+            del self.cells[cell]
+        self.cell_of[handle] = None
+
+    def move(self, handle: int) -> None:
+        """
+        节点位置变化后更新索引
+
+        Args:
+            handle: 节点句柄
+        """
+        if handle >= len(self.cell_of) or self.cell_of[handle] is None:
+            self.add(handle)
+            return
+        node = self.table.nodes[handle]
+        cell = self._cell(node._x, node._y)
+        old_cell = self.cell_of[handle]
+        if cell != old_cell:
+            handles = self.cells[old_cell]
+            handles.discard(handle)
+            if not handles:
+                del self.cells[old_cell]
+            self.cells.setdefault(cell, set()).add(handle)
+            self.cell_of[handle] = cell
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[int]:
+        """
+        查询位置落在矩形内（含边界）的节点
+
+        Args:
+            min_x, min_y: 矩形左上角
+            max_x, max_y: 矩形右下角
+
+        Returns:
+            节点句柄列表（无序）
+        """
+        low_x, low_y = self._cell(min_x, min_y)
+        high_x, high_y = self._cell(max_x, max_y)
+        if high_x < low_x or high_y < low_y:
+            return []
+
+        # 矩形覆盖的网格多于非空网格时（缩得很小看全图），改为遍历非空网格
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(self.cells):
+            candidates = [
+                handles for (cell_x, cell_y), handles in self.cells.items()
+                if low_x <= cell_x <= high_x and low_y <= cell_y <= high_y
+            ]
+        else:
+            candidates = []
+            for cell_x in range(low_x, high_x + 1):
+                for cell_y in range(low_y, high_y + 1):
+                    handles = self.cells.get((cell_x, cell_y))
+                    if handles:
+                        candidates.append(handles)
+
+        nodes = self.table.nodes
+        result = []
+        for handles in candidates:
+            for handle in handles:
+                node = nodes[handle]
+                if min_x <= node._x <= max_x and min_y <= node._y <= max_y:
+                    result.append(handle)
+        return result
+
+
+def segments_intersect(
+    x1: float, y1: float, x2: float, y2: float,
+    x3: float, y3: float, x4: float, y4: float
+) -> bool:
+    """
+    判断线段 (x1,y1)-(x2,y2) 与 (x3,y3)-(x4,y4) 是否相交（与前端 linesIntersect 相同，平行视为不相交）
+
+    Returns:
+        是否相交
+    """
+    denom = (y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1)
+    if denom == 0:
+        return False
+    ua = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / denom
+    ub = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / denom
+    return 0 <= ua <= 1 and 0 <= ub <= 1
+
+
+def segment_intersects_rect(
+    x1: float, y1: float, x2: float, y2: float,
+    min_x: float, min_y: float, max_x: float, max_y: float
+) -> bool:
+    """
+    判断线段是否与矩形（含边界）相交（Liang–Barsky 裁剪）
+
+    Returns:
+        是否相交
+    """
+    low, high = 0.0, 1.0
+    for delta, start, lower, upper in ((x2 - x1, x1, min_x, max_x), (y2 - y1, y1, min_y, max_y)):
+        if delta == 0:
+            if start < lower or start > upper:
+                return False
+            continue
+        t1 = (lower - start) / delta
+        t2 = (upper - start) / delta
+        if t1 > t2:
+            t1, t2 = t2, t1
+        low, high = max(low, t1), min(high, t2)
+        if low > high:
+            return False
+    return True
+
+
+class EdgeIndex:
+    """
+    连线（父节点 -> 子节点）空间索引
+    每条连线以子节点句柄标识，只登记到线段实际经过的网格中（与切割查询相同的网格遍历），
+    长的斜向连线不会占满整个包围盒；
+    折线切割查询沿折线逐段遍历经过的网格，只对这些网格中的连线做精确相交判断，
+    耗时与折线经过的网格数和命中数成正比，而不是与连线总数成正比。
+    由管理器在节点增删、移动和位置变化时增量更新
+    """
+
+    def __init__(self, table: NodeTable, cell_size: float = DEFAULT_CELL_SIZE):
+        """
+        初始化连线索引
+
+        Args:
+            table: 管理器的节点句柄表（共享引用）
+            cell_size: 网格边长
+        """
+        self.table = table
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+        # 以子节点句柄为下标的连线经过的网格，无连线为None
+        self.edge_cells: List[Optional[Set[Tuple[int, int]]]] = []
+        for handle, node in enumerate(table.nodes):
+            if node is not None:
+                self.update(handle)
+
+    def _endpoints(self, handle: int) -> Optional[Tuple[float, float, float, float]]:
+        """
+        获取连线两端坐标
+
+        Args:
+            handle: 子节点句柄
+
+        Returns:
+            (父x, 父y, 子x, 子y)，节点没有父节点（或父节点不在导图中）时返回None
+        """
+        node = self.table.nodes[handle]
+        parent_handle = self.table.get(node.parent_id)
+        if parent_handle is None:
+            return None
+        parent = self.table.nodes[parent_handle]
+        return parent._x, parent._y, node._x, node._y
+
+    def update(self, handle: int) -> None:
+        """
+        重新登记子节点到父节点的连线（节点增加、移动或两端位置变化后调用）
+
+        Args:
+            handle: 子节点句柄
+        """
+        self.remove(handle)
+        endpoints = self._endpoints(handle)
+        if endpoints is None:
+            return
+        cells = set(self._walk(*endpoints))
+        for cell in cells:
+            handles = self.cells.get(cell)
+            if handles is None:
+                self.cells[cell] = {handle}
+            else:
+                handles.add(handle)
+        self.edge_cells[handle] = cells
+
+    def remove(self, handle: int) -> None:
+        """
+        移除子节点到父节点的连线
+
+        Args:
+            handle: 子节点句柄
+        """
+        missing = self.table.capacity - len(self.edge_cells)
+        if missing > 0:
+            self.edge_cells.extend([None] * missing)
+        cells = self.edge_cells[handle]
+        if cells is None:
+            return
+        for cell in cells:
+            handles = self.cells.get(cell)
+            if handles is not None:
+                handles.discard(handle)
+                if not handles:
+                    del self.cells[cell]
+        self.edge_cells[handle] = None
+
+    def _walk(self, x1: float, y1: float, x2: float, y2: float) -> List[Tuple[int, int]]:
+        """
+        按顺序列出线段经过的网格（网格遍历 DDA）
+
+        线段经过（或在浮点误差范围内接近）网格角点时，角点两侧的网格也一并列出，
+        保证经过同一点的两条线段总能在某个共同的网格中相遇
+
+        Args:
+            x1, y1: 起点
+            x2, y2: 终点
+
+        Returns:
+            网格坐标列表
+        """
+        size = self.cell_size
+        cell_x, cell_y = math.floor(x1 / size), math.floor(y1 / size)
+        end_x, end_y = math.floor(x2 / size), math.floor(y2 / size)
+        dx, dy = x2 - x1, y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        next_x = ((cell_x + (dx > 0)) * size - x1) / dx if dx else math.inf
+        next_y = ((cell_y + (dy > 0)) * size - y1) / dy if dy else math.inf
+        delta_x = size / abs(dx) if dx else math.inf
+        delta_y = size / abs(dy) if dy else math.inf
+
+        cells = [(cell_x, cell_y)]
+        # 正常情况下走 |Δx| + |Δy| 步即到达终点网格；浮点误差使路径偏离时以此为上限，避免死循环
+        steps = 0
+        limit = 2 * (abs(end_x - cell_x) + abs(end_y - cell_y)) + 2
+        while (cell_x != end_x or cell_y != end_y) and steps < limit:
+            steps += 1
+            if abs(next_x - next_y) <= WALK_EPSILON:
+                # 经过网格角点，两个方向同时前进；终点恰好落在角点上时终点网格可能是某一侧的网格
+                sides = [(cell_x + step_x, cell_y), (cell_x, cell_y + step_y)]
+                if (end_x, end_y) in sides:
+                    sides.remove((end_x, end_y))
+                    cells.extend(sides)
+                    cell_x, cell_y = end_x, end_y
+                    cells.append((cell_x, cell_y))
+                    break
+                cells.extend(sides)
+                cell_x += step_x
+                cell_y += step_y
+                next_x += delta_x
+                next_y += delta_y
+            elif next_x < next_y:
+                cell_x += step_x
+                next_x += delta_x
+            else:
+                cell_y += step_y
+                next_y += delta_y
+            cells.append((cell_x, cell_y))
+        if cell_x != end_x or cell_y != end_y:
+            cells.append((end_x, end_y))
+        return cells
+
+    def crossing(self, points: List[Tuple[float, float]]) -> List[int]:
+        """
+        查询与折线相交的连线
+
+        Args:
+            points: 折线顶点 [(x, y), ...]
+
+        Returns:
+            相交连线的子节点句柄列表（按首次相交的折线段排序）
+        """
+        found: Dict[int, None] = {}
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            checked = set()
+            for cell in self._walk(x1, y1, x2, y2):
+                for handle in self.cells.get(cell, ()):
+                    if handle in found or handle in checked:
+                        continue
+                    checked.add(handle)
+                    endpoints = self._endpoints(handle)
+                    if endpoints is not None and segments_intersect(x1, y1, x2, y2, *endpoints):
+                        found[handle] = None
+        return list(found)
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[int]:
+        """
+        查询与矩形（含边界）相交的连线
+
+        Args:
+            min_x, min_y: 矩形左上角
+            max_x, max_y: 矩形右下角
+
+        Returns:
+            连线的子节点句柄列表（无序）
+        """
+        size = self.cell_size
+        low_x, low_y = math.floor(min_x / size), math.floor(min_y / size)
+        high_x, high_y = math.floor(max_x / size), math.floor(max_y / size)
+        if high_x < low_x or high_y < low_y:
+            return []
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(self.cells):
+            candidates = [
+                handles for (cell_x, cell_y), handles in self.cells.items()
+                if low_x <= cell_x <= high_x and low_y <= cell_y <= high_y
+            ]
+        else:
+            candidates = [
+                self.cells[(cell_x, cell_y)]
+                for cell_x in range(low_x, high_x + 1)
+                for cell_y in range(low_y, high_y + 1)
+                if (cell_x, cell_y) in self.cells
+            ]
+
+        seen = set()
+        result = []
+        for handles in candidates:
+            for handle in handles:
+                if handle in seen:
+                    continue
+                seen.add(handle)
+                endpoints = self._endpoints(handle)
+                if endpoints is not None and segment_intersects_rect(*endpoints, min_x, min_y, max_x, max_y):
+                    result.append(handle)
+        return result
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Set, Iterable
+from .mindmap_node import MindMapNode
+from .node_table import NodeTable
+
+
+def normalize_text(text: str) -> str:
+    """
+    文本归一化：转小写，并把词尾sigma统一为普通sigma
+
+    str.lower() 只有希腊字母词尾sigma依赖上下文，统一后归一化按字符进行，
+    因此区分大小写与不区分大小写的子串匹配都满足“查询的n-gram是文本n-gram的子集”
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        归一化后的文本
+    """
+    return text.lower().replace("ς", "σ")
+
+
+def text_grams(text: str) -> Set[str]:
+    """
+    提取文本的单字和双字n-gram（中日韩文本无需分词即可按字索引）
+
+    Args:
+        text: 归一化后的文本
+
+    Returns:
+        n-gram集合
+    """
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(query: str) -> Set[str]:
+    """
+    提取查询的n-gram：长度不小于2时只用双字n-gram，选择性更好
+
+    Args:
+        query: 归一化后的查询
+
+    Returns:
+        n-gram集合
+    """
+    if len(query) < 2:
+        return set(query)
+    return {query[i:i + 2] for i in range(len(query) - 1)}
+
+
+class TextIndex:
+    """
+    节点文本倒排索引
+    以单字/双字n-gram为词项，为标题、内容等字段建立倒排表，
+    子串查询只需校验候选节点，结果与全量扫描完全一致
+    """
+
+    def __init__(self, table: NodeTable, fields: Iterable[str] = ("title", "content")):
+        """
+        初始化文本索引
+
+        Args:
+            table: 管理器的节点句柄表（共享引用），倒排表中存放节点句柄
+            fields: 需要索引的字段名
+        """
+        self.table = table
+        self.fields = tuple(fields)
+        self.postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in self.fields}
+        for handle, node in enumerate(table.nodes):
+            if node is not None:
+                self.add(handle)
+
+    def _index_text(self, field: str, handle: int, text: str) -> None:
+        """
+        将文本的n-gram加入倒排表
+
+        Args:
+            field: 字段名
+            handle: 节点句柄
+            text: 字段文本
+        """
+        postings = self.postings[field]
+        for gram in text_grams(normalize_text(text)):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {handle}
+            else:
+                ids.add(handle)
+
+    def _unindex_text(self, field: str, handle: int, text: str) -> None:
+        """
+        将文本的n-gram从倒排表中移除
+
+        Args:
+            field: 字段名
+            handle: 节点句柄
+            text: 字段文本
+        """
+        postings = self.postings[field]
+        for gram in text_grams(normalize_text(text)):
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(handle)
+                if not ids:
+                    del postings[gram]
+
+    def add(self, handle: int) -> None:
+        """
+        索引节点
+
+        Args:
+            handle: 节点句柄
+        """
+        node = self.table.nodes[handle]
+        for field in self.fields:
+            self._index_text(field, handle, getattr(node, field))
+
+    def remove(self, handle: int) -> None:
+        """
+        移除节点索引
+
+        Args:
+            handle: 节点句柄
+        """
+        node = self.table.nodes[handle]
+        for field in self.fields:
+            self._unindex_text(field, handle, getattr(node, field))
+
+    def update(self, handle: int, field: str, old_text: str) -> None:
+        """
+        字段文本变化后更新索引
+
+        Args:
+            handle: 节点句柄
+            field: 字段名
+            old_text: 变化前的文本
+        """
+        if field not in self.postings:
+            return
+        self._unindex_text(field, handle, old_text)
+        self._index_text(field, handle, getattr(self.table.nodes[handle], field))
+
+    def search(self, field: str, query: str, case_sensitive: bool = False) -> Optional[List[MindMapNode]]:
+        """
+        子串查询
+
+        Args:
+            field: 字段名
+            query: 查询关键词
+            case_sensitive: 是否区分大小写
+
+        Returns:
+            匹配的节点列表（按加入顺序），字段未索引或查询为空时返回None，由调用方全量扫描
+        """
+        postings = self.postings.get(field)
+        if postings is None or not query:
+            return None
+
+        # 从最短的倒排表开始求交集
+        candidate_sets = []
+        for gram in query_grams(normalize_text(query)):
+            ids = postings.get(gram)
+            if ids is None:
+                return []
+            candidate_sets.append(ids)
+        candidate_sets.sort(key=len)
+        candidates = set(candidate_sets[0])
+        for ids in candidate_sets[1:]:
+            candidates &= ids
+            if not candidates:
+                return []
+
+        # 校验候选节点
+        nodes = self.table.nodes
+        if case_sensitive:
+            matched = [handle for handle in candidates if query in getattr(nodes[handle], field)]
+        else:
+            lowered = query.lower()
+            matched = [handle for handle in candidates if lowered in getattr(nodes[handle], field).lower()]
+        matched.sort(key=self.table.order.__getitem__)
+        return [nodes[handle] for handle in matched]
@@ -0,0 +1,539 @@
+from typing import Dict, List, Optional, Set, Tuple, Iterator
+from .node_table import NodeTable
+
+
+# 全量重标号时相邻欧拉序标号之间的间隔，间隔越大，增量插入前可容纳的节点越多
+LABEL_GAP = 1 << 64
+# 增量插入时相邻标号的最小间隔，小于该值则需要重标号
+MIN_LABEL_STEP = 4
+# 局部重标号时相邻标号的最小间隔，保证重标号后还能容纳若干层嵌套插入
+RELABEL_MIN_STEP = 1 << 32
+
+
+class TreeIndex:
+    """
+    思维导图树索引
+    维护节点深度索引和欧拉序（先序/后序区间）索引，由管理器在增删移动节点时增量更新
+
+    - 深度查询 O(1)
+    - 祖先判断 O(1)（区间包含）
+    - 最大深度查询 O(1)（均摊）
+
+    所有数组均以 NodeTable 分配的节点句柄为下标，深度为-1表示句柄未被索引
+    """
+
+    def __init__(self, table: NodeTable):
+        """
+        初始化树索引
+
+        Args:
+            table: 管理器的节点句柄表（共享引用）
+        """
+        self.table = table
+        self.depth: List[int] = []
+        self.tin: List[int] = []
+        self.tout: List[int] = []
+
+        # 每个节点区间内已使用的最大标号（0表示尚无子树），新子树放在其后
+        self._last_label: List[int] = []
+        # 每个节点分配标号时相邻标号的间隔，新子树在其区间内按该间隔占用空间
+        self._label_step: List[int] = []
+        # 下一个可用于根级子树的标号
+        self._next_label: int = LABEL_GAP
+        # 标号空间不足时置为True，查询时再统一重标号
+        self._labels_dirty: bool = False
+
+        # 按深度统计节点数，用于O(1)获取最大深度
+        self._depth_counts: List[int] = []
+        # 父节点尚未加入管理器的节点：父节点ID -> 子节点句柄集合
+        self._orphans: Dict[str, Set[int]] = {}
+
+    def _grow(self) -> None:
+        """
+        按句柄表容量扩展数组
+        """
+        missing = self.table.capacity - len(self.depth)
+        if missing > 0:
+            self.depth.extend([-1] * missing)
+            self.tin.extend([0] * missing)
+            self.tout.extend([0] * missing)
+            self._last_label.extend([0] * missing)
+            self._label_step.extend([LABEL_GAP] * missing)
+
+    def _indexed(self, handle) -> bool:
+        """
+        判断句柄是否已被索引
+
+        Args:
+            handle: 节点句柄（可为None）
+
+        Returns:
+            是否已被索引
+        """
+        return handle is not None and handle < len(self.depth) and self.depth[handle] >= 0
+
+    def _tree_children(self, handle: int) -> List[int]:
+        """
+        获取在索引中且父指针指向该节点的子节点句柄
+
+        Args:
+            handle: 节点句柄
+
+        Returns:
+            子节点句柄列表
+        """
+        table = self.table
+        node = table.nodes[handle]
+        children = []
+        for child_id in node.child_ids:
+            child = table.handles.get(child_id)
+            if self._indexed(child) and table.nodes[child].parent_id == node.node_id:
+                children.append(child)
+        return children
+
+    def _iter_subtree_events(self, handle: int) -> Iterator[Tuple[int, bool]]:
+        """
+        迭代生成子树的欧拉序事件（避免递归深度限制）
+
+        Args:
+            handle: 子树根节点句柄
+
+        Returns:
+            (节点句柄, 是否为进入事件) 的迭代器
+        """
+        yield handle, True
+        stack = [(handle, iter(self._tree_children(handle)))]
+        while stack:
+            current, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield current, False
+            else:
+                yield child, True
+                stack.append((child, iter(self._tree_children(child))))
+
+    def _count_depth(self, depth: int, delta: int) -> None:
+        """
+        更新指定深度的节点计数
+
+        Args:
+            depth: 深度
+            delta: 计数变化量
+        """
+        while len(self._depth_counts) <= depth:
+            self._depth_counts.append(0)
+        self._depth_counts[depth] += delta
+
+    def _set_subtree_depth(self, handle: int, depth: int) -> List[Tuple[int, bool]]:
+        """
+        设置子树的深度（子树根节点深度为depth），并返回子树的欧拉序事件
+
+        Args:
+            handle: 子树根节点句柄
+            depth: 子树根节点的新深度
+
+        Returns:
+            子树的欧拉序事件列表
+        """
+        events = list(self._iter_subtree_events(handle))
+        current = depth - 1
+        for event_handle, entering in events:
+            if not entering:
+                current -= 1
+                continue
+            current += 1
+            old_depth = self.depth[event_handle]
+            if old_depth >= 0:
+                self._count_depth(old_depth, -1)
+            self.depth[event_handle] = current
+            self._count_depth(current, 1)
+        return events
+
+    def _assign_labels(
+        self, events: List[Tuple[int, bool]], low: int, high: int, min_step: int = MIN_LABEL_STEP
+    ) -> bool:
+        """
+        在开区间 (low, high) 内为子树的欧拉序事件均匀分配标号
+
+        Args:
+            events: 子树的欧拉序事件列表
+            low: 区间下界（不含）
+            high: 区间上界（不含）
+            min_step: 相邻标号的最小间隔
+
+        Returns:
+            空间是否足够
+        """
+        step = (high - low) // (len(events) + 1)
+        if step < min_step:
+            return False
+        label = low
+        open_handles = []
+        for event_handle, entering in events:
+            label += step
+            if entering:
+                self.tin[event_handle] = label
+                self._last_label[event_handle] = 0
+                self._label_step[event_handle] = step
+                open_handles.append(event_handle)
+            else:
+                self.tout[event_handle] = label
+                open_handles.pop()
+                if open_handles:
+                    self._last_label[open_handles[-1]] = label
+        return True
+
+    def _place_subtree(self, handle: int, events: List[Tuple[int, bool]]) -> None:
+        """
+        为子树分配欧拉序标号：有父节点时放入父节点区间的剩余空间，否则放到根级末尾
+
+        Args:
+            handle: 子树根节点句柄
+            events: 子树的欧拉序事件列表
+        """
+        if self._labels_dirty:
+            return
+
+        parent = self._parent(handle)
+        if parent is not None:
+            if not self._append_to(parent, events):
+                # 父节点区间已用尽：只重标号空间足够的最近祖先的子树，再重新放置
+                self._make_room(parent)
+                if not self._append_to(parent, events):
+                    self._labels_dirty = True
+        else:
+            self._place_root(events)
+
+    def _parent(self, handle: int) -> Optional[int]:
+        """
+        获取已被索引的父节点句柄
+
+        Args:
+            handle: 节点句柄
+
+        Returns:
+            父节点句柄，没有父节点或父节点未被索引时返回None
+        """
+        parent = self.table.handles.get(self.table.nodes[handle].parent_id)
+        return parent if self._indexed(parent) else None
+
+    def _append_to(self, parent: int, events: List[Tuple[int, bool]]) -> bool:
+        """
+        将子树放入父节点区间中最后一个子树之后的剩余空间
+
+        Args:
+            parent: 父节点句柄
+            events: 子树的欧拉序事件列表
+
+        Returns:
+            空间是否足够
+        """
+        low = self._last_label[parent] or self.tin[parent]
+        # 按父节点的标号间隔占用空间，且最多占用剩余空间的前一半，为后续追加的兄弟子树保留空间
+        size = min((self.tout[parent] - low) // 2, self._label_step[parent] * (len(events) + 1))
+        if not self._assign_labels(events, low, low + size):
+            return False
+        self._last_label[parent] = self.tout[events[0][0]]
+        return True
+
+    def _place_root(self, events: List[Tuple[int, bool]]) -> None:
+        """
+        将子树作为根级子树放到标号空间末尾
+
+        Args:
+            events: 子树的欧拉序事件列表
+        """
+        low = self._next_label
+        self._next_label = low + LABEL_GAP * (len(events) + 1)
+        self._assign_labels(events, low, self._next_label)
+
+    def _relabel(
+        self, handle: int, inner: bool, low: Optional[int] = None, high: Optional[int] = None,
+        min_step: int = RELABEL_MIN_STEP
+    ) -> bool:
+        """
+        重新分配子树的标号，每个节点的区间末尾预留与其子树事件数成正比的空间，
+        使之后在任意节点下追加的子树可以按间隔占用空间，重标号的代价由这些追加均摊
+
+        Args:
+            handle: 子树根节点句柄
+            inner: 为True时保留子树根节点自身的标号，只在其区间的前一半内重新分配后代的标号
+            low: 区间下界（不含），为None时放到根级标号空间末尾
+            high: 区间上界（不含）
+            min_step: 相邻标号的最小间隔
+
+        Returns:
+            空间是否足够
+        """
+        events = list(self._iter_subtree_events(handle))
+        if inner:
+            events = events[1:-1]
+        # 每个节点子树内的事件数，即其区间末尾预留空间的权重
+        reserve: Dict[int, int] = {}
+        starts = []
+        for index, (event_handle, entering) in enumerate(events):
+            if entering:
+                starts.append(index)
+            else:
+                reserve[event_handle] = index - starts.pop() + 1
+        weight = len(events) + sum(reserve.values())
+        if low is None:
+            low = self._next_label
+            self._next_label = high = low + LABEL_GAP * (weight + 1)
+        step = (high - low) // (weight + 1)
+        if step < min_step:
+            return False
+
+        if inner:
+            self._last_label[handle] = 0
+            self._label_step[handle] = step
+        label = low
+        open_handles = []
+        for event_handle, entering in events:
+            label += step
+            if entering:
+                self.tin[event_handle] = label
+                self._last_label[event_handle] = 0
+                self._label_step[event_handle] = step
+                open_handles.append(event_handle)
+            else:
+                label += step * reserve[event_handle]
+                self.tout[event_handle] = label
+                open_handles.pop()
+                if open_handles:
+                    self._last_label[open_handles[-1]] = label
+                elif inner:
+                    self._last_label[handle] = label
+        return True
+
+    def _make_room(self, handle: int) -> None:
+        """
+        局部重标号：从 handle 向上按距离 1、2、4… 检查祖先，找到区间前一半能容纳其子树的祖先后，
+        只重新分配该祖先后代的标号；到达根节点时把根节点的整个子树移到根级标号空间末尾。
+        距离越远要求的间隔越大，使重标号后能容纳更多层嵌套插入，代价与被重标号的子树大小成正比
+
+        Args:
+            handle: 区间已用尽的节点句柄
+        """
+        ancestor = handle
+        distance = 1
+        while True:
+            parent = self._parent(ancestor)
+            if parent is None:
+                self._relabel(ancestor, False)
+                return
+            if distance & (distance - 1) == 0:
+                low = self.tin[ancestor]
+                high = low + (self.tout[ancestor] - low) // 2
+                if self._relabel(ancestor, True, low, high, RELABEL_MIN_STEP * distance):
+                    return
+            ancestor = parent
+            distance += 1
+
+    def _attach(self, handle: int) -> None:
+        """
+        根据节点的父指针计算子树深度并分配标号
+
+        Args:
+            handle: 子树根节点句柄
+        """
+        parent = self.table.handles.get(self.table.nodes[handle].parent_id)
+        depth = self.depth[parent] + 1 if self._indexed(parent) else 0
+        events = self._set_subtree_depth(handle, depth)
+        self._place_subtree(handle, events)
+
+    def waiting_children(self, node_id: str) -> List[int]:
+        """
+        获取先于父节点加入、仍在等待该父节点的子节点
+
+        Args:
+            node_id: 父节点ID
+
+        Returns:
+            子节点句柄列表
+        """
+        nodes = self.table.nodes
+        waiting = [
+            handle for handle in self._orphans.get(node_id, ())
+            if nodes[handle] is not None and nodes[handle].parent_id == node_id
+        ]
+        # 按加入顺序排列，与子节点依次加入时的顺序一致
+        waiting.sort(key=self.table.order.__getitem__)
+        return waiting
+
+    def add(self, handle: int) -> None:
+        """
+        索引新加入管理器的节点
+
+        Args:
+            handle: 新节点的句柄（已加入句柄表）
+        """
+        self._grow()
+        node = self.table.nodes[handle]
+        parent_id = node.parent_id
+        if parent_id is not None and not self._indexed(self.table.handles.get(parent_id)):
+            self._orphans.setdefault(parent_id, set()).add(handle)
+
+        # 父节点晚于子节点加入时，将等待中的子节点挂到新节点下
+        waiting = self._orphans.pop(node.node_id, set())
+        self._attach(handle)
+        for child in waiting:
+            child_node = self.table.nodes[child]
+            if (
+                child_node is not None
+                and child_node.parent_id == node.node_id
+                and child_node.node_id not in node.child_ids
+            ):
+                # 不在children列表中的子节点无法通过子树遍历到，单独挂接
+                self._attach(child)
+
+    def remove(self, handle: int, promoted: List[int]) -> None:
+        """
+        从索引中移除节点，并将其子节点子树提升为根级
+
+        Args:
+            handle: 被移除节点的句柄（调用后由句柄表释放）
+            promoted: 被提升为根节点的子节点句柄列表
+        """
+        depth = self.depth[handle]
+        if depth >= 0:
+            self._count_depth(depth, -1)
+        self.depth[handle] = -1
+        self._last_label[handle] = 0
+        for waiting in self._orphans.values():
+            waiting.discard(handle)
+
+        for child in promoted:
+            if self._indexed(child):
+                self._attach(child)
+
+    def move(self, handle: int) -> None:
+        """
+        节点父节点变化后，更新其子树的深度和标号
+
+        Args:
+            handle: 被移动节点的句柄
+        """
+        if self._indexed(handle):
+            self._attach(handle)
+
+    def rebuild(self) -> None:
+        """
+        根据父指针全量重建索引（迭代实现，O(n)）
+        """
+        table = self.table
+        capacity = table.capacity
+        self.depth = [-1] * capacity
+        self.tin = [0] * capacity
+        self.tout = [0] * capacity
+        self._last_label = [0] * capacity
+        self._label_step = [LABEL_GAP] * capacity
+        self._depth_counts = []
+        self._orphans = {}
+        self._labels_dirty = False
+
+        # 先按父指针建立子节点表，使深度与 MindMapNode.get_depth 的结果一致
+        handles = table.handles
+        tree_children: Dict[int, List[int]] = {}
+        roots = []
+        for handle, node in enumerate(table.nodes):
+            if node is None:
+                continue
+            parent_id = node.parent_id
+            parent = handles.get(parent_id) if parent_id is not None else None
+            if parent is not None:
+                children = tree_children.get(parent)
+                if children is None:
+                    tree_children[parent] = [handle]
+                else:
+                    children.append(handle)
+            else:
+                roots.append(handle)
+                if parent_id is not None:
+                    self._orphans.setdefault(parent_id, set()).add(handle)
+        # 根节点按加入顺序排列，与节点映射的遍历顺序一致
+        roots.sort(key=table.order.__getitem__)
+
+        # 先用连续整数编号，最后统一放大为带间隔的标号
+        depth, tin, tout, last = self.depth, self.tin, self.tout, self._last_label
+        depth_counts = self._depth_counts
+        no_children = ()
+        label = 0
+        for root in roots:
+            label += 1
+            tin[root] = label
+            depth[root] = 0
+            stack = [root]
+            iterators = [iter(tree_children.get(root, no_children))]
+            while stack:
+                child = next(iterators[-1], None)
+                label += 1
+                if child is None:
+                    current = stack.pop()
+                    iterators.pop()
+                    tout[current] = label
+                    if stack:
+                        last[stack[-1]] = label
+                else:
+                    tin[child] = label
+                    depth[child] = len(stack)
+                    stack.append(child)
+                    iterators.append(iter(tree_children.get(child, no_children)))
+
+        for node_depth in depth:
+            if node_depth >= 0:
+                while len(depth_counts) <= node_depth:
+                    depth_counts.append(0)
+                depth_counts[node_depth] += 1
+        self.tin = [value * LABEL_GAP for value in tin]
+        self.tout = [value * LABEL_GAP for value in tout]
+        self._last_label = [value * LABEL_GAP for value in last]
+        self._next_label = (label + 1) * LABEL_GAP
+
+    def _ensure_labels(self) -> None:
+        """
+        标号空间耗尽后，在查询前统一重建
+        """
+        if self._labels_dirty:
+            self.rebuild()
+
+    def get_depth(self, handle: int) -> int:
+        """
+        获取节点深度
+
+        Args:
+            handle: 节点句柄
+
+        Returns:
+            节点深度，未被索引时返回-1
+        """
+        return self.depth[handle] if handle < len(self.depth) else -1
+
+    def get_max_depth(self) -> int:
+        """
+        获取最大深度
+
+        Returns:
+            最大深度，没有节点时为0
+        """
+        counts = self._depth_counts
+        while counts and counts[-1] == 0:
+            counts.pop()
+        return max(len(counts) - 1, 0)
+
+    def is_ancestor(self, ancestor: int, handle: int) -> bool:
+        """
+        判断一个节点是否为另一个节点的（严格）祖先
+
+        Args:
+            ancestor: 祖先节点句柄
+            handle: 后代节点句柄
+
+        Returns:
+            是否为祖先
+        """
+        if ancestor == handle or not self._indexed(ancestor) or not self._indexed(handle):
+            return False
+        self._ensure_labels()
+        return self.tin[ancestor] < self.tin[handle] and self.tout[handle] < self.tout[ancestor]
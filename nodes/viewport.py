@@ -0,0 +1,365 @@
+"""
+思维导图视口裁剪
+
+大导图在前端为每个节点创建 DOM 元素和连线会变得不可用，视口查询只返回与可见矩形相交的部分：
+    - 位置落在视口（含边缘余量）内的节点由管理器的网格空间索引查出
+    - 折叠（is_expanded=False）的子树以及按当前缩放在屏幕上小于 min_size 像素的子树
+      汇总为一个聚合节点，子树内的节点和连线不再单独返回
+    - 每条连线带上两端坐标，另一端在视口外时前端也能直接绘制；
+      两端都在视口外但穿过视口的连线由管理器的连线空间索引查出
+
+子树包围盒由管理器持有，节点位置或结构变化后只有该节点的祖先链失效，查询时按需重新计算。
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from .layout import tree_arrays
+
+
+# 子树在屏幕上的边长小于该像素数时汇总为聚合节点
+DEFAULT_MIN_SIZE = 24.0
+# 视口四周额外查询的画布距离，使一端刚好在视口外的连线也能返回
+DEFAULT_MARGIN = 250.0
+
+
+class SubtreeBounds:
+    """
+    每个节点的子树包围盒（含自身）和子树节点数，以节点句柄为下标存储
+
+    首次使用时按树结构向量化全量计算；之后管理器在节点位置或父子关系变化时调用 invalidate，
+    只把该节点及其祖先链标记为失效，查询到失效节点时自底向上只重新计算失效的节点（合并其子节点的结果），
+    两次视口查询之间的单节点编辑代价为 O(祖先链上的子节点数)，而不是 O(n)。
+    整体布局写回或重建索引后调用 reset，下次查询时全量重新计算
+
+    Attributes:
+        min_x, min_y, max_x, max_y: 包围盒
+        size: 子树节点数（含自身）
+    """
+
+    def __init__(self, manager):
+        """
+        初始化子树包围盒（下次查询时全量计算）
+
+        Args:
+            manager: 思维导图管理器
+        """
+        self.manager = manager
+        self.table = manager._table
+        self.min_x = np.zeros(0)
+        self.min_y = np.zeros(0)
+        self.max_x = np.zeros(0)
+        self.max_y = np.zeros(0)
+        self.size = np.zeros(0, dtype=np.int64)
+        # 失效的节点句柄；失效节点的祖先也都失效
+        self._dirty: Set[int] = set()
+        self._stale = True
+        # 整张导图的包围盒，增量修改时只扩大（可能略大于实际范围）
+        self._total = (0.0, 0.0, 0.0, 0.0)
+
+    def reset(self) -> None:
+        """
+        标记为全部失效，下次查询时全量重新计算
+        """
+        self._stale = True
+        self._dirty.clear()
+
+    def invalidate(self, handle: Optional[int]) -> None:
+        """
+        节点位置或子节点变化后，将节点及其祖先链标记为失效
+
+        Args:
+            handle: 节点句柄
+        """
+        if self._stale or handle is None:
+            return
+        table = self.table
+        node = table.nodes[handle]
+        if node is not None:
+            min_x, min_y, max_x, max_y = self._total
+            self._total = (min(min_x, node._x), min(min_y, node._y), max(max_x, node._x), max(max_y, node._y))
+        # 遇到已失效的节点即可停止：它的祖先都已失效
+        while handle is not None and handle not in self._dirty:
+            self._dirty.add(handle)
+            node = table.nodes[handle]
+            if node is None or not node.parent_id:
+                break
+            handle = table.get(node.parent_id)
+
+    def remove(self, handle: int) -> None:
+        """
+        节点被移除后丢弃其状态（句柄会被复用）
+
+        Args:
+            handle: 节点句柄
+        """
+        self._dirty.discard(handle)
+
+    def _rebuild(self) -> None:
+        """
+        全量计算所有节点的子树包围盒
+        """
+        tree = tree_arrays(self.manager)
+        nodes = self.manager.nodes
+        x = np.array([nodes[node_id]._x for node_id in tree.node_ids], dtype=float)
+        y = np.array([nodes[node_id]._y for node_id in tree.node_ids], dtype=float)
+        min_x, max_x = x.copy(), x.copy()
+        min_y, max_y = y.copy(), y.copy()
+        # 自底向上合并到父节点
+        for level in reversed(tree.levels[1:]):
+            parent = tree.parent[level]
+            np.minimum.at(min_x, parent, min_x[level])
+            np.minimum.at(min_y, parent, min_y[level])
+            np.maximum.at(max_x, parent, max_x[level])
+            np.maximum.at(max_y, parent, max_y[level])
+
+        # 按树的顺序计算的结果分散到以句柄为下标的数组
+        capacity = self.table.capacity
+        handles = np.array([self.table.get(node_id) for node_id in tree.node_ids], dtype=np.int64)
+        self.min_x, self.min_y = np.zeros(capacity), np.zeros(capacity)
+        self.max_x, self.max_y = np.zeros(capacity), np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.min_x[handles], self.min_y[handles] = min_x, min_y
+        self.max_x[handles], self.max_y[handles] = max_x, max_y
+        self.size[handles] = tree.size
+        self._total = (
+            (float(x.min()), float(y.min()), float(x.max()), float(y.max())) if len(x) else (0.0, 0.0, 0.0, 0.0)
+        )
+        self._dirty.clear()
+        self._stale = False
+
+    def _children(self, handle: int) -> List[int]:
+        """
+        获取节点在树中的子节点句柄
+        """
+        table = self.table
+        node = table.nodes[handle]
+        children = []
+        for child_id in node.child_ids:
+            child = table.get(child_id)
+            if child is not None and table.nodes[child].parent_id == node.node_id:
+                children.append(child)
+        return children
+
+    def _refresh(self, handle: int) -> None:
+        """
+        重新计算节点子树中失效的部分（后序遍历，只下探到失效的子节点）
+
+        Args:
+            handle: 节点句柄
+        """
+        if self._stale:
+            self._rebuild()
+        if handle not in self._dirty:
+            return
+        missing = self.table.capacity - len(self.size)
+        if missing > 0:
+            self.min_x, self.min_y = np.append(self.min_x, np.zeros(missing)), np.append(self.min_y, np.zeros(missing))
+            self.max_x, self.max_y = np.append(self.max_x, np.zeros(missing)), np.append(self.max_y, np.zeros(missing))
+            self.size = np.append(self.size, np.zeros(missing, dtype=np.int64))
+
+        dirty = self._dirty
+        nodes = self.table.nodes
+        stack = [(handle, False)]
+        while stack:
+            current, merged = stack.pop()
+            if current not in dirty:
+                continue
+            children = self._children(current)
+            if not merged:
+                stack.append((current, True))
+                stack.extend((child, False) for child in children if child in dirty)
+                continue
+            node = nodes[current]
+            min_x = max_x = float(node._x)
+            min_y = max_y = float(node._y)
+            size = 1
+            for child in children:
+                min_x = min(min_x, self.min_x[child])
+                min_y = min(min_y, self.min_y[child])
+                max_x = max(max_x, self.max_x[child])
+                max_y = max(max_y, self.max_y[child])
+                size += int(self.size[child])
+            self.min_x[current], self.min_y[current] = min_x, min_y
+            self.max_x[current], self.max_y[current] = max_x, max_y
+            self.size[current] = size
+            dirty.discard(current)
+
+    @property
+    def total(self) -> Tuple[float, float, float, float]:
+        """
+        整张导图的包围盒 (min_x, min_y, max_x, max_y)，增量修改后可能略大于实际范围
+        """
+        if self._stale:
+            self._rebuild()
+        return self._total
+
+    def get(self, node_id: str) -> Dict[str, float]:
+        """
+        获取节点子树的包围盒
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            {"min_x", "min_y", "max_x", "max_y"}
+        """
+        i = self.table.get(node_id)
+        self._refresh(i)
+        return {
+            "min_x": float(self.min_x[i]), "min_y": float(self.min_y[i]),
+            "max_x": float(self.max_x[i]), "max_y": float(self.max_y[i])
+        }
+
+    def extent(self, node_id: str) -> float:
+        """
+        子树包围盒的较长边
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            画布坐标下的边长
+        """
+        i = self.table.get(node_id)
+        self._refresh(i)
+        return float(max(self.max_x[i] - self.min_x[i], self.max_y[i] - self.min_y[i]))
+
+    def count(self, node_id: str) -> int:
+        """
+        子树节点数（含自身）
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            节点数
+        """
+        i = self.table.get(node_id)
+        self._refresh(i)
+        return int(self.size[i])
+
+
+def get_subtree_bounds(manager) -> SubtreeBounds:
+    """
+    获取管理器的子树包围盒，首次调用时创建并交给管理器随修改增量失效
+
+    Args:
+        manager: 思维导图管理器
+
+    Returns:
+        子树包围盒
+    """
+    if manager._bounds is None:
+        manager._bounds = SubtreeBounds(manager)
+    return manager._bounds
+
+
+def viewport_query(
+    manager,
+    min_x: float,
+    min_y: float,
+    max_x: float,
+    max_y: float,
+    zoom: float = 1.0,
+    min_size: float = DEFAULT_MIN_SIZE,
+    margin: float = DEFAULT_MARGIN
+) -> Dict[str, Any]:
+    """
+    查询视口内需要绘制的节点、聚合节点和连线
+
+    Args:
+        manager: 思维导图管理器
+        min_x, min_y, max_x, max_y: 视口矩形（画布坐标）
+        zoom: 缩放比例（屏幕像素 / 画布单位）
+        min_size: 子树在屏幕上小于该像素数时汇总
+        margin: 视口四周额外查询的画布距离
+
+    Returns:
+        {"nodes": 节点字典列表, "aggregates": 聚合节点列表, "edges": 连线列表, "total": 导图节点总数}
+    """
+    nodes = manager.nodes
+    bounds = get_subtree_bounds(manager)
+    tiny = min_size / zoom if zoom > 0 else float("inf")
+
+    def summarizes(node) -> bool:
+        """节点是否把整个子树汇总为聚合节点"""
+        if not node.child_ids:
+            return False
+        return not node.is_expanded or bounds.extent(node.node_id) < tiny
+
+    # 节点ID -> 隐藏该节点的聚合节点ID（None 表示节点本身可见）
+    hidden_by: Dict[str, Optional[str]] = {}
+
+    def resolve(node_id: str) -> Optional[str]:
+        chain = []
+        current = node_id
+        while current not in hidden_by:
+            chain.append(current)
+            parent_id = nodes[current].parent_id
+            if parent_id not in nodes or len(chain) > len(nodes):
+                hidden_by[current] = None
+                chain.pop()
+                break
+            current = parent_id
+        # 自上而下填充：父节点被隐藏则子节点随之隐藏，父节点汇总则子节点由父节点代表
+        for child_id in reversed(chain):
+            parent_id = nodes[child_id].parent_id
+            hidden = hidden_by[parent_id]
+            if hidden is None and summarizes(nodes[parent_id]):
+                hidden = parent_id
+            hidden_by[child_id] = hidden
+        return hidden_by[node_id]
+
+    visible: List[str] = []
+    aggregate_ids: Dict[str, None] = {}
+    for node in manager.find_nodes_in_rect(min_x - margin, min_y - margin, max_x + margin, max_y + margin):
+        hidden = resolve(node.node_id)
+        if hidden is not None:
+            aggregate_ids[hidden] = None
+        elif summarizes(node):
+            aggregate_ids[node.node_id] = None
+        else:
+            visible.append(node.node_id)
+
+    edges: List[Dict[str, Any]] = []
+
+    def add_edge(child_id: str) -> None:
+        child = nodes[child_id]
+        parent = nodes.get(child.parent_id)
+        if parent is not None:
+            edges.append({
+                "source": parent.node_id,
+                "target": child_id,
+                "points": [parent._x, parent._y, child._x, child._y]
+            })
+
+    result_nodes = []
+    for node_id in visible:
+        result_nodes.append(nodes[node_id].to_dict())
+        add_edge(node_id)
+
+    aggregates = []
+    for node_id in aggregate_ids:
+        node = nodes[node_id]
+        aggregates.append({
+            "id": node_id,
+            "title": node.title,
+            "position": node.position,
+            "collapsed": not node.is_expanded,
+            "count": bounds.count(node_id) - 1,
+            "bounds": bounds.get(node_id)
+        })
+        add_edge(node_id)
+
+    # 穿过视口的长连线（子节点未被隐藏时才绘制）；视口覆盖整张导图时所有连线的两端都已查出
+    total_min_x, total_min_y, total_max_x, total_max_y = bounds.total
+    covers_map = min_x <= total_min_x and min_y <= total_min_y and max_x >= total_max_x and max_y >= total_max_y
+    if not covers_map:
+        drawn = set(visible)
+        drawn.update(aggregate_ids)
+        for _, child_id in manager.find_edges_in_rect(min_x, min_y, max_x, max_y):
+            if child_id not in drawn and resolve(child_id) is None:
+                drawn.add(child_id)
+                add_edge(child_id)
+
+    return {"nodes": result_nodes, "aggregates": aggregates, "edges": edges, "total": len(nodes)}
@@ -0,0 +1,104 @@
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import json
+import time
+
+
+# 合并回复文本的默认刷新条件：距上次发送超过30毫秒或缓冲超过256字节
+FLUSH_INTERVAL = 0.03
+FLUSH_BYTES = 256
+
+# 预先编码的帧前后缀，chunk 帧只需对文本做一次JSON字符串编码
+_CHUNK_PREFIX = 'data: {"content": '
+_CHUNK_SUFFIX = ', "type": "chunk"}\n\n'
+
+END_FRAME = 'data: {"content": "", "type": "end"}\n\n'
+
+
+def encode_event(event: Dict[str, Any]) -> str:
+    """
+    编码一个SSE事件帧
+
+    Args:
+        event: 事件数据
+
+    Returns:
+        "data: {json}\\n\\n" 格式的帧
+    """
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def chunk_frame(text: str) -> str:
+    """
+    编码回复文本帧（与 encode_event({'content': text, 'type': 'chunk'}) 结果相同）
+
+    Args:
+        text: 回复文本
+
+    Returns:
+        chunk 帧
+    """
+    return _CHUNK_PREFIX + json.dumps(text) + _CHUNK_SUFFIX
+
+
+async def coalesce_text(
+    pieces: AsyncIterator[str],
+    interval: float = FLUSH_INTERVAL,
+    max_bytes: int = FLUSH_BYTES
+) -> AsyncIterator[str]:
+    """
+    合并流式文本片段：缓冲的文本在距上次发送超过 interval 秒或超过 max_bytes 字节时一次发送
+
+    即使上游暂时没有新片段，缓冲的文本也会在 interval 到期时发送
+
+    Args:
+        pieces: 文本片段的异步迭代器
+        interval: 最长缓冲时间（秒）
+        max_bytes: 最大缓冲字节数（UTF-8）
+
+    Yields:
+        合并后的文本
+    """
+    # 上游在单独的任务中完整运行（保持其上下文变量一致），通过队列交给本生成器
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            async for piece in pieces:
+                queue.put_nowait((piece, None))
+            queue.put_nowait((None, None))
+        except Exception as e:
+            queue.put_nowait((None, e))
+
+    producer = asyncio.ensure_future(produce())
+    buffer = []
+    size = 0
+    last_flush = time.monotonic()
+    pending = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            timeout = None
+            if buffer:
+                timeout = max(last_flush + interval - time.monotonic(), 0)
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if done:
+                piece, error = pending.result()
+                if error is not None:
+                    raise error
+                if piece is None:
+                    break
+                pending = asyncio.ensure_future(queue.get())
+                buffer.append(piece)
+                size += len(piece.encode("utf-8"))
+                if size < max_bytes and time.monotonic() - last_flush < interval:
+                    continue
+            if buffer:
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+            last_flush = time.monotonic()
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        pending.cancel()
+        producer.cancel()
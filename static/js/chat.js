@@ -340,9 +340,26 @@ class ChatManager {
                 `;
                 
                 // 添加点击事件（可选）
-                childElement.addEventListener('click', () => {
+                childElement.addEventListener('click', async () => {
                     console.log(`点击子节点: ${childData.title}`);
-                    // 这里可以添加子节点点击逻辑
+                    // 获取子节点的扩展建议（建议讨论的节点通常已在后台预取）
+                    try {
+                        const response = await fetch('/chat/focus', {
+                            method: 'POST',
+                            headers: {
+                                'Content-Type': 'application/json',
+                            },
+                            body: JSON.stringify({
+                                session_id: this.currentSessionId,
+                                title: childData.title,
+                                content: childData.content
+                            })
+                        });
+                        const suggestions = await response.json();
+                        console.log(`子节点 ${childData.title} 的扩展建议:`, suggestions.child_nodes || suggestions.error);
+                    } catch (error) {
+                        console.error('获取扩展建议失败:', error);
+                    }
                 });
                 
                 childrenContainer.appendChild(childElement);
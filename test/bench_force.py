@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+力导向布局基准测试
+统计 Barnes–Hut 斥力单步耗时、与逐对计算的误差，以及整次布局每步的平均耗时
+
+用法: python test/bench_force.py [节点数 ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.layout import barnes_hut_repulsion, compute_layout
+from bench_snapshot import build_manager
+
+
+# 整次布局的迭代次数
+ITERATIONS = 10
+# 与逐对计算比较误差时抽样的节点数
+SAMPLE = 500
+
+
+def repulsion_error(x, y, force_x, force_y):
+    """
+    抽样节点的 Barnes–Hut 斥力与逐对精确计算的相对误差中位数
+
+    Args:
+        x, y: 节点坐标
+        force_x, force_y: Barnes–Hut 计算的斥力（系数为1）
+
+    Returns:
+        相对误差中位数
+    """
+    sample = np.arange(0, len(x), max(len(x) // SAMPLE, 1))
+    dx = x[sample, None] - x[None, :]
+    dy = y[sample, None] - y[None, :]
+    distance2 = np.maximum(dx * dx + dy * dy, 1e-4)
+    exact_x = (dx / distance2).sum(axis=1)
+    exact_y = (dy / distance2).sum(axis=1)
+    error = np.hypot(force_x[sample] - exact_x, force_y[sample] - exact_y)
+    return float(np.median(error / np.maximum(np.hypot(exact_x, exact_y), 1e-9)))
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [5000, 20000]
+    print(f"{'节点数':>8} {'斥力毫秒':>10} {'相对误差':>10} {'每步毫秒':>10}")
+    for count in counts:
+        manager = build_manager(count)
+        layout = compute_layout(manager, "radial")
+
+        start = time.perf_counter()
+        force_x, force_y = barnes_hut_repulsion(layout.x, layout.y, 1.0)
+        repulsion_ms = (time.perf_counter() - start) * 1000
+        error = repulsion_error(layout.x, layout.y, force_x, force_y)
+
+        start = time.perf_counter()
+        compute_layout(manager, "force", iterations=ITERATIONS)
+        step_ms = (time.perf_counter() - start) * 1000 / ITERATIONS
+        print(f"{count:>8} {repulsion_ms:>10.1f} {error:>10.4f} {step_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+操作日志基准测试
+对比每次编辑后整体保存（save_to_file）与追加写入操作日志的单次编辑持久化耗时
+
+用法: python test/bench_journal.py [节点数 ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes import MindMapManager
+from bench_snapshot import build_manager
+
+
+EDITS = 200
+# 整体保存较慢，只测少量编辑
+SAVE_EDITS = 20
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'节点数':>10} {'方式':>10} {'毫秒/编辑':>10}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for count in sizes:
+            manager = build_manager(count)
+            node_ids = list(manager.nodes)[:EDITS]
+
+            path = os.path.join(tmpdir, f"full_{count}.mmb")
+            start = time.perf_counter()
+            for i, node_id in enumerate(node_ids[:SAVE_EDITS]):
+                manager.get_node(node_id).update_title(f"标题 {i}")
+                manager.save_to_file(path)
+            full_ms = (time.perf_counter() - start) * 1000 / SAVE_EDITS
+            print(f"{count:>10} {'save':>10} {full_ms:>10.3f}")
+
+            path = os.path.join(tmpdir, f"journal_{count}.mmb")
+            manager.save_to_file(path)
+            journaled = MindMapManager.open_journaled(path, compact_threshold=0)
+            start = time.perf_counter()
+            for i, node_id in enumerate(node_ids):
+                journaled.get_node(node_id).update_title(f"标题 {i}")
+            journaled.close_journal()
+            journal_ms = (time.perf_counter() - start) * 1000 / EDITS
+            print(f"{count:>10} {'journal':>10} {journal_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
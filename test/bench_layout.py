@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+服务端布局基准测试
+统计各布局模式计算整张导图坐标的耗时、批量写回的耗时和下发坐标的JSON大小
+
+用法: python test/bench_layout.py [节点数 ...]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.layout import LAYOUT_MODES, apply_layout, compute_layout
+from bench_snapshot import build_manager
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    print(f"{'节点数':>8} {'模式':>8} {'布局毫秒':>10} {'写回毫秒':>10} {'JSON字节':>10}")
+    for count in counts:
+        manager = build_manager(count)
+        for mode in LAYOUT_MODES:
+            start = time.perf_counter()
+            layout = compute_layout(manager, mode)
+            layout_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            apply_layout(manager, layout)
+            apply_ms = (time.perf_counter() - start) * 1000
+
+            size = len(json.dumps(layout.to_dict()))
+            print(f"{count:>8} {mode:>8} {layout_ms:>10.1f} {apply_ms:>10.1f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
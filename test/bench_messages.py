@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+MessageManager.add_message 基准测试
+- 大量会话下的 add_message 耗时与每会话内存
+- 长对话窗口裁剪：原列表实现（切片移出）与双端队列实现的对比
+
+用法: python test/bench_messages.py [会话数 ...]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_manager import ChatMessage, MessageManager
+
+
+# 每个会话预先写入的消息数
+WARM_MESSAGES = 10
+# 计时的 add_message 调用次数
+OPS = 200000
+# 长对话对比中保留的消息数
+WINDOW = 1000
+
+
+def bench_sessions(sessions):
+    """
+    大量会话下的 add_message 耗时
+
+    Args:
+        sessions: 会话数
+
+    Returns:
+        (每次调用微秒数, 每会话字节数)
+    """
+    tracemalloc.start()
+    manager = MessageManager(token_budget=200)
+    session_ids = [f"session-{i}" for i in range(sessions)]
+    for session_id in session_ids:
+        for i in range(WARM_MESSAGES):
+            manager.add_message(session_id, "user" if i % 2 == 0 else "assistant", "帮我规划一次去火星的旅行")
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for i in range(OPS):
+        manager.add_message(session_ids[i % sessions], "user", "继续讨论燃料的选择")
+    elapsed = time.perf_counter() - start
+    return elapsed / OPS * 1e6, memory / sessions
+
+
+class ListWindow:
+    """原实现：消息列表，超出窗口时整体切片"""
+
+    def __init__(self):
+        self.messages = []
+
+    def add(self, message):
+        self.messages.append(message)
+        if len(self.messages) > WINDOW:
+            self.messages = self.messages[-WINDOW:]
+
+
+def bench_window():
+    """
+    长对话下窗口裁剪的耗时
+
+    Returns:
+        (列表实现每次微秒数, 双端队列实现每次微秒数)
+    """
+    window = ListWindow()
+    start = time.perf_counter()
+    for i in range(OPS):
+        window.add(ChatMessage("user", "继续讨论燃料的选择"))
+    list_us = (time.perf_counter() - start) / OPS * 1e6
+
+    manager = MessageManager(max_rounds=WINDOW // 2, token_budget=1 << 30)
+    start = time.perf_counter()
+    for i in range(OPS):
+        manager.add_message("long", "user", "继续讨论燃料的选择")
+    deque_us = (time.perf_counter() - start) / OPS * 1e6
+    return list_us, deque_us
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'会话数':>8} {'add_message微秒':>16} {'每会话字节':>10}")
+    for sessions in counts:
+        us, per_session = bench_sessions(sessions)
+        print(f"{sessions:>8} {us:>16.2f} {per_session:>10.0f}")
+
+    list_us, deque_us = bench_window()
+    print(f"\n窗口 {WINDOW} 条消息，{OPS} 次追加")
+    print(f"{'列表切片':>10} {list_us:>8.2f} 微秒/次")
+    print(f"{'双端队列':>10} {deque_us:>8.2f} 微秒/次（含token预算和待摘要维护）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+MindMapNode 内存基准测试
+对比原始 __dict__ 存储与紧凑 __slots__ 存储在 10k/100k/1M 节点下的内存占用
+
+用法: python test/bench_node_memory.py [节点数 ...]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.mindmap_node import MindMapNode
+
+
+class LegacyMindMapNode:
+    """原始的 __dict__ 存储节点（仅保留构造逻辑，用于对比）"""
+
+    def __init__(self, title, content="", node_type="idea", parent_id=None, node_id=None, metadata=None):
+        self.node_id = node_id or str(uuid.uuid4())
+        self.title = title
+        self.content = content
+        self.node_type = node_type
+        self.parent_id = parent_id
+        self.metadata = metadata or {}
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+        self.children = []
+        self.siblings = []
+        self.is_expanded = True
+        self.is_visible = True
+        self.priority = 0
+        self.is_focused = False
+        self.color = None
+        self.icon = None
+        self.position = {"x": 0, "y": 0}
+
+
+def build_nodes(node_cls, count):
+    """
+    构建一棵每个节点4个子节点的树，返回节点列表
+
+    Args:
+        node_cls: 节点类
+        count: 节点数
+
+    Returns:
+        节点列表
+    """
+    nodes = []
+    for i in range(count):
+        parent = nodes[(i - 1) // 4] if i else None
+        node = node_cls(f"节点 {i}", parent_id=parent.node_id if parent else None)
+        if parent is not None:
+            parent.children.append(node.node_id)
+        nodes.append(node)
+    return nodes
+
+
+def measure(node_cls, count):
+    """
+    测量构建节点的内存占用和耗时
+
+    Args:
+        node_cls: 节点类
+        count: 节点数
+
+    Returns:
+        (每节点字节数, 总MB, 耗时秒)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = build_nodes(node_cls, count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    gc.collect()
+    return current / count, current / 1024 / 1024, elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'节点数':>10} {'实现':>8} {'字节/节点':>10} {'总MB':>10} {'构建秒':>8}")
+    for count in sizes:
+        results = {}
+        for name, node_cls in (("legacy", LegacyMindMapNode), ("compact", MindMapNode)):
+            per_node, total_mb, elapsed = measure(node_cls, count)
+            results[name] = per_node
+            print(f"{count:>10} {name:>8} {per_node:>10.0f} {total_mb:>10.1f} {elapsed:>8.2f}")
+        print(f"{'':>10} {'节省':>8} {1 - results['compact'] / results['legacy']:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+思维导图保存/加载基准测试
+对比 JSON 格式与二进制快照格式的保存、加载吞吐量和文件大小，以及内存映射打开快照的耗时
+
+用法: python test/bench_snapshot.py [节点数 ...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes import MindMapNode, MindMapManager, LazyMindMapManager
+
+
+def build_manager(count):
+    """
+    构建测试用思维导图：每个节点最多4个子节点，包含中英文标题和内容
+
+    Args:
+        count: 节点数
+
+    Returns:
+        思维导图管理器
+    """
+    rng = random.Random(0)
+    words = ["火箭", "设计", "材料", "组装", "测试", "发射", "rocket", "design", "engine", "fuel"]
+    manager = MindMapManager("bench")
+    node_ids = []
+    for i in range(count):
+        parent_id = node_ids[(i - 1) // 4] if i else None
+        node = MindMapNode(
+            title=" ".join(rng.choice(words) for _ in range(3)),
+            content=" ".join(rng.choice(words) for _ in range(12)),
+            node_type=rng.choice(["idea", "subtask", "note"]),
+            parent_id=parent_id
+        )
+        node.set_position(rng.uniform(-1000, 1000), rng.uniform(-1000, 1000))
+        manager.add_node(node)
+        node_ids.append(node.node_id)
+    return manager
+
+
+def timed(func, *args):
+    """
+    执行函数并计时
+
+    Returns:
+        (返回值, 耗时秒)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'节点数':>10} {'格式':>8} {'保存秒':>8} {'加载秒':>8} {'加载节点/秒':>12} {'文件MB':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for count in sizes:
+            manager = build_manager(count)
+            for name, extension in (("json", ".json"), ("binary", ".mmb")):
+                path = os.path.join(tmpdir, f"bench{extension}")
+                _, save_seconds = timed(manager.save_to_file, path)
+                loaded, load_seconds = timed(MindMapManager.load_from_file, path)
+                assert loaded is not None and len(loaded.nodes) == count
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                print(f"{count:>10} {name:>8} {save_seconds:>8.2f} {load_seconds:>8.2f} "
+                      f"{count / load_seconds:>12.0f} {size_mb:>8.1f}")
+            lazy, open_seconds = timed(LazyMindMapManager.open, path)
+            assert lazy is not None and len(lazy.nodes) == count
+            lazy.close()
+            print(f"{count:>10} {'mmap':>8} {'':>8} {open_seconds:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+/chat 回复帧基准测试
+模拟模型逐token生成回复，统计每条回复的SSE帧数和字节数：
+逐字符发送（原实现）、逐token发送、按时间/字节合并发送
+
+用法: python test/bench_sse.py [回复字数 ...]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sse import chunk_frame, coalesce_text
+
+
+# 模拟的模型生成速度：每个token约3个字符，间隔2毫秒
+TOKEN_CHARS = 3
+TOKEN_DELAY = 0.002
+
+
+def make_reply(length):
+    """
+    生成中英文混合的回复文本
+
+    Args:
+        length: 字符数
+
+    Returns:
+        回复文本
+    """
+    rng = random.Random(0)
+    alphabet = "火箭发动机燃料设计测试 rocket engine fuel design, test."
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+async def tokens(reply):
+    """
+    按模拟速度逐token产生回复文本
+
+    Args:
+        reply: 回复文本
+    """
+    for i in range(0, len(reply), TOKEN_CHARS):
+        await asyncio.sleep(TOKEN_DELAY)
+        yield reply[i:i + TOKEN_CHARS]
+
+
+async def per_char(reply):
+    """逐字符发送（原实现）"""
+    async for token in tokens(reply):
+        for char in token:
+            yield chunk_frame(char)
+
+
+async def per_token(reply):
+    """逐token发送"""
+    async for token in tokens(reply):
+        yield chunk_frame(token)
+
+
+async def coalesced(reply):
+    """按时间/字节合并发送"""
+    async for text in coalesce_text(tokens(reply)):
+        yield chunk_frame(text)
+
+
+async def measure(strategy, reply):
+    """
+    统计帧数、字节数和耗时
+
+    Returns:
+        (帧数, 字节数, 耗时秒)
+    """
+    frames = 0
+    size = 0
+    start = time.perf_counter()
+    async for frame in strategy(reply):
+        frames += 1
+        size += len(frame.encode("utf-8"))
+    return frames, size, time.perf_counter() - start
+
+
+async def main():
+    lengths = [int(arg) for arg in sys.argv[1:]] or [200, 2000]
+    print(f"{'回复字数':>8} {'方式':>10} {'帧数':>8} {'字节':>10} {'耗时秒':>8}")
+    for length in lengths:
+        reply = make_reply(length)
+        for name, strategy in (("per_char", per_char), ("per_token", per_token), ("coalesced", coalesced)):
+            frames, size, elapsed = await measure(strategy, reply)
+            print(f"{length:>8} {name:>10} {frames:>8} {size:>10} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+视口查询基准测试
+先应用放射状布局，统计首次查询（全量计算子树包围盒）的耗时，
+以及交互编辑（移动一个节点、添加一个节点）后紧接着查询视口的平均耗时
+
+用法: python test/bench_viewport.py [节点数 ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes import MindMapNode
+from nodes.layout import apply_layout, compute_layout
+from nodes.viewport import viewport_query
+from bench_snapshot import build_manager
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    rounds = 200
+    print(f"{'节点数':>8} {'首次查询毫秒':>12} {'移动后查询毫秒':>14} {'添加后查询毫秒':>14}")
+    for count in counts:
+        manager = build_manager(count)
+        apply_layout(manager, compute_layout(manager, "radial"))
+        rng = random.Random(0)
+        node_ids = list(manager.nodes)
+        viewport = (-600, -400, 600, 400)
+
+        start = time.perf_counter()
+        viewport_query(manager, *viewport, zoom=0.5)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            node = manager.nodes[rng.choice(node_ids)]
+            node.set_position(node._x + rng.uniform(-50, 50), node._y + rng.uniform(-50, 50))
+            viewport_query(manager, *viewport, zoom=0.5)
+        move_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        start = time.perf_counter()
+        for i in range(rounds):
+            parent = manager.nodes[rng.choice(node_ids)]
+            node = MindMapNode(title=f"新节点 {i}", parent_id=parent.node_id)
+            node.set_position(parent._x + 20, parent._y + 20)
+            manager.add_node(node)
+            viewport_query(manager, *viewport, zoom=0.5)
+        add_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        print(f"{count:>8} {first_ms:>12.1f} {move_ms:>14.2f} {add_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
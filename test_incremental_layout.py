@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+测试增量放射状布局与全量布局一致
+"""
+
+from nodes.mindmap_node import MindMapNode
+from nodes.mindmap_manager import MindMapManager
+from nodes.layout import IncrementalRadialLayout, apply_layout, compute_layout, place_new_node, radial_layout
+import math
+import random
+
+
+def build_map(seed, roots=1, count=150):
+    """
+    构建随机思维导图
+
+    Args:
+        seed: 随机种子
+        roots: 根节点数
+        count: 非根节点数
+
+    Returns:
+        (思维导图管理器, 随机数生成器)
+    """
+    rng = random.Random(seed)
+    manager = MindMapManager("test_incremental")
+    for i in range(roots):
+        manager.add_node(MindMapNode(title=f"根 {i}"))
+    for i in range(count):
+        manager.add_node(MindMapNode(title=f"节点 {i}", parent_id=rng.choice(list(manager.nodes))))
+    return manager, rng
+
+
+def edit(manager, layout, rng):
+    """随机添加一个节点或删除一个叶子节点，并通知增量布局"""
+    leaves = [node.node_id for node in manager.get_leaf_nodes() if node.parent_id]
+    if rng.random() < 0.7 or not leaves:
+        node = MindMapNode(title="新节点", parent_id=rng.choice(list(manager.nodes)))
+        manager.add_node(node)
+        moved = layout.node_added(node.node_id)
+        assert node.node_id in moved
+    else:
+        leaf_id = rng.choice(leaves)
+        parent_id = manager.nodes[leaf_id].parent_id
+        manager.remove_node(leaf_id)
+        layout.node_removed(leaf_id, parent_id)
+
+
+def polar(x, y):
+    """直角坐标转换为（半径，角度）"""
+    return math.hypot(x, y), math.degrees(math.atan2(y, x))
+
+
+def assert_matches_full_layout(manager, rotated=False):
+    """
+    检查节点位置与全量放射状布局一致
+
+    Args:
+        manager: 思维导图管理器
+        rotated: 是否允许整体相差一个旋转角度（全量布局总是把第一个一级节点放在起始角度）
+    """
+    full = radial_layout(manager)
+    rotation = None
+    for i, node_id in enumerate(full.node_ids):
+        node = manager.nodes[node_id]
+        if not rotated:
+            assert math.isclose(node._x, full.x[i], abs_tol=1e-6) and math.isclose(node._y, full.y[i], abs_tol=1e-6)
+            continue
+        radius, angle = polar(node._x, node._y)
+        full_radius, full_angle = polar(full.x[i], full.y[i])
+        assert math.isclose(radius, full_radius, abs_tol=1e-6)
+        if full_radius < 1e-9:
+            continue
+        difference = (angle - full_angle) % 360
+        if rotation is None:
+            rotation = difference
+        assert min(abs(difference - rotation), 360 - abs(difference - rotation)) < 1e-6
+
+
+def assert_sectors_consistent(manager, layout):
+    """检查每个节点的扇区被子节点按权重无重叠地铺满，且位置位于扇区中间"""
+    for node_id, node in manager.nodes.items():
+        start, span = layout.sector[node_id]
+        children = layout._children(node_id)
+        weight = sum(layout.weight[child_id] for child_id in children) if children else 1
+        assert layout.weight[node_id] == weight
+        current = start
+        for child_id in children:
+            child_start, child_span = layout.sector[child_id]
+            assert math.isclose(child_start, current, abs_tol=1e-6)
+            assert layout.ring[child_id] == layout.ring[node_id] + 1
+            current += child_span
+        if children:
+            assert math.isclose(current, start + span, abs_tol=1e-6)
+        radius = layout.ring[node_id] * layout.radius_step
+        angle = math.radians(start + span / 2)
+        assert math.isclose(node._x, radius * math.cos(angle), abs_tol=1e-6)
+        assert math.isclose(node._y, radius * math.sin(angle), abs_tol=1e-6)
+
+
+def test_incremental_matches_full_layout():
+    """测试每次都从根重新划分时（balance 为无穷大），增量布局与全量布局只相差整体旋转"""
+    for roots in (1, 3):
+        manager, rng = build_map(roots, roots=roots)
+        layout = IncrementalRadialLayout(manager, balance=float("inf"))
+        layout.relayout()
+        assert_matches_full_layout(manager)
+        for _ in range(200):
+            edit(manager, layout, rng)
+            assert_matches_full_layout(manager, rotated=True)
+
+
+def test_incremental_local_updates():
+    """测试默认只局部重新划分时扇区保持一致，且全量重新布局后与全量布局相同"""
+    for roots in (1, 2):
+        manager, rng = build_map(10 + roots, roots=roots)
+        layout = IncrementalRadialLayout(manager)
+        layout.relayout()
+        for _ in range(300):
+            edit(manager, layout, rng)
+        assert_sectors_consistent(manager, layout)
+        layout.relayout()
+        assert_matches_full_layout(manager)
+
+
+def test_incremental_internal_removal():
+    """测试删除中间节点（子节点被提升为根节点）后重新布局"""
+    manager, rng = build_map(20)
+    layout = IncrementalRadialLayout(manager)
+    layout.relayout()
+    node_id = next(node_id for node_id, node in manager.nodes.items() if node.child_ids and node.parent_id)
+    parent_id = manager.nodes[node_id].parent_id
+    manager.remove_node(node_id)
+    layout.node_removed(node_id, parent_id)
+    assert_sectors_consistent(manager, layout)
+    assert_matches_full_layout(manager)
+
+
+def test_restore_keeps_positions():
+    """测试按现有位置重建缓存：不移动节点，与全量布局时的缓存一致（允许整体旋转），之后可继续增量更新"""
+    for roots in (1, 3):
+        manager, rng = build_map(30 + roots, roots=roots)
+        rotated = IncrementalRadialLayout(manager, start_angle=40)
+        rotated.relayout()
+        positions = {node_id: (node._x, node._y) for node_id, node in manager.nodes.items()}
+
+        layout = IncrementalRadialLayout(manager)
+        layout.restore()
+        assert {node_id: (node._x, node._y) for node_id, node in manager.nodes.items()} == positions
+        assert layout.weight == rotated.weight and layout.ring == rotated.ring
+        for node_id, (start, span) in rotated.sector.items():
+            assert math.isclose(layout.sector[node_id][0], start, abs_tol=1e-6)
+            assert math.isclose(layout.sector[node_id][1], span, abs_tol=1e-6)
+        assert layout._write(list(manager.nodes)) == []
+        for _ in range(50):
+            edit(manager, layout, rng)
+        assert_sectors_consistent(manager, layout)
+
+
+def test_place_new_node():
+    """测试非放射状布局中新节点就近放置，只移动新节点"""
+    manager, rng = build_map(40, count=60)
+    for mode in ("tree", "tidy", "force"):
+        apply_layout(manager, compute_layout(manager, mode))
+        positions = {node_id: (node._x, node._y) for node_id, node in manager.nodes.items()}
+        parent = manager.nodes[rng.choice(list(manager.nodes))]
+        siblings = [manager.nodes[child_id] for child_id in parent.child_ids]
+        node = MindMapNode(title="新节点", parent_id=parent.node_id)
+        manager.add_node(node)
+        assert place_new_node(manager, node.node_id, mode) == [node.node_id]
+        assert all((manager.nodes[node_id]._x, manager.nodes[node_id]._y) == position for node_id, position in positions.items())
+        if mode == "force":
+            assert math.isclose(math.hypot(node._x - parent._x, node._y - parent._y), 200)
+        else:
+            assert node._y == parent._y + 150
+            assert all(node._x > sibling._x for sibling in siblings)
+
+
+if __name__ == "__main__":
+    test_incremental_matches_full_layout()
+    test_incremental_local_updates()
+    test_incremental_internal_removal()
+    test_restore_keeps_positions()
+    test_place_new_node()
+    print("=== 测试完成 ===")
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+测试管理器索引在增删、移动和切断连线后与逐节点遍历的结果一致
+"""
+
+from nodes.mindmap_node import MindMapNode
+from nodes.mindmap_manager import MindMapManager
+from nodes.spatial_index import EdgeIndex, segment_intersects_rect, segments_intersect
+from nodes.viewport import SubtreeBounds, get_subtree_bounds, viewport_query
+import random
+
+
+def build_random_map(seed, count=300):
+    """
+    构建随机思维导图：既有宽的分支，也有较深的链
+
+    Args:
+        seed: 随机种子
+        count: 节点数
+
+    Returns:
+        (思维导图管理器, 随机数生成器)
+    """
+    rng = random.Random(seed)
+    manager = MindMapManager("test_indexes")
+    root = MindMapNode(title="root")
+    manager.add_node(root)
+    node_ids = [root.node_id]
+    for i in range(count):
+        # 三分之一的节点接在最新节点下，形成较深的链
+        parent_id = node_ids[-1] if i % 3 == 0 else rng.choice(node_ids)
+        node = MindMapNode(
+            title=f"节点 {i} {rng.choice(['rocket', 'design', '火箭', '设计'])}",
+            content=rng.choice(["engine fuel", "材料 组装", "launch test"]),
+            node_type=rng.choice(["idea", "subtask", "note"]),
+            parent_id=parent_id
+        )
+        node.priority = rng.randint(0, 5)
+        node.set_position(rng.uniform(-1000, 1000), rng.uniform(-1000, 1000))
+        manager.add_node(node)
+        node_ids.append(node.node_id)
+    return manager, rng
+
+
+def mutate(manager, rng, steps=200):
+    """
+    随机执行添加、删除、移动和切断连线操作
+
+    Args:
+        manager: 思维导图管理器
+        rng: 随机数生成器
+        steps: 操作次数
+    """
+    for i in range(steps):
+        node_ids = list(manager.nodes)
+        op = rng.random()
+        if op < 0.4:
+            node = MindMapNode(title=f"新节点 {i}", parent_id=rng.choice(node_ids))
+            node.set_position(rng.uniform(-1000, 1000), rng.uniform(-1000, 1000))
+            manager.add_node(node)
+        elif op < 0.6 and len(node_ids) > 10:
+            manager.remove_node(rng.choice(node_ids))
+        elif op < 0.85:
+            node_id, new_parent_id = rng.sample(node_ids, 2)
+            if not manager.is_ancestor(node_id, new_parent_id):
+                manager.move_node(node_id, new_parent_id)
+        else:
+            children = [node_id for node_id in node_ids if manager.nodes[node_id].parent_id]
+            edges = [(manager.nodes[node_id].parent_id, node_id) for node_id in rng.sample(children, min(3, len(children)))]
+            manager.cut_edges(edges)
+
+
+def brute_depth(manager, node_id):
+    """沿父指针计算深度"""
+    return len(manager.get_node_path(node_id)) - 1
+
+
+def brute_is_ancestor(manager, ancestor_id, node_id):
+    """沿父指针判断祖先关系"""
+    current = manager.nodes[node_id].parent_id
+    while current in manager.nodes:
+        if current == ancestor_id:
+            return True
+        current = manager.nodes[current].parent_id
+    return False
+
+
+def check_tree_index(manager, rng):
+    """检查深度、最大深度和祖先判断"""
+    node_ids = list(manager.nodes)
+    depths = {node_id: brute_depth(manager, node_id) for node_id in node_ids}
+    for node_id, depth in depths.items():
+        assert manager.get_node_depth(node_id) == depth
+    assert manager.get_max_depth() == max(depths.values())
+    for _ in range(500):
+        ancestor_id, node_id = rng.choice(node_ids), rng.choice(node_ids)
+        assert manager.is_ancestor(ancestor_id, node_id) == brute_is_ancestor(manager, ancestor_id, node_id)
+
+
+def check_text_index(manager):
+    """检查倒排索引的标题和内容查询与逐节点子串匹配一致"""
+    nodes = list(manager.nodes.values())
+    for query in ["rocket", "ROCKET", "设计", "节点 1", "fuel", "材料 组", "e", "新"]:
+        for case_sensitive in (False, True):
+            def matches(text):
+                return query in text if case_sensitive else query.lower() in text.lower()
+            expected = [node.node_id for node in nodes if matches(node.title)]
+            found = [node.node_id for node in manager.find_nodes_by_title(query, case_sensitive)]
+            assert found == expected, query
+            expected = [node.node_id for node in nodes if matches(node.content)]
+            found = [node.node_id for node in manager.find_nodes_by_content(query, case_sensitive)]
+            assert found == expected, query
+
+
+def check_attribute_index(manager):
+    """检查类型、优先级、叶子和根节点查询与逐节点扫描一致"""
+    nodes = list(manager.nodes.values())
+    for node_type in ["idea", "subtask", "note", "missing"]:
+        expected = [node.node_id for node in nodes if node.node_type == node_type]
+        assert [node.node_id for node in manager.find_nodes_by_type(node_type)] == expected
+    by_priority = sorted(nodes, key=lambda node: -node.priority)
+    for k in (1, 10, len(nodes) + 1):
+        assert [node.node_id for node in manager.get_top_priority_nodes(k)] == [node.node_id for node in by_priority[:k]]
+    assert [node.node_id for node in manager.get_leaf_nodes()] == [node.node_id for node in nodes if node.is_leaf()]
+    assert {node.node_id for node in manager.get_root_nodes()} == {node.node_id for node in nodes if node.is_root()}
+    assert manager.get_statistics()["leaf_nodes"] == sum(1 for node in nodes if node.is_leaf())
+
+
+def random_rects(rng, count=30):
+    """生成随机查询矩形（含覆盖整张导图的矩形）"""
+    rects = [(-2000, -2000, 2000, 2000)]
+    for _ in range(count):
+        x, y = rng.uniform(-1200, 1000), rng.uniform(-1200, 1000)
+        rects.append((x, y, x + rng.uniform(0, 600), y + rng.uniform(0, 600)))
+    return rects
+
+
+def check_spatial_index(manager, rng):
+    """检查矩形查询与逐节点判断一致"""
+    for min_x, min_y, max_x, max_y in random_rects(rng):
+        expected = [
+            node.node_id for node in manager.nodes.values()
+            if min_x <= node.position["x"] <= max_x and min_y <= node.position["y"] <= max_y
+        ]
+        found = [node.node_id for node in manager.find_nodes_in_rect(min_x, min_y, max_x, max_y)]
+        assert found == expected
+
+
+def edge_endpoints(manager):
+    """所有父子连线及其两端坐标"""
+    edges = []
+    for node in manager.nodes.values():
+        parent = manager.nodes.get(node.parent_id)
+        if parent is not None:
+            points = (parent.position["x"], parent.position["y"], node.position["x"], node.position["y"])
+            edges.append(((parent.node_id, node.node_id), points))
+    return edges
+
+
+def check_edge_index(manager, rng):
+    """检查连线的矩形查询和折线切割查询与逐条判断一致"""
+    edges = edge_endpoints(manager)
+    for rect in random_rects(rng):
+        expected = {edge for edge, points in edges if segment_intersects_rect(*points, *rect)}
+        assert set(manager.find_edges_in_rect(*rect)) == expected
+    for _ in range(20):
+        points = [(rng.uniform(-1000, 1000), rng.uniform(-1000, 1000)) for _ in range(rng.randint(2, 5))]
+        expected = {
+            edge for edge, endpoints in edges
+            if any(segments_intersect(*a, *b, *endpoints) for a, b in zip(points, points[1:]))
+        }
+        found = manager.find_crossed_edges(points)
+        assert len(found) == len(set(found)) and set(found) == expected
+
+
+def test_tree_index():
+    """测试树索引在随机修改后与父指针一致"""
+    for seed in range(3):
+        manager, rng = build_random_map(seed)
+        check_tree_index(manager, rng)
+        mutate(manager, rng)
+        check_tree_index(manager, rng)
+
+
+def test_tree_index_deep_chain():
+    """测试深链上的增量插入只局部重标号，不退化为全量重建"""
+    manager = MindMapManager("test_chain")
+    parent_id = None
+    chain = []
+    for i in range(2000):
+        node = MindMapNode(title=f"链节点 {i}", parent_id=parent_id)
+        manager.add_node(node)
+        parent_id = node.node_id
+        chain.append(node.node_id)
+        # 同时在根节点下追加兄弟节点
+        manager.add_node(MindMapNode(title=f"分支 {i}", parent_id=chain[0]))
+        assert not manager._tree._labels_dirty
+    assert manager.get_max_depth() == len(chain) - 1
+    assert manager.is_ancestor(chain[0], chain[-1])
+    assert manager.is_ancestor(chain[100], chain[1500])
+    assert not manager.is_ancestor(chain[1500], chain[100])
+
+
+def test_text_index():
+    """测试全文倒排索引在节点增删和标题、内容修改后保持一致"""
+    manager, rng = build_random_map(0)
+    manager.enable_text_index()
+    check_text_index(manager)
+    mutate(manager, rng)
+    for node in rng.sample(list(manager.nodes.values()), 50):
+        node.update_title(f"设计 Rocket {rng.randint(0, 99)}")
+        node.update_content(rng.choice(["", "fuel 材料", "Launch"]))
+    check_text_index(manager)
+
+
+def test_attribute_index():
+    """测试属性索引在节点增删移动和类型、优先级修改后保持一致"""
+    manager, rng = build_random_map(1)
+    check_attribute_index(manager)
+    mutate(manager, rng)
+    for node in rng.sample(list(manager.nodes.values()), 50):
+        node.node_type = rng.choice(["idea", "note", "task"])
+        node.priority = rng.randint(-2, 8)
+    check_attribute_index(manager)
+
+    focus = rng.choice(list(manager.nodes))
+    assert manager.set_focus_node(focus)
+    assert manager.get_focus_node().node_id == focus
+    manager.remove_node(focus)
+    assert manager.get_focus_node() is None
+
+
+def test_spatial_index():
+    """测试网格空间索引在节点增删和单个、批量位置修改后保持一致"""
+    manager, rng = build_random_map(2)
+    check_spatial_index(manager, rng)
+    mutate(manager, rng)
+    for node in rng.sample(list(manager.nodes.values()), 30):
+        node.set_position(rng.uniform(-1500, 1500), rng.uniform(-1500, 1500))
+    check_spatial_index(manager, rng)
+
+    # 少量节点逐个更新，超过一半节点时整体重建
+    for count in (10, len(manager.nodes)):
+        node_ids = rng.sample(list(manager.nodes), count)
+        xs = [rng.uniform(-1000, 1000) for _ in node_ids]
+        ys = [rng.uniform(-1000, 1000) for _ in node_ids]
+        manager.set_positions(node_ids, xs, ys)
+        check_spatial_index(manager, rng)
+
+
+def test_viewport_query():
+    """测试视口查询返回视口内的节点，折叠的子树汇总为聚合节点"""
+    manager, rng = build_random_map(3)
+    min_x, min_y, max_x, max_y = -400, -400, 400, 400
+    in_view = {node.node_id for node in manager.find_nodes_in_rect(min_x - 10, min_y - 10, max_x + 10, max_y + 10)}
+
+    # 放大到足够大时不做汇总
+    result = viewport_query(manager, min_x, min_y, max_x, max_y, zoom=1e9, margin=10)
+    assert {node["node_id"] for node in result["nodes"]} == in_view
+    assert result["aggregates"] == []
+    assert result["total"] == len(manager.nodes)
+    for edge in result["edges"]:
+        assert manager.nodes[edge["target"]].parent_id == edge["source"]
+
+    # 折叠一个有后代落在视口内的节点
+    collapsed = next(
+        node for node in manager.nodes.values()
+        if node.child_ids and any(child.node_id in in_view for child in manager.get_subtree(node.node_id)[1:])
+    )
+    collapsed.set_expanded(False)
+    hidden = {node.node_id for node in manager.get_subtree(collapsed.node_id)[1:]}
+    result = viewport_query(manager, min_x, min_y, max_x, max_y, zoom=1e9, margin=10)
+    # 折叠的节点本身以聚合节点返回
+    assert {node["node_id"] for node in result["nodes"]} == in_view - hidden - {collapsed.node_id}
+    aggregate = next(item for item in result["aggregates"] if item["id"] == collapsed.node_id)
+    assert aggregate["collapsed"] and aggregate["count"] == len(hidden)
+
+
+def check_subtree_bounds(manager):
+    """检查增量维护的子树包围盒与全量计算一致"""
+    bounds = get_subtree_bounds(manager)
+    fresh = SubtreeBounds(manager)
+    for node_id in manager.nodes:
+        assert bounds.get(node_id) == fresh.get(node_id)
+        assert bounds.count(node_id) == fresh.count(node_id)
+    total, exact = bounds.total, fresh.total
+    # 增量维护的整图包围盒可能偏大，但必须包含所有节点
+    assert total[0] <= exact[0] and total[1] <= exact[1] and total[2] >= exact[2] and total[3] >= exact[3]
+
+
+def test_subtree_bounds_incremental():
+    """测试两次视口查询之间的编辑只让祖先链失效，包围盒与全量计算一致"""
+    for seed in range(3):
+        manager, rng = build_random_map(10 + seed)
+        viewport_query(manager, -500, -500, 500, 500)
+        check_subtree_bounds(manager)
+        for _ in range(20):
+            mutate(manager, rng, steps=10)
+            for node in rng.sample(list(manager.nodes.values()), 5):
+                node.set_position(rng.uniform(-1500, 1500), rng.uniform(-1500, 1500))
+            viewport_query(manager, -500, -500, 500, 500, zoom=rng.uniform(0.01, 2))
+            check_subtree_bounds(manager)
+        node_ids = list(manager.nodes)
+        manager.set_positions(node_ids, [rng.uniform(-1000, 1000) for _ in node_ids], [rng.uniform(-1000, 1000) for _ in node_ids])
+        check_subtree_bounds(manager)
+
+
+def test_edge_index():
+    """测试连线空间索引在节点增删移动、切断连线和位置修改后保持一致"""
+    manager, rng = build_random_map(4)
+    check_edge_index(manager, rng)
+    mutate(manager, rng)
+    for node in rng.sample(list(manager.nodes.values()), 30):
+        node.set_position(rng.uniform(-1500, 1500), rng.uniform(-1500, 1500))
+    check_edge_index(manager, rng)
+    node_ids = list(manager.nodes)
+    manager.set_positions(node_ids, [rng.uniform(-1000, 1000) for _ in node_ids], [rng.uniform(-1000, 1000) for _ in node_ids])
+    check_edge_index(manager, rng)
+
+
+def test_edge_walk():
+    """测试网格遍历到达终点网格，且不漏掉线段穿过内部的网格（含经过网格线和角点的线段）"""
+    rng = random.Random(7)
+    walker = EdgeIndex.__new__(EdgeIndex)
+    walker.cell_size = size = 256.0
+    for i in range(2000):
+        # 一半的端点取网格间距的整数倍，经常恰好落在网格线或角点上
+        if i % 2:
+            x1, y1, x2, y2 = (rng.randint(-20, 20) * size / 2 for _ in range(4))
+        else:
+            x1, y1, x2, y2 = (rng.uniform(-5000, 5000) for _ in range(4))
+        cells = walker._walk(x1, y1, x2, y2)
+        assert cells[0] == (int(x1 // size), int(y1 // size))
+        assert cells[-1] == (int(x2 // size), int(y2 // size))
+        assert len(cells) <= 3 * (abs(cells[-1][0] - cells[0][0]) + abs(cells[-1][1] - cells[0][1])) + 3
+        visited = set(cells)
+        for cell_x in range(int(min(x1, x2) // size), int(max(x1, x2) // size) + 1):
+            for cell_y in range(int(min(y1, y2) // size), int(max(y1, y2) // size) + 1):
+                inner = (cell_x * size + 1e-6, cell_y * size + 1e-6, (cell_x + 1) * size - 1e-6, (cell_y + 1) * size - 1e-6)
+                if segment_intersects_rect(x1, y1, x2, y2, *inner):
+                    assert (cell_x, cell_y) in visited
+
+
+def test_edge_index_grid_aligned():
+    """测试长连线和端点落在网格线、角点上时连线查询与逐条判断一致"""
+    rng = random.Random(8)
+    manager = MindMapManager("test_grid")
+    root = MindMapNode(title="root")
+    manager.add_node(root)
+    node_ids = [root.node_id]
+    for i in range(300):
+        node = MindMapNode(title=f"节点 {i}", parent_id=rng.choice(node_ids))
+        node.set_position(rng.randint(-8, 8) * 128.0, rng.randint(-8, 8) * 128.0)
+        manager.add_node(node)
+        node_ids.append(node.node_id)
+    edges = edge_endpoints(manager)
+    for _ in range(200):
+        points = [(rng.randint(-8, 8) * 128.0, rng.randint(-8, 8) * 128.0) for _ in range(rng.randint(2, 4))]
+        expected = {
+            edge for edge, endpoints in edges
+            if any(segments_intersect(*a, *b, *endpoints) for a, b in zip(points, points[1:]))
+        }
+        found = manager.find_crossed_edges(points)
+        assert len(found) == len(set(found)) and set(found) == expected
+    for _ in range(100):
+        x, y = rng.randint(-10, 8) * 128.0, rng.randint(-10, 8) * 128.0
+        rect = (x, y, x + rng.randint(0, 4) * 128.0, y + rng.randint(0, 4) * 128.0)
+        expected = {edge for edge, endpoints in edges if segment_intersects_rect(*endpoints, *rect)}
+        assert set(manager.find_edges_in_rect(*rect)) == expected
+    check_edge_index(manager, rng)
+
+    # 长的斜向连线只登记在经过的网格中，而不是整个包围盒
+    parent = MindMapNode(title="far")
+    parent.set_position(-10000, -10000)
+    manager.add_node(parent)
+    child = MindMapNode(title="far child", parent_id=parent.node_id)
+    child.set_position(10000, 9000)
+    manager.add_node(child)
+    edge_index = manager._edges
+    cells = edge_index.edge_cells[manager._table.get(child.node_id)]
+    assert len(cells) <= 3 * (20000 + 19000) / edge_index.cell_size
+
+
+def test_child_added_before_parent():
+    """测试子节点先于父节点加入时，父节点加入后收养子节点并登记连线"""
+    for batch in (False, True):
+        manager, rng = build_random_map(9, count=50)
+        get_subtree_bounds(manager)
+        root_id = manager.root_nodes[0]
+        parent = MindMapNode(title="晚到的父节点", parent_id=root_id)
+        parent.set_position(-600, -600)
+        children = []
+        for i in range(3):
+            child = MindMapNode(title=f"先到的子节点 {i}", parent_id=parent.node_id)
+            child.set_position(600, 400 + i * 100)
+            manager.add_node(child)
+            children.append(child.node_id)
+        if batch:
+            manager.add_nodes([parent])
+        else:
+            manager.add_node(parent)
+
+        assert parent.child_ids == children
+        assert {node.node_id for node in manager.get_subtree(parent.node_id)} == {parent.node_id, *children}
+        for child_id in children:
+            assert manager.get_node_depth(child_id) == manager.get_node_depth(parent.node_id) + 1
+            assert manager.is_ancestor(root_id, child_id)
+        crossed = manager.find_crossed_edges([(0, -1000), (0, 1000)])
+        assert {(parent.node_id, child_id) for child_id in children} <= set(crossed)
+        check_tree_index(manager, rng)
+        check_edge_index(manager, rng)
+        check_subtree_bounds(manager)
+
+
+def test_children_read_only():
+    """测试子节点列表只能通过 add_child / remove_child 修改，不会绕过索引"""
+    manager, rng = build_random_map(6, count=30)
+    node = next(node for node in manager.nodes.values() if node.child_ids)
+    children = node.children
+    children.append("missing")
+    assert "missing" not in node.child_ids
+    try:
+        node.children = []
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("children 不应可直接赋值")
+    check_tree_index(manager, rng)
+    check_edge_index(manager, rng)
+
+
+def test_cut_crossed_edges():
+    """测试切割轨迹切断的连线与切割前查询到的连线一致，子树保持不变"""
+    manager, rng = build_random_map(5)
+    points = [(-1000, 0), (0, 50), (1000, -50)]
+    crossed = manager.find_crossed_edges(points)
+    assert crossed
+    subtrees = {child_id: {node.node_id for node in manager.get_subtree(child_id)} for _, child_id in crossed}
+    cut_ids = manager.cut_crossed_edges(points)
+    assert cut_ids == [child_id for _, child_id in crossed]
+    for child_id in cut_ids:
+        assert manager.nodes[child_id].is_root() and child_id in manager.root_nodes
+        assert manager.get_node_depth(child_id) == 0
+        assert {node.node_id for node in manager.get_subtree(child_id)} <= subtrees[child_id]
+    assert manager.find_crossed_edges(points) == []
+    check_tree_index(manager, rng)
+    check_attribute_index(manager)
+    check_edge_index(manager, rng)
+
+
+if __name__ == "__main__":
+    test_tree_index()
+    test_tree_index_deep_chain()
+    test_text_index()
+    test_attribute_index()
+    test_spatial_index()
+    test_viewport_query()
+    test_subtree_bounds_incremental()
+    test_edge_index()
+    test_edge_walk()
+    test_edge_index_grid_aligned()
+    test_child_added_before_parent()
+    test_children_read_only()
+    test_cut_crossed_edges()
+    print("=== 测试完成 ===")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+测试操作日志：正常关闭、异常退出（日志末尾写了一半）和压缩中断后都能恢复出相同的导图
+"""
+
+from nodes.mindmap_node import MindMapNode
+from nodes.mindmap_manager import MindMapManager
+from nodes.snapshot import SNAPSHOT_EXTENSION
+import os
+import random
+import shutil
+import tempfile
+
+
+def comparable(manager):
+    """
+    导出导图内容，去掉重放时会变化的修改时间
+
+    Args:
+        manager: 思维导图管理器
+
+    Returns:
+        导图字典
+    """
+    data = manager.export_to_dict()
+    data.pop("created_at")
+    data.pop("updated_at")
+    for node in data["nodes"].values():
+        node.pop("updated_at")
+    return data
+
+
+def edit(manager, rng, steps=400):
+    """
+    随机执行会被记录到日志的修改操作
+
+    Args:
+        manager: 思维导图管理器
+        rng: 随机数生成器
+        steps: 操作次数
+    """
+    for step in range(steps):
+        node_ids = list(manager.nodes)
+        op = rng.random()
+        if op < 0.3 or not node_ids:
+            parent_id = rng.choice(node_ids) if node_ids and rng.random() < 0.9 else None
+            manager.add_node(MindMapNode(f"节点 {step}", parent_id=parent_id, node_type=rng.choice(["idea", "note"])))
+        elif op < 0.35:
+            manager.add_nodes([MindMapNode(f"批量 {step}-{i}", parent_id=rng.choice(node_ids)) for i in range(3)])
+        elif op < 0.42:
+            manager.remove_node(rng.choice(node_ids))
+        elif op < 0.5:
+            manager.move_node(rng.choice(node_ids), rng.choice(node_ids + [None]))
+        elif op < 0.53:
+            children = [node_id for node_id in node_ids if manager.nodes[node_id].parent_id]
+            if children:
+                child_id = rng.choice(children)
+                manager.cut_edges([(manager.nodes[child_id].parent_id, child_id)])
+        elif op < 0.58:
+            manager.set_focus_node(rng.choice(node_ids))
+        elif op < 0.6:
+            manager.clear_focus()
+        else:
+            node = manager.nodes[rng.choice(node_ids)]
+            field = rng.randrange(8)
+            if field == 0:
+                node.update_title(f"标题 {step}")
+            elif field == 1:
+                node.update_content(f"内容 {step}")
+            elif field == 2:
+                node.priority = rng.randint(0, 5)
+            elif field == 3:
+                node.set_style(color=rng.choice(["red", "blue"]), icon=rng.choice([None, "🚀"]))
+            elif field == 4:
+                node.set_position(rng.uniform(-100, 100), rng.uniform(-100, 100))
+            elif field == 5:
+                node.set_expanded(rng.random() < 0.5)
+            elif field == 6:
+                node.is_visible = rng.random() < 0.5
+            else:
+                node.update_metadata({"step": step})
+
+
+def crash_copy(manager, path, directory):
+    """
+    模拟进程在日志写入磁盘后异常退出：把此刻的快照和日志文件复制到另一个目录
+
+    Args:
+        manager: 挂接了日志的管理器
+        path: 快照文件路径
+        directory: 复制到的目录
+
+    Returns:
+        复制后的快照文件路径
+    """
+    journal = manager._journal
+    journal.flush()
+    if journal._compactor is not None:
+        journal._compactor.join()
+    copied = os.path.join(directory, os.path.basename(path))
+    for suffix in ("", ".log", ".log.1"):
+        if os.path.exists(path + suffix):
+            shutil.copyfile(path + suffix, copied + suffix)
+    return copied
+
+
+def test_journal_reopen():
+    """测试正常关闭后重新打开，包括日志自动压缩"""
+    for seed, threshold in ((0, 0), (1, 50)):
+        rng = random.Random(seed)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "map" + SNAPSHOT_EXTENSION)
+            manager = MindMapManager.open_journaled(path, mindmap_id="journal", compact_threshold=threshold, flush_interval=0.001)
+            edit(manager, rng)
+            expected = comparable(manager)
+            manager.close_journal()
+
+            reopened = MindMapManager.open_journaled(path)
+            assert comparable(reopened) == expected
+            reopened.close_journal()
+            assert not os.path.exists(path + ".log.1")
+            assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_journal_unclean_close():
+    """测试异常退出后恢复：丢弃末尾写了一半的记录，恢复后继续追加的记录也能重放"""
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as crash_directory:
+        path = os.path.join(directory, "map" + SNAPSHOT_EXTENSION)
+        manager = MindMapManager.open_journaled(path, mindmap_id="journal", compact_threshold=100, flush_interval=0.001)
+        edit(manager, rng)
+        expected = comparable(manager)
+        crashed = crash_copy(manager, path, crash_directory)
+        manager.close_journal()
+        with open(crashed + ".log", "ab") as f:
+            f.write(b'{"s":999999,"t":1,"op":"add","node":{"title"')
+
+        recovered = MindMapManager.open_journaled(crashed)
+        assert comparable(recovered) == expected
+        edit(recovered, rng, steps=50)
+        expected = comparable(recovered)
+        recovered.close_journal()
+
+        reopened = MindMapManager.open_journaled(crashed)
+        assert comparable(reopened) == expected
+        reopened.close_journal()
+
+
+def test_journal_interrupted_compaction():
+    """测试压缩中断（冻结日志未合并到快照）后恢复并重新压缩"""
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as crash_directory:
+        path = os.path.join(directory, "map" + SNAPSHOT_EXTENSION)
+        manager = MindMapManager.open_journaled(path, mindmap_id="journal", compact_threshold=0, flush_interval=0.001)
+        edit(manager, rng)
+        expected = comparable(manager)
+        crashed = crash_copy(manager, path, crash_directory)
+        manager.close_journal()
+        # 日志已冻结，但新快照还没写入
+        os.replace(crashed + ".log", crashed + ".log.1")
+
+        recovered = MindMapManager.open_journaled(crashed)
+        assert comparable(recovered) == expected
+        recovered.close_journal()
+        assert not os.path.exists(crashed + ".log.1")
+
+        reopened = MindMapManager.open_journaled(crashed)
+        assert comparable(reopened) == expected
+        reopened.close_journal()
+
+
+def test_failed_snapshot_write():
+    """测试快照写入失败时保留原快照，并删除临时文件"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map" + SNAPSHOT_EXTENSION)
+        manager = MindMapManager.open_journaled(path, mindmap_id="journal", flush_interval=0.001)
+        edit(manager, random.Random(4), steps=50)
+        journal = manager._journal
+        # 先写完日志，替换 fsync 期间后台线程没有待写入的记录
+        journal.flush()
+        with open(path, "rb") as f:
+            original = f.read()
+
+        fsync = os.fsync
+
+        def failing_fsync(fd):
+            raise OSError("disk full")
+
+        os.fsync = failing_fsync
+        try:
+            journal._replace_snapshot(b"broken")
+        except OSError:
+            pass
+        else:
+            raise AssertionError("写入失败应抛出异常")
+        finally:
+            os.fsync = fsync
+        with open(path, "rb") as f:
+            assert f.read() == original
+        assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+        manager.close_journal()
+
+
+if __name__ == "__main__":
+    test_journal_reopen()
+    test_journal_unclean_close()
+    test_journal_interrupted_compaction()
+    test_failed_snapshot_write()
+    print("=== 测试完成 ===")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+测试多导图存储的 LRU 淘汰、写盘和重新加载
+"""
+
+from map_store import MapStore
+from nodes.mindmap_node import MindMapNode
+from nodes.mindmap_manager import MindMapManager
+import nodes.mindmap_manager as mindmap_manager
+import os
+import tempfile
+import threading
+
+
+def add_nodes(manager, count):
+    """在导图中添加一条包含 count 个节点的链"""
+    parent_id = None
+    for i in range(count):
+        node = MindMapNode(title=f"节点 {i}", parent_id=parent_id)
+        manager.add_node(node)
+        parent_id = node.node_id
+
+
+def titles(manager):
+    """导图中所有节点的标题"""
+    return [node.title for node in manager.nodes.values()]
+
+
+def test_spill_and_reload():
+    """测试超出数量预算的导图写入磁盘，再次访问时加载出相同内容，未修改的导图不重复写入"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = MapStore(directory, max_maps=2)
+        first = store.get_or_create("session/1")
+        add_nodes(first, 20)
+        expected = first.export_to_dict()
+        store.get_or_create("session 2")
+        store.get_or_create("session-3")
+        assert store.hot_map_ids() == ["session 2", "session-3"]
+        assert os.path.exists(store._path("session/1"))
+        assert store.get_stats()["evictions"] == 1
+
+        reloaded = store.get("session/1")
+        assert reloaded is not first
+        assert reloaded.export_to_dict() == expected
+        assert not reloaded.dirty
+        assert store.get_stats()["loads"] == 1
+
+        # 未修改的导图再次被淘汰时不重写磁盘
+        writes = store.writes
+        store.get("session 2")
+        store.get("session-3")
+        assert "session/1" not in store.hot_map_ids()
+        assert store.writes == writes + 1  # 只有新建的 "session 2" 需要写入
+
+        # 修改后再次淘汰，重新加载得到修改后的内容
+        manager = store.get("session/1")
+        manager.get_root_nodes()[0].update_title("修改后")
+        store.get("session 2")
+        store.get("session-3")
+        assert titles(store.get("session/1"))[0] == "修改后"
+        assert store.get("missing") is None
+
+
+def test_node_budget():
+    """测试按节点数预算淘汰（释放或访问导图时按其当前节点数计入预算），至少保留最近访问的导图"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = MapStore(directory, max_nodes=30)
+        add_nodes(store.acquire("a", create=True), 20)
+        store.release("a")
+        add_nodes(store.acquire("b", create=True), 20)
+        assert store.hot_map_ids() == ["a", "b"]
+        assert store.node_count() == 20
+        # 释放时按修改后的节点数检查预算
+        store.release("b")
+        assert store.hot_map_ids() == ["b"]
+        assert store.node_count() == 20
+        add_nodes(store.get("b"), 40)
+        store.get("b")
+        assert store.hot_map_ids() == ["b"]
+        assert len(store.get("a").nodes) == 20
+        assert store.node_count() == 20
+
+
+def test_pinned_map_not_evicted():
+    """测试被固定的导图不会被淘汰，释放后才写入磁盘，期间的修改不会丢失"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = MapStore(directory, max_maps=1)
+        manager = store.acquire("a", create=True)
+        add_nodes(manager, 5)
+        store.get_or_create("b")
+        store.get_or_create("c")
+        assert store.hot_map_ids() == ["a", "c"]
+        manager.get_root_nodes()[0].update_title("固定期间修改")
+        store.release("a")
+        store.get("c")
+        assert store.hot_map_ids() == ["c"]
+        assert titles(store.get("a"))[0] == "固定期间修改"
+
+
+def test_spill_outside_lock():
+    """测试写盘期间其他导图的访问不被阻塞，被淘汰导图的访问等待写盘完成后加载"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = MapStore(directory, max_maps=2)
+        add_nodes(store.get_or_create("a"), 5)
+        store.get_or_create("b")
+        original = mindmap_manager.dump_snapshot
+        started = threading.Event()
+        proceed = threading.Event()
+
+        def slow_dump(*args, **kwargs):
+            started.set()
+            proceed.wait(5)
+            original(*args, **kwargs)
+
+        mindmap_manager.dump_snapshot = slow_dump
+        try:
+            spiller = threading.Thread(target=store.get_or_create, args=("c",))
+            spiller.start()
+            assert started.wait(5)
+            # "a" 正在写盘，其他导图照常访问
+            assert store.get("b") is not None
+            assert store.hot_map_ids() == ["c", "b"]
+            loader = threading.Thread(target=store.get, args=("a",))
+            loader.start()
+            loader.join(0.05)
+            assert loader.is_alive()
+            proceed.set()
+            spiller.join(5)
+            loader.join(5)
+        finally:
+            mindmap_manager.dump_snapshot = original
+        assert store.get_stats()["loads"] == 1
+        assert len(store.get("a").nodes) == 5
+
+
+def test_failed_write_keeps_map():
+    """测试写盘失败时导图留在内存中，磁盘上的旧快照不被破坏，也不留下临时文件"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = MapStore(directory, max_maps=1)
+        add_nodes(store.get_or_create("a"), 5)
+        store.get_or_create("b")
+        assert os.path.exists(store._path("a"))
+
+        manager = store.get("a")
+        manager.get_root_nodes()[0].update_title("未写入")
+        original = mindmap_manager.dump_snapshot
+
+        def failing_dump(*args, **kwargs):
+            raise OSError("disk full")
+
+        mindmap_manager.dump_snapshot = failing_dump
+        try:
+            store.get("b")
+        finally:
+            mindmap_manager.dump_snapshot = original
+        assert "a" in store.hot_map_ids()
+        assert store.get("a") is manager
+        # 写入失败的临时文件被删除
+        assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+        assert titles(MindMapManager.load_from_file(store._path("a")))[0] == "节点 0"
+
+        store.flush()
+        assert titles(MindMapManager.load_from_file(store._path("a")))[0] == "未写入"
+
+
+if __name__ == "__main__":
+    test_spill_and_reload()
+    test_node_budget()
+    test_pinned_map_not_evicted()
+    test_spill_outside_lock()
+    test_failed_write_keeps_map()
+    print("=== 测试完成 ===")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试会话摘要：摘要生成期间会话被清空或待摘要消息已被并入时，迟到的摘要被丢弃
+"""
+
+from message_manager import MessageManager
+
+
+def build_manager(session_id="s", count=10):
+    """
+    构建窗口只能容纳最新一条消息的消息管理器，添加的消息依次移入待摘要列表
+
+    Args:
+        session_id: 会话ID
+        count: 消息数
+
+    Returns:
+        消息管理器
+    """
+    manager = MessageManager(token_budget=1, summary_batch_tokens=1)
+    for i in range(count):
+        manager.add_message(session_id, "user" if i % 2 == 0 else "assistant", f"消息 {i}")
+    return manager
+
+
+def test_summary_applied():
+    """测试正常生成的摘要被采用，并移除已并入的待摘要消息"""
+    manager = build_manager()
+    generation, previous, batch = manager.get_summary_batch("s", max_tokens=12)
+    assert previous == "" and 0 < len(batch) < 9
+    assert manager.set_summary("s", "摘要", generation, batch)
+    assert manager.get_summary("s") == "摘要"
+    _, _, rest = manager.get_summary_batch("s")
+    assert [message.seq for message in rest] == list(range(batch[-1].seq + 1, 10))
+
+
+def test_summary_dropped_after_clear():
+    """测试摘要生成期间会话被清空（或清空后又有新消息）时丢弃摘要"""
+    manager = build_manager()
+    generation, _, batch = manager.get_summary_batch("s")
+    manager.clear_conversation("s")
+    for i in range(len(batch) + 1):
+        manager.add_message("s", "user", f"新消息 {i}")
+    assert not manager.set_summary("s", "旧摘要", generation, batch)
+    assert manager.get_summary("s") == ""
+    _, _, pending = manager.get_summary_batch("s")
+    assert [message.content for message in pending] == [f"新消息 {i}" for i in range(len(batch))]
+
+
+def test_summary_dropped_when_range_changed():
+    """测试同一批待摘要消息已被另一份摘要并入时丢弃迟到的摘要"""
+    manager = build_manager()
+    generation, _, batch = manager.get_summary_batch("s", max_tokens=12)
+    assert manager.set_summary("s", "第一份", generation, batch)
+    assert not manager.set_summary("s", "第二份", generation, batch)
+    assert manager.get_summary("s") == "第一份"
+
+
+def test_message_seq():
+    """测试消息序号按添加顺序递增，可用于从历史中排除指定消息"""
+    manager = MessageManager()
+    seqs = [manager.add_message("s", "user", f"消息 {i}") for i in range(3)]
+    assert seqs == sorted(set(seqs))
+    history = [message for message in manager.get_context_messages("s") if message.seq != seqs[1]]
+    assert [message.content for message in history] == ["消息 0", "消息 2"]
+
+
+if __name__ == "__main__":
+    test_summary_applied()
+    test_summary_dropped_after_clear()
+    test_summary_dropped_when_range_changed()
+    test_message_seq()
+    print("=== 测试完成 ===")
@@ -5,6 +5,7 @@
 
 from nodes.mindmap_node import MindMapNode
 from nodes.mindmap_manager import MindMapManager
+from nodes.layout import compute_layout
 import math
 
 def test_radial_layout():
@@ -71,6 +72,10 @@ def test_radial_layout():
     print(f"   放射半径: {radius}px")
     print()
     
+    # 服务端布局引擎计算的坐标
+    layout = compute_layout(manager, "radial", radius_step=radius)
+    assert layout.get_position(main_node.node_id) == {"x": 0, "y": 0}
+    
     for i, child in enumerate(child_nodes):
         # 计算角度（从顶部开始，顺时针）
         angle = (i * angle_step - 90) * (math.pi / 180)
@@ -78,6 +83,8 @@ def test_radial_layout():
         # 计算位置
         x = math.cos(angle) * radius
         y = math.sin(angle) * radius
+        position = layout.get_position(child.node_id)
+        assert math.isclose(position["x"], x, abs_tol=1e-6) and math.isclose(position["y"], y, abs_tol=1e-6)
         
         focus_status = "🎯 焦点" if child == suggested_focus_node else "普通"
         print(f"   子节点 {i+1}: {child.title} - {focus_status}")
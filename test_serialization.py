@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试思维导图在 JSON、NDJSON 和二进制快照格式下保存、加载后内容不变
+"""
+
+from nodes.mindmap_node import MindMapNode
+from nodes.mindmap_manager import MindMapManager
+from nodes.lazy_manager import LazyMindMapManager
+from nodes.snapshot import SNAPSHOT_EXTENSION, dump_snapshot, iter_snapshot_export
+import io
+import os
+import random
+import tempfile
+
+
+def build_map(count=500):
+    """
+    构建包含各类字段的测试思维导图：多个根节点、兄弟关系、样式、元数据、折叠状态和焦点
+
+    Args:
+        count: 节点数
+
+    Returns:
+        思维导图管理器
+    """
+    rng = random.Random(7)
+    manager = MindMapManager("test_serialization")
+    manager.metadata = {"topic": "火箭", "tags": ["a", 1]}
+    node_ids = []
+    for i in range(count):
+        parent_id = rng.choice(node_ids) if node_ids and rng.random() < 0.95 else None
+        node = MindMapNode(
+            title=rng.choice(["Rocket 设计", "材料", "", "Σ \"quoted\" \\n", "tab\tnul\x00"]),
+            content="内容 " * rng.randint(0, 3),
+            node_type=rng.choice(["idea", "subtask", "note"]),
+            parent_id=parent_id,
+            metadata={"index": i, "名称": "值"} if i % 5 == 0 else None
+        )
+        node.priority = rng.randint(-2, 5)
+        if i % 3 == 0:
+            node.set_position(rng.uniform(-500, 500), rng.uniform(-500, 500))
+        if i % 4 == 0:
+            node.set_style(color=rng.choice(["#ff0000", "#00ff00"]), icon=rng.choice([None, "🚀"]))
+        manager.add_node(node)
+        node_ids.append(node.node_id)
+    manager.nodes[node_ids[5]].add_sibling(manager.nodes[node_ids[9]])
+    manager.nodes[node_ids[1]].set_expanded(False)
+    manager.nodes[node_ids[2]].is_visible = False
+    manager.set_focus_node(node_ids[3])
+    return manager
+
+
+def assert_same_map(loaded, manager):
+    """检查两个导图的导出内容、统计信息和索引查询一致"""
+    assert loaded is not None
+    assert loaded.export_to_dict() == manager.export_to_dict()
+    assert loaded.get_statistics() == manager.get_statistics()
+    for node_id in list(manager.nodes)[::25]:
+        assert loaded.get_node_depth(node_id) == manager.get_node_depth(node_id)
+    assert [node.node_id for node in loaded.get_leaf_nodes()] == [node.node_id for node in manager.get_leaf_nodes()]
+
+
+def test_json_round_trip():
+    """测试 JSON 文件保存加载"""
+    manager = build_map()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map.json")
+        assert manager.save_to_file(path)
+        assert_same_map(MindMapManager.load_from_file(path), manager)
+    assert_same_map(MindMapManager.from_dict(manager.export_to_dict()), manager)
+
+
+def test_ndjson_round_trip():
+    """测试 NDJSON 逐行导出导入（文件、字符串行和字节行）"""
+    manager = build_map()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map.ndjson")
+        assert manager.save_to_file(path)
+        assert_same_map(MindMapManager.load_from_file(path), manager)
+        with open(path, "rb") as f:
+            assert_same_map(MindMapManager.stream_import(io.BytesIO(f.read())), manager)
+    lines = list(manager.iter_export())
+    assert len(lines) == len(manager.nodes) + 1
+    assert_same_map(MindMapManager.stream_import(lines), manager)
+
+
+def test_snapshot_round_trip():
+    """测试二进制快照保存加载，以及延迟加载管理器读取同一快照"""
+    manager = build_map()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map" + SNAPSHOT_EXTENSION)
+        assert manager.save_to_file(path)
+        loaded = MindMapManager.load_from_file(path)
+        assert_same_map(loaded, manager)
+        # 加载后的导图再次保存，快照内容不变
+        again = os.path.join(directory, "again" + SNAPSHOT_EXTENSION)
+        assert loaded.save_to_file(again)
+        with open(path, "rb") as f, open(again, "rb") as g:
+            assert f.read() == g.read()
+        # 由快照流式导出的NDJSON与直接导出相同
+        buffer = io.BytesIO()
+        dump_snapshot(manager, buffer)
+        assert list(iter_snapshot_export(buffer.getvalue())) == list(manager.iter_export())
+
+        with LazyMindMapManager.open(path, capacity=16) as lazy:
+            assert lazy.get_statistics() == manager.get_statistics()
+            assert lazy.get_focus_node_id() == manager.get_focus_node_id()
+            node_id = list(manager.nodes)[-1]
+            assert [node.node_id for node in lazy.get_node_path(node_id)] == [
+                node.node_id for node in manager.get_node_path(node_id)
+            ]
+            assert_same_map(lazy.to_manager(), manager)
+
+
+if __name__ == "__main__":
+    test_json_round_trip()
+    test_ndjson_round_trip()
+    test_snapshot_round_trip()
+    print("=== 测试完成 ===")
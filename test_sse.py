@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+测试 SSE 回复文本合并与帧编码
+"""
+
+from sse import chunk_frame, coalesce_text, encode_event
+import asyncio
+import json
+
+
+async def generate(pieces, delay=0.0):
+    """按给定间隔逐个产生文本片段"""
+    for piece in pieces:
+        if delay:
+            await asyncio.sleep(delay)
+        yield piece
+
+
+async def collect(pieces, **options):
+    """收集合并后的文本"""
+    return [text async for text in coalesce_text(pieces, **options)]
+
+
+def test_chunk_frame():
+    """测试 chunk 帧与通用事件编码结果一致，并能解码回原文本"""
+    for text in ["", "火箭", 'quote " and \\ backslash', "line\nbreak\t", "🚀\x00"]:
+        frame = chunk_frame(text)
+        assert frame == encode_event({"content": text, "type": "chunk"})
+        assert frame.startswith("data: ") and frame.endswith("\n\n")
+        assert json.loads(frame[len("data: "):]) == {"content": text, "type": "chunk"}
+
+
+def test_coalesce_text():
+    """测试合并后的文本拼接起来与原回复相同，且按字节数和时间间隔切分"""
+    pieces = [f"片段{i} " for i in range(200)]
+    reply = "".join(pieces)
+
+    # 上游一次性产生所有片段时按字节数合并
+    frames = asyncio.run(collect(generate(pieces), interval=10, max_bytes=64))
+    assert "".join(frames) == reply
+    assert len(frames) < len(pieces)
+    longest = max(len(piece.encode("utf-8")) for piece in pieces)
+    assert all(len(frame.encode("utf-8")) < 64 + longest for frame in frames)
+
+    # 上游较慢时按时间间隔发送，缓冲的文本不会一直等待下一个片段
+    frames = asyncio.run(collect(generate(pieces[:10], delay=0.02), interval=0.005, max_bytes=1 << 20))
+    assert "".join(frames) == "".join(pieces[:10])
+    assert len(frames) > 1
+
+
+def test_coalesce_text_error():
+    """测试上游异常会传给调用方"""
+    async def failing():
+        yield "部分回复"
+        raise RuntimeError("agent failed")
+
+    async def run():
+        try:
+            await collect(failing(), interval=10)
+        except RuntimeError as e:
+            return str(e)
+        return None
+
+    assert asyncio.run(run()) == "agent failed"
+
+
+if __name__ == "__main__":
+    test_chunk_frame()
+    test_coalesce_text()
+    test_coalesce_text_error()
+    print("=== 测试完成 ===")